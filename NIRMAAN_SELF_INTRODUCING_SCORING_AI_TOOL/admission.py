@@ -0,0 +1,342 @@
+"""Admission control in front of the analysis endpoints.
+
+Every request is checked twice before it may run:
+
+* a per-client token bucket (ADMISSION_CLIENT_RATE requests per second,
+  bursts of ADMISSION_CLIENT_BURST) rejects a client that sends faster than
+  its share, however idle the server is
+* a concurrency limit (ADMISSION_CONCURRENCY analyses at once, by default the
+  grammar backend's capacity) holds the rest in per-client queues
+
+Free slots go to the queued clients round-robin, one request per client per
+turn. A client with hundreds of queued requests therefore waits behind its
+own backlog, not in front of everyone else's. A request is rejected right
+away with 429 and a Retry-After estimate when its client's queue or the
+global queue is full. It also gets 429 when it waited longer than
+ADMISSION_QUEUE_TIMEOUT.
+
+A batch costs one token per item. A live transcription stream costs one
+token but holds no slot, since it stays open for as long as the speaker
+talks.
+
+Clients are identified by their peer address. Only when the peer is one of
+ADMISSION_TRUSTED_PROXIES (addresses or networks) is the X-Client-Id header
+trusted, else the right-most X-Forwarded-For address that is not a trusted
+proxy. A client behind the load balancer therefore cannot pick a fresh
+identity, and a fresh burst, per request.
+
+The limits are for the whole deployment. Each of ADMISSION_PROCESSES worker
+processes (gunicorn.conf.py sets it to its worker count) enforces its share:
+the rate, burst and concurrency divided by the number of processes. Queuing
+needs a worker that holds several requests at once, so admission requires
+the gthread or ASGI worker class; gunicorn.conf.py refuses to start sync
+workers with admission enabled.
+
+A gthread worker blocks one of its threads for every running or queued
+request, so with ADMISSION_THREADS set (gunicorn.conf.py sets it to
+``threads``) the slots plus the queue are capped at the thread count minus
+ADMISSION_RESERVED_THREADS. The reserved threads keep /api/health,
+/api/metrics and status polls answering during a flood. Unless set
+explicitly, the queue takes every remaining thread and a client may hold a
+quarter of it. Without a thread limit (ASGI, the development server) the
+queue defaults to 200 and a client's share to 20.
+"""
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import grammar_backend
+
+# Admission configuration
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_CONCURRENCY = int(os.environ.get('ADMISSION_CONCURRENCY', 0))  # 0: grammar capacity
+ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 0))  # 0: derived, see above
+ADMISSION_CLIENT_QUEUE = int(os.environ.get('ADMISSION_CLIENT_QUEUE', 0))  # 0: derived, see above
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+ADMISSION_CLIENT_RATE = float(os.environ.get('ADMISSION_CLIENT_RATE', 10))
+ADMISSION_CLIENT_BURST = float(os.environ.get('ADMISSION_CLIENT_BURST', 30))
+ADMISSION_MAX_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', 10000))
+ADMISSION_TRUSTED_PROXIES = os.environ.get('ADMISSION_TRUSTED_PROXIES', '127.0.0.1,::1')
+ADMISSION_PROCESSES = max(1, int(os.environ.get('ADMISSION_PROCESSES', 1)))
+# Request threads per process (0: no thread limit) and those kept free of analyses
+ADMISSION_THREADS = int(os.environ.get('ADMISSION_THREADS', 0))
+ADMISSION_RESERVED_THREADS = int(os.environ.get('ADMISSION_RESERVED_THREADS', 2))
+# Concurrent checks one LanguageTool server handles (its --maxCheckThreads)
+LANGUAGETOOL_SERVER_THREADS = int(os.environ.get('LANGUAGETOOL_SERVER_THREADS', 10))
+
+CLIENT_HEADER = 'X-Client-Id'
+FORWARDED_HEADER = 'X-Forwarded-For'
+
+# Queue sizes when the worker has no thread limit
+DEFAULT_QUEUE_SIZE = 200
+DEFAULT_CLIENT_QUEUE = 20
+
+RATE_LIMITED = 'rate_limited'
+QUEUE_FULL = 'queue_full'
+CLIENT_QUEUE_FULL = 'client_queue_full'
+QUEUE_TIMEOUT = 'queue_timeout'
+
+
+def grammar_capacity(local_workers):
+    """Analyses the grammar backend can work on at once"""
+    if grammar_backend.GRAMMAR_BACKEND == 'remote':
+        return len(grammar_backend.server_urls()) * LANGUAGETOOL_SERVER_THREADS
+    # The in-process tool is checked from the grammar pool
+    return local_workers
+
+
+def process_controller(local_workers):
+    """AdmissionController enforcing this process's share of the deployment limits"""
+    processes = ADMISSION_PROCESSES
+    if ADMISSION_CONCURRENCY:
+        concurrency = math.ceil(ADMISSION_CONCURRENCY / processes)
+    elif grammar_backend.GRAMMAR_BACKEND == 'remote':
+        # The LanguageTool servers are shared by every worker process
+        concurrency = max(1, grammar_capacity(local_workers) // processes)
+    else:
+        concurrency = local_workers
+    queue_size, client_queue = queue_limits(concurrency)
+    return AdmissionController(min(concurrency, usable_threads() or concurrency), queue_size, client_queue,
+                               rate=ADMISSION_CLIENT_RATE / processes,
+                               burst=max(1.0, ADMISSION_CLIENT_BURST / processes))
+
+
+def usable_threads():
+    """Threads a process may block on analyses and their queue, or None without a thread limit"""
+    if not ADMISSION_THREADS:
+        return None
+    return max(1, ADMISSION_THREADS - ADMISSION_RESERVED_THREADS)
+
+
+def queue_limits(concurrency):
+    """(queue size, per-client queue) of a process running ``concurrency`` analyses at once"""
+    usable = usable_threads()
+    if usable is None:
+        return ADMISSION_QUEUE_SIZE or DEFAULT_QUEUE_SIZE, ADMISSION_CLIENT_QUEUE or DEFAULT_CLIENT_QUEUE
+    # Every running or queued request blocks a thread
+    room = max(0, usable - concurrency)
+    queue_size = min(ADMISSION_QUEUE_SIZE or room, room)
+    client_queue = min(ADMISSION_CLIENT_QUEUE or max(1, queue_size // 4), queue_size)
+    return queue_size, client_queue
+
+
+def parse_networks(value):
+    return tuple(ipaddress.ip_network(part.strip(), strict=False) for part in value.split(',') if part.strip())
+
+
+TRUSTED_PROXIES = parse_networks(ADMISSION_TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_id(peer, client_header=None, forwarded_for=None):
+    """Identity a request is limited under; headers count only when the peer is a trusted proxy"""
+    if not peer:
+        return 'unknown'
+    if not is_trusted_proxy(peer):
+        return peer
+    if client_header:
+        return client_header
+    forwarded = [address.strip() for address in (forwarded_for or '').split(',') if address.strip()]
+    for address in reversed(forwarded):
+        if not is_trusted_proxy(address):
+            return address
+    return peer
+
+
+class Rejected(Exception):
+    """Raised when a request is not admitted; ``retry_after`` is in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+
+class Ticket:
+    """A request's claim on a slot; ``notify`` is called (under the lock) once granted"""
+
+    __slots__ = ('client', 'granted', 'enqueued', 'started', 'event', 'notify')
+
+    def __init__(self, client, notify=None):
+        self.client = client
+        self.granted = False
+        self.enqueued = time.monotonic()
+        self.started = None
+        self.event = threading.Event()
+        self.notify = notify
+
+    def _grant(self):
+        self.granted = True
+        self.started = time.monotonic()
+        self.event.set()
+        if self.notify is not None:
+            self.notify()
+
+    @property
+    def waited(self):
+        return (self.started or time.monotonic()) - self.enqueued
+
+
+class AdmissionController:
+    """Token buckets plus a concurrency limit with round-robin per-client queues"""
+
+    def __init__(self, concurrency, queue_size=DEFAULT_QUEUE_SIZE, client_queue=DEFAULT_CLIENT_QUEUE,
+                 rate=ADMISSION_CLIENT_RATE, burst=ADMISSION_CLIENT_BURST, max_clients=ADMISSION_MAX_CLIENTS):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.client_queue = client_queue
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = dict.fromkeys((RATE_LIMITED, QUEUE_FULL, CLIENT_QUEUE_FULL, QUEUE_TIMEOUT), 0)
+        self._buckets = {}
+        self._queues = {}           # client -> deque of waiting tickets
+        self._rotation = deque()    # clients with waiting tickets, in serving order
+        self._service_seconds = 1.0  # moving average of slot hold time, for Retry-After
+        self._lock = threading.Lock()
+
+    def _take_tokens(self, client, now, cost):
+        """Spend cost tokens; returns seconds until enough are available if short
+
+        A cost above the burst is admitted with a full bucket and leaves it in
+        debt, so a large batch is paid for by the client's following requests.
+        """
+        if not self.rate:
+            return 0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._drop_full_buckets(now)
+            bucket = self._buckets[client] = TokenBucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        needed = min(cost, self.burst)
+        if bucket.tokens < needed:
+            return (needed - bucket.tokens) / self.rate
+        bucket.tokens -= cost
+        return 0
+
+    def _drop_full_buckets(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        full = [client for client, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * self.rate >= self.burst]
+        for client in full:
+            del self._buckets[client]
+        if len(self._buckets) >= self.max_clients:
+            self._buckets.clear()
+
+    def _reject(self, reason, retry_after):
+        self.rejected[reason] += 1
+        raise Rejected(reason, max(1, math.ceil(retry_after)))
+
+    def _queue_wait(self):
+        """Rough seconds until a newly queued request would be served"""
+        return self._service_seconds * (self.queued + 1) / self.concurrency
+
+    def admit(self, client, notify=None, cost=1):
+        """Admit a request or queue it; raises Rejected. Wait on the ticket unless granted"""
+        ticket = Ticket(client, notify)
+        with self._lock:
+            wait = self._take_tokens(client, time.monotonic(), cost)
+            if wait:
+                self._reject(RATE_LIMITED, wait)
+            if self.active < self.concurrency and not self.queued:
+                self.active += 1
+                self.admitted += 1
+                ticket.granted = True
+                ticket.started = ticket.enqueued
+                return ticket
+            if self.queued >= self.queue_size:
+                self._reject(QUEUE_FULL, self._queue_wait())
+            queue = self._queues.get(client)
+            if queue is None:
+                queue = self._queues[client] = deque()
+                self._rotation.append(client)
+            elif len(queue) >= self.client_queue:
+                self._reject(CLIENT_QUEUE_FULL, self._service_seconds * len(queue))
+            queue.append(ticket)
+            self.queued += 1
+            return ticket
+
+    def charge(self, client, cost=1):
+        """Rate limit a request that takes no slot; raises Rejected"""
+        with self._lock:
+            wait = self._take_tokens(client, time.monotonic(), cost)
+            if wait:
+                self._reject(RATE_LIMITED, wait)
+            self.admitted += 1
+
+    def wait(self, ticket, timeout=ADMISSION_QUEUE_TIMEOUT):
+        """Block until the ticket is granted; raises Rejected on timeout"""
+        if ticket.granted or ticket.event.wait(timeout):
+            return
+        self.expire(ticket)
+
+    def expire(self, ticket):
+        """Give up on a queued ticket; raises Rejected unless it was granted meanwhile"""
+        with self._lock:
+            if ticket.granted:
+                return
+            queue = self._queues.get(ticket.client)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                self.queued -= 1
+                if not queue:
+                    del self._queues[ticket.client]
+                    self._rotation.remove(ticket.client)
+            self._reject(QUEUE_TIMEOUT, self._queue_wait())
+
+    def release(self, ticket):
+        """Free the ticket's slot and hand it to the next client in turn"""
+        with self._lock:
+            held = time.monotonic() - ticket.started
+            self._service_seconds += 0.1 * (held - self._service_seconds)
+            self.active -= 1
+            while self._rotation and self.active < self.concurrency:
+                client = self._rotation.popleft()
+                queue = self._queues[client]
+                waiter = queue.popleft()
+                if queue:
+                    self._rotation.append(client)
+                else:
+                    del self._queues[client]
+                self.queued -= 1
+                self.active += 1
+                self.admitted += 1
+                waiter._grant()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'client_queue': self.client_queue,
+                'active': self.active,
+                'queued': self.queued,
+                'queued_clients': len(self._queues),
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'service_seconds': round(self._service_seconds, 4)
+            }
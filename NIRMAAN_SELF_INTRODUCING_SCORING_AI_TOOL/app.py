@@ -1,37 +1,740 @@
-from flask import Flask, request, jsonify
+import time
+# Measured so /api/health can report how long importing the app took
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, g, stream_with_context
 from flask_cors import CORS
-import re
-from collections import Counter
-import language_tool_python
-from textblob import TextBlob
+import json
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import math
+import admission
+import batch_scoring
+import grammar_backend
+from grammar_heuristics import heuristic_matches
+import grammar_pool
+import jobs
+import metrics
+import near_duplicates
+import profiling
+import response_format
+import result_cache
+import results_store
+import sentiment_engine as sentiment_backends
+import streaming
+# Phrase lists, keyword categories and score bands live in rubric.json
+from rubric import get_rubric, get_rubric_store, UnsupportedLanguageError
+from text_pipeline import Document, exceeds_word_limit, grammar_spans
+from werkzeug.exceptions import RequestEntityTooLarge
 
 app = Flask(__name__)
+# jsonify output encoded with orjson when it is installed
+app.json = response_format.FastJSONProvider(app)
 CORS(app)
 
-# Initialize grammar checker (singleton pattern)
-grammar_tool = None
+# Batch scoring limits
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 1000))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+BATCH_GRAMMAR_CHUNK_CHARS = int(os.environ.get('BATCH_GRAMMAR_CHUNK_CHARS', 20000))
+
+# Request size limits; larger requests are rejected with 413
+MAX_REQUEST_BYTES = int(os.environ.get('MAX_REQUEST_BYTES', 4 * 1024 * 1024))
+MAX_TRANSCRIPT_WORDS = int(os.environ.get('MAX_TRANSCRIPT_WORDS', 20000))
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES or None
+
+# Characters per LanguageTool call for long transcripts; longer texts are
+# split between sentences and checked concurrently on the batch pool
+GRAMMAR_CHUNK_CHARS = int(os.environ.get('GRAMMAR_CHUNK_CHARS', 20000))
+
+# Latency budget for the grammar stage before falling back to heuristics
+GRAMMAR_TIMEOUT_SECONDS = float(os.environ.get('GRAMMAR_TIMEOUT_SECONDS', 5))
+GRAMMAR_WORKERS = int(os.environ.get('GRAMMAR_WORKERS', 8))
+
+# 'concurrent' overlaps the grammar check with the other criteria; 'sequential'
+# scores every criterion in turn
+ANALYZE_MODE = os.environ.get('ANALYZE_MODE', 'concurrent')
+
+# Per-sentence grammar match cache size (0 checks whole transcripts instead)
+SENTENCE_CACHE_SIZE = int(os.environ.get('SENTENCE_CACHE_SIZE', 50000))
+
+# Instrumentation, exposed by /api/metrics
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    'nirmaan_request_duration_seconds', 'HTTP request latency', ('endpoint', 'method', 'status'))
+REQUESTS_IN_FLIGHT = metrics.REGISTRY.gauge(
+    'nirmaan_requests_in_flight', 'HTTP requests currently being served', ('endpoint',))
+REQUEST_BYTES = metrics.REGISTRY.histogram(
+    'nirmaan_request_size_bytes', 'HTTP request body size', ('endpoint',), buckets=metrics.SIZE_BUCKETS)
+TRANSCRIPT_WORDS = metrics.REGISTRY.histogram(
+    'nirmaan_transcript_words', 'Words per analyzed transcript', buckets=metrics.WORD_BUCKETS)
+STAGE_SECONDS = metrics.REGISTRY.histogram(
+    'nirmaan_stage_duration_seconds', 'SpeechAnalyzer stage latency', ('stage',))
+GRAMMAR_ERRORS = metrics.REGISTRY.counter(
+    'nirmaan_grammar_errors_total', 'Grammar backend calls that failed or timed out', ('reason',))
+GRAMMAR_FALLBACKS = metrics.REGISTRY.counter(
+    'nirmaan_grammar_fallbacks_total', 'Grammar scores estimated with the heuristic fallback', ('reason',))
+CACHE_LOOKUPS = metrics.REGISTRY.counter(
+    'nirmaan_cache_lookups_total', 'Cache lookups by cache and result', ('cache', 'result'))
+ADMISSION_REJECTIONS = metrics.REGISTRY.counter(
+    'nirmaan_admission_rejections_total', 'Requests rejected by admission control', ('reason',))
+ADMISSION_QUEUE_DEPTH = metrics.REGISTRY.gauge(
+    'nirmaan_admission_queue_depth', 'Requests waiting for an analysis slot')
+ADMISSION_ACTIVE = metrics.REGISTRY.gauge(
+    'nirmaan_admission_active', 'Admitted requests holding an analysis slot')
+ADMISSION_WAIT_SECONDS = metrics.REGISTRY.histogram(
+    'nirmaan_admission_wait_seconds', 'Time admitted requests spent queued')
+NEAR_DUPLICATE_LOOKUPS = metrics.REGISTRY.counter(
+    'nirmaan_near_duplicate_lookups_total', 'Near-duplicate index lookups by result', ('result',))
+
+# Grammar checkers, one per LanguageTool language (singleton pattern)
+grammar_checkers = None
+grammar_checkers_lock = threading.Lock()
+
+def create_grammar_tool(language):
+    if grammar_backend.GRAMMAR_BACKEND == 'remote':
+        # Shared LanguageTool server(s) spawned by the gunicorn master
+        return grammar_backend.LanguageToolClient(grammar_backend.server_urls(), language=language)
+    # Imported lazily: this pulls in the JVM launcher and is not fork-safe
+    import language_tool_python
+    return language_tool_python.LanguageTool(language)
+
+def get_grammar_checkers():
+    global grammar_checkers
+    if grammar_checkers is None:
+        with grammar_checkers_lock:
+            if grammar_checkers is None:
+                # The default locale's checker is never evicted
+                grammar_checkers = grammar_pool.GrammarToolPool(create_grammar_tool,
+                                                                pinned=(get_rubric().grammar_language,))
+    return grammar_checkers
+
+def get_grammar_tool(language=None):
+    """Grammar checker of a LanguageTool language, the default rubric's if None"""
+    return get_grammar_checkers().get(language or get_rubric().grammar_language)
+
+# Sentiment engine and its lexicon (singleton pattern); loading it before fork
+# lets every gunicorn worker share the pages copy-on-write
+sentiment_engine = None
+sentiment_engine_lock = threading.Lock()
+
+def get_sentiment_engine():
+    global sentiment_engine
+    if sentiment_engine is None:
+        with sentiment_engine_lock:
+            if sentiment_engine is None:
+                sentiment_engine = sentiment_backends.create_engine()
+    return sentiment_engine
+
+# Shared pool for batch grammar checks (singleton pattern)
+batch_executor = None
+batch_executor_lock = threading.Lock()
+
+def get_batch_executor():
+    global batch_executor
+    if batch_executor is None:
+        with batch_executor_lock:
+            if batch_executor is None:
+                batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS,
+                                                    thread_name_prefix='batch-grammar')
+    return batch_executor
+
+# Pool running grammar checks alongside the other criteria (singleton pattern)
+grammar_executor = None
+grammar_executor_lock = threading.Lock()
+
+def get_grammar_executor():
+    global grammar_executor
+    if grammar_executor is None:
+        with grammar_executor_lock:
+            if grammar_executor is None:
+                grammar_executor = ThreadPoolExecutor(max_workers=GRAMMAR_WORKERS,
+                                                      thread_name_prefix='grammar')
+    return grammar_executor
+
+# Analysis result cache (singleton pattern)
+analysis_cache = None
+analysis_cache_lock = threading.Lock()
+
+def get_analysis_cache():
+    global analysis_cache
+    if analysis_cache is None:
+        with analysis_cache_lock:
+            if analysis_cache is None:
+                analysis_cache = result_cache.ResultCache()
+    return analysis_cache
+
+def analysis_key(transcript, duration_seconds, rubric, detailed=True):
+    """Result cache key; compact analyses are cached apart from detailed ones"""
+    version = rubric.fingerprint if detailed else f'{rubric.fingerprint}:compact'
+    return result_cache.make_key(transcript, duration_seconds, version)
+
+def score_transcript(transcript, duration_seconds=52, timings=None, use_cache=True, detailed=True,
+                     language=None):
+    """Run SpeechAnalyzer.analyze() behind the content-addressed result cache.
+
+    When a ``timings`` dict is given it is filled with the analyzer's per-stage
+    timings (left empty on a cache hit). ``use_cache=False`` skips the lookup
+    but still stores the fresh result. ``detailed=False`` runs a compact
+    analysis without feedback, details or summary. ``language`` picks the
+    locale's rubric and grammar checker.
+    
+    With the near-duplicate index enabled, the result has a ``similar_to``
+    field and an analysis reuses its near-duplicate's per-sentence results.
+    The index is probed only on a cache miss; ``similar_to`` is cached with
+    the result.
+    """
+    cache = get_analysis_cache()
+    rubric = get_rubric(language)
+    key = analysis_key(transcript, duration_seconds, rubric, detailed)
+    if use_cache:
+        cached = cache.get(key)
+        CACHE_LOOKUPS.inc(cache='result', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return dict(cached)
+    
+    probe = probe_near_duplicates(transcript)
+    analyzer = SpeechAnalyzer(transcript, duration_seconds, rubric=rubric, reuse=reuse_of(probe))
+    results = analyzer.analyze(detailed=detailed)
+    if timings is not None:
+        timings.update(analyzer.stage_timings)
+    results = with_similar_to(results, probe)
+    # Degraded results are estimates; let the next request try LanguageTool again
+    if not analyzer.degraded:
+        cache.set(key, results)
+    index_analysis(probe, analyzer)
+    return dict(results)
+
+# Index of analyzed transcripts for near-duplicate lookups (singleton pattern);
+# None when NEAR_DUPLICATE_INDEX_SIZE is 0
+near_duplicate_index = None
+near_duplicate_index_lock = threading.Lock()
+
+def get_near_duplicate_index():
+    global near_duplicate_index
+    if near_duplicate_index is None and near_duplicates.NEAR_DUPLICATE_INDEX_SIZE > 0:
+        with near_duplicate_index_lock:
+            if near_duplicate_index is None:
+                near_duplicate_index = near_duplicates.NearDuplicateIndex()
+    return near_duplicate_index
+
+# Per-sentence results an analysis leaves in the near-duplicate index: grammar
+# error counts by sentence hash (None if not checked sentence by sentence) and
+# sentiment piece assessments by piece hash
+AnalysisReuse = namedtuple('AnalysisReuse', ['grammar_language', 'grammar', 'sentiment'])
+NO_REUSE = AnalysisReuse(None, None, {})
+REUSE_HEADER = struct.Struct('<iI')
+
+def pack_reuse(reuse):
+    """AnalysisReuse as (grammar_language, bytes), about 12 bytes a sentence and 8 an assessment"""
+    grammar, pieces = reuse.grammar, list(reuse.sentiment.items())
+    parts = [REUSE_HEADER.pack(-1 if grammar is None else len(grammar), len(pieces))]
+    if grammar:
+        parts += [array('q', grammar).tobytes(), array('i', grammar.values()).tobytes()]
+    parts += [
+        array('q', [key for key, _ in pieces]).tobytes(),
+        array('I', [len(assessments) for _, (assessments, _, _) in pieces]).tobytes(),
+        array('B', [open_end | leading_bang << 1 for _, (_, open_end, leading_bang) in pieces]).tobytes(),
+        array('d', [value for _, (assessments, _, _) in pieces for value in assessments]).tobytes()
+    ]
+    return reuse.grammar_language, b''.join(parts)
+
+def unpack_reuse(packed):
+    """AnalysisReuse from ``pack_reuse`` output"""
+    grammar_language, data = packed
+    sentences, piece_count = REUSE_HEADER.unpack_from(data)
+    offset = REUSE_HEADER.size
+    
+    def take(typecode, count):
+        nonlocal offset
+        values = array(typecode)
+        values.frombytes(data[offset:offset + count * values.itemsize])
+        offset += count * values.itemsize
+        return values
+    
+    grammar = None
+    if sentences >= 0:
+        keys = take('q', sentences)
+        grammar = dict(zip(keys, take('i', sentences)))
+    keys, lengths, flags = take('q', piece_count), take('I', piece_count), take('B', piece_count)
+    values = take('d', sum(lengths)).tolist()
+    sentiment, start = {}, 0
+    for key, length, flag in zip(keys, lengths, flags):
+        sentiment[key] = (values[start:start + length], bool(flag & 1), bool(flag & 2))
+        start += length
+    return AnalysisReuse(grammar_language, grammar, sentiment)
+
+def probe_near_duplicates(transcript):
+    """near_duplicates.Probe of a transcript, or None when the index is disabled"""
+    index = get_near_duplicate_index()
+    if index is None:
+        return None
+    probe = index.probe(transcript, results_store.transcript_hash(transcript))
+    NEAR_DUPLICATE_LOOKUPS.inc(result='none' if probe.match is None else 'match')
+    return probe
+
+def reuse_of(probe):
+    """Results of the probe's match for a new analysis to reuse; None when the index is disabled"""
+    if probe is None:
+        return None
+    if probe.match is None or probe.match.payload is None:
+        return NO_REUSE
+    return unpack_reuse(probe.match.payload)
+
+def index_analysis(probe, analyzer):
+    """Add an analyzed transcript and its per-sentence results to the near-duplicate index"""
+    if probe is None or probe.signature is None:
+        return
+    if probe.match is not None and probe.match.ref == probe.ref:
+        # The same transcript is indexed already
+        return
+    get_near_duplicate_index().add(probe.signature, probe.ref, pack_reuse(analyzer.reuse_results()))
+
+def with_similar_to(results, probe):
+    """Copy of a result with the probe's match as ``similar_to`` (None without one)"""
+    results = dict(results)
+    if probe is not None:
+        match = probe.match
+        results['similar_to'] = None if match is None else {
+            'transcript_hash': match.ref,
+            'similarity': round(match.similarity, 3)
+        }
+    return results
+
+# Grammar error counts per (language, sentence), shared by all requests in the process.
+# Sentences are ``grammar_spans`` slices; a count is what the sentence adds to
+# a check of the whole transcript
+sentence_grammar_cache = result_cache.LRUCache(SENTENCE_CACHE_SIZE, ttl=None)
+
+# A run of consecutive sentences to check, followed by the next sentence as
+# context; ``starts`` are the run's sentence offsets in ``text`` and ``end``
+# is where the context begins
+GrammarWindow = namedtuple('GrammarWindow', ['text', 'starts', 'end', 'indices'])
+
+def join_for_check(texts, separator='\n\n'):
+    """Join texts for one LanguageTool call; returns (joined text, start offsets)"""
+    starts, size = [], 0
+    for text in texts:
+        starts.append(size)
+        size += len(text) + len(separator)
+    return separator.join(texts), starts
+
+def match_offsets(matches, starts):
+    """Offsets of the matches in each joined text, relative to the start of that text"""
+    offsets = [[] for _ in starts]
+    for match in matches:
+        index = bisect_right(starts, match.offset) - 1
+        offsets[index].append(match.offset - starts[index])
+    return offsets
+
+def grammar_offsets(texts, language=None):
+    """Offsets of the grammar matches in each text, from a single LanguageTool call.
+
+    The texts are joined with blank lines, checked once, and each match is
+    assigned back to the text it starts in.
+    """
+    joined, starts = join_for_check(texts)
+    matches = get_grammar_checkers().check(joined, language or get_rubric().grammar_language)
+    return match_offsets(matches, starts)
+
+def count_grammar_errors(texts, language=None):
+    """Count grammar errors for each text with a single LanguageTool call"""
+    return [len(offsets) for offsets in grammar_offsets(texts, language)]
+
+def pack_chunks(texts, max_chars):
+    """Group consecutive text indices into chunks of roughly ``max_chars`` characters"""
+    chunks = []
+    indices, size = [], 0
+    for index, text in enumerate(texts):
+        if indices and size + len(text) > max_chars:
+            chunks.append(indices)
+            indices, size = [], 0
+        indices.append(index)
+        size += len(text) + 2
+    if indices:
+        chunks.append(indices)
+    return chunks
+
+def grammar_windows(text, spans, counts, max_chars=GRAMMAR_CHUNK_CHARS):
+    """GrammarWindows covering every sentence of text whose count is None.
+
+    A run of unknown sentences is cut every ``max_chars`` characters. Each
+    window ends with the sentence after its run, so a rule looking past the
+    run's last sentence sees what it would in the whole transcript.
+    """
+    windows, run = [], []
+    for index, count in enumerate(counts):
+        if count is not None or (run and spans[index][1] - spans[run[0]][0] > max_chars):
+            if run:
+                windows.append(grammar_window(text, spans, run))
+            run = []
+        if count is None:
+            run.append(index)
+    if run:
+        windows.append(grammar_window(text, spans, run))
+    return windows
+
+def grammar_window(text, spans, run):
+    start, end = spans[run[0]][0], spans[run[-1]][1]
+    context_end = spans[run[-1] + 1][1] if run[-1] + 1 < len(spans) else end
+    return GrammarWindow(text[start:context_end], [spans[index][0] - start for index in run], end - start, run)
+
+def window_errors(window, offsets):
+    """Error count of each sentence in a window's run, from the window's match offsets"""
+    counts = [0] * len(window.indices)
+    for offset in offsets:
+        if offset < window.end:
+            counts[bisect_right(window.starts, offset) - 1] += 1
+    return counts
+
+def check_windows(windows, language=None, max_chars=GRAMMAR_CHUNK_CHARS, strict=True):
+    """Match offsets of each window, with one LanguageTool call per chunk of windows.
+
+    A single chunk is checked inline; several are checked concurrently on the
+    batch pool. A failed chunk raises, so the caller's fallback applies; with
+    strict=False its windows get None instead.
+    """
+    texts = [window.text for window in windows]
+    chunks = pack_chunks(texts, max_chars)
+    if len(chunks) <= 1 and strict:
+        return grammar_offsets(texts, language)
+    executor = get_batch_executor()
+    futures = [(indices, executor.submit(grammar_offsets, [texts[i] for i in indices], language))
+               for indices in chunks]
+    offsets = [None] * len(texts)
+    for indices, future in futures:
+        try:
+            found = future.result()
+        except Exception as e:
+            if strict:
+                raise
+            GRAMMAR_ERRORS.inc(reason='batch_error')
+            app.logger.warning('Batch grammar check failed for %d sentence runs: %s', len(indices), e)
+            continue
+        for index, window_offsets in zip(indices, found):
+            offsets[index] = window_offsets
+    return offsets
+
+def sentence_errors(text, spans, language=None, known=None):
+    """Grammar error count of every sentence of text, checking only those not cached or ``known``"""
+    language = language or get_rubric().grammar_language
+    sentences = [text[start:end] for start, end in spans]
+    counts = cached_sentence_errors(sentences, language, known)
+    windows = grammar_windows(text, spans, counts)
+    offsets = check_windows(windows, language) if windows else []
+    return merge_sentence_errors(sentences, counts, windows, offsets, language)
+
+def cached_sentence_errors(sentences, language, known=None):
+    """Cached error count per sentence, None where unknown.
+    
+    ``known`` maps sentence hashes to a near-duplicate's error counts; it fills
+    in sentences the cache no longer holds.
+    """
+    if sentence_grammar_cache.max_entries <= 0:
+        counts = [None] * len(sentences)
+    else:
+        counts = [sentence_grammar_cache.get((language, sentence)) for sentence in sentences]
+        misses = sum(1 for count in counts if count is None)
+        CACHE_LOOKUPS.inc(len(counts) - misses, cache='sentence_grammar', result='hit')
+        CACHE_LOOKUPS.inc(misses, cache='sentence_grammar', result='miss')
+    misses = sum(1 for count in counts if count is None)
+    if known and misses:
+        counts = [known.get(hash(sentence)) if count is None else count
+                  for sentence, count in zip(sentences, counts)]
+        reused = misses - sum(1 for count in counts if count is None)
+        CACHE_LOOKUPS.inc(reused, cache='near_duplicate_grammar', result='hit')
+        CACHE_LOOKUPS.inc(misses - reused, cache='near_duplicate_grammar', result='miss')
+    return counts
+
+def merge_sentence_errors(sentences, counts, windows, offsets, language):
+    """Every sentence's error count, with the checked windows' sentences filled in and cached"""
+    counts = list(counts)
+    for window, window_offsets in zip(windows, offsets):
+        for index, count in zip(window.indices, window_errors(window, window_offsets)):
+            counts[index] = count
+            sentence_grammar_cache.set((language, sentences[index]), count)
+    return counts
+
+# Background queue for asynchronous analysis jobs (singleton pattern)
+job_queue = None
+job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    global job_queue
+    if job_queue is None:
+        with job_queue_lock:
+            if job_queue is None:
+                job_queue = jobs.JobQueue(score_and_record)
+    return job_queue
+
+# Persistent analysis history (singleton pattern); None when RESULTS_DB_PATH is ''
+results_db = None
+results_db_lock = threading.Lock()
+
+def get_results_store():
+    global results_db
+    if results_db is None and results_store.RESULTS_DB_PATH:
+        with results_db_lock:
+            if results_db is None:
+                results_db = results_store.ResultsStore()
+    return results_db
 
-def get_grammar_tool():
-    global grammar_tool
-    if grammar_tool is None:
-        grammar_tool = language_tool_python.LanguageTool('en-US')
-    return grammar_tool
+def record_result(results, transcript, student_id=None, cohort_id=None):
+    """Queue a finished analysis for the results store (never blocks on the database)"""
+    store = get_results_store()
+    if store is not None:
+        store.record(results, transcript, student_id, cohort_id)
+
+def score_and_record(transcript, duration_seconds=52, student_id=None, cohort_id=None, language=None):
+    results = score_transcript(transcript, duration_seconds, language=language)
+    record_result(results, transcript, student_id, cohort_id)
+    return results
+
+def owner_ids(data):
+    """(student_id, cohort_id) from a request body, as strings or None"""
+    if not isinstance(data, dict):
+        return None, None
+    return tuple(None if data.get(key) in (None, '') else str(data[key]) for key in ('student_id', 'cohort_id'))
+
+# Live transcription sessions of this worker process (singleton pattern)
+session_store = None
+session_store_lock = threading.Lock()
+
+def get_session_store():
+    global session_store
+    if session_store is None:
+        with session_store_lock:
+            if session_store is None:
+                session_store = streaming.SessionStore()
+    return session_store
+
+# Admission control in front of the analysis endpoints (singleton pattern);
+# POSTs to these take a token, and all but the live stream hold a slot
+ADMITTED_ENDPOINTS = ('/api/analyze', '/api/analyze/batch', '/api/jobs', '/api/sessions',
+                      '/api/sessions/<session_id>/delta', '/api/sessions/<session_id>/finish',
+                      '/api/sessions/stream')
+UNSLOTTED_ENDPOINTS = ('/api/sessions/stream',)
+admission_controller = None
+admission_controller_lock = threading.Lock()
+
+def get_admission_controller():
+    global admission_controller
+    if admission_controller is None:
+        with admission_controller_lock:
+            if admission_controller is None:
+                admission_controller = admission.process_controller(GRAMMAR_WORKERS)
+    return admission_controller
+
+def observe_admission(controller):
+    ADMISSION_QUEUE_DEPTH.set(controller.queued)
+    ADMISSION_ACTIVE.set(controller.active)
+
+def admission_rejected(e):
+    """429 body for a rejected request; the caller adds Retry-After"""
+    ADMISSION_REJECTIONS.inc(reason=e.reason)
+    return {'error': f'Too many requests ({e.reason}), retry after {e.retry_after}s',
+            'reason': e.reason, 'retry_after': e.retry_after}
+
+# Profile trace directory writer (singleton pattern); None when PROFILE_DIR is ''
+trace_writer = None
+trace_writer_lock = threading.Lock()
+
+def get_trace_writer():
+    global trace_writer
+    if trace_writer is None and profiling.PROFILE_DIR:
+        with trace_writer_lock:
+            if trace_writer is None:
+                trace_writer = profiling.TraceWriter()
+    return trace_writer
+
+def request_profile():
+    """(mode, inline) for the current request: asked for explicitly, sampled, or (None, False)"""
+    if profiling.may_request(request.headers.get(profiling.TOKEN_HEADER)):
+        mode = profiling.parse_mode(request.headers.get(profiling.PROFILE_HEADER) or request.args.get('profile'))
+        if mode:
+            return mode, True
+    if profiling.sampled():
+        return profiling.PROFILE_SAMPLE_MODE, False
+    return None, False
+
+def profile_transcript(transcript, duration_seconds, mode, timings, detailed=True, language=None):
+    """score_transcript() under a profiler; returns (results, trace)"""
+    with profiling.Profiler(mode) as profiler:
+        results = score_transcript(transcript, duration_seconds, timings=timings, use_cache=False,
+                                   detailed=detailed, language=language)
+    trace = profiler.trace(
+        timings,
+        endpoint=request_endpoint(),
+        transcript_hash=results_store.transcript_hash(transcript),
+        word_count=results.get('word_count'),
+        duration_seconds=duration_seconds,
+        rubric_version=results.get('rubric_version'),
+        degraded=bool(results.get('degraded'))
+    )
+    # An unwritable PROFILE_DIR costs the trace file, not the response
+    try:
+        writer = get_trace_writer()
+        if writer is not None:
+            trace['path'] = writer.write(trace)
+    except OSError as e:
+        app.logger.warning('Could not write profile trace: %s', e)
+    return results, trace
+
+# Startup and warm-up measurements, reported by /api/health
+WARM_UP_TRANSCRIPT = ("Hello everyone, myself Asha. I am 13 years old and I study in class 8. "
+                      "I live with my family and I enjoy playing cricket. Thank you for listening.")
+startup_stats = {
+    'pid': os.getpid(),
+    'import_seconds': None,
+    'warm_up_seconds': None,
+    'grammar_warm_up_seconds': None,
+    'first_request_ms': None,
+    'state': 'cold'
+}
+
+def warm_up():
+    """Load shared read-only resources (sentiment lexicon, compiled matchers).
+
+    Safe to run in the gunicorn master with --preload: nothing started here
+    holds threads, sockets or subprocesses, so workers inherit it via fork.
+    """
+    if startup_stats['warm_up_seconds'] is not None:
+        return
+    start = time.perf_counter()
+    get_sentiment_engine()
+    get_rubric()
+    # Exercise every inline criterion once (grammar is skipped: not fork-safe)
+    SpeechAnalyzer(WARM_UP_TRANSCRIPT, grammar_error_count=0).analyze(mode='sequential')
+    metrics.REGISTRY.reset()
+    startup_stats['warm_up_seconds'] = round(time.perf_counter() - start, 3)
+
+def reset_after_fork():
+    """Drop process-local resources a forked worker must not share with its parent"""
+    global grammar_checkers, batch_executor, grammar_executor, job_queue, results_db, admission_controller
+    global near_duplicate_index
+    grammar_checkers = None
+    near_duplicate_index = None
+    batch_executor = None
+    grammar_executor = None
+    job_queue = None
+    results_db = None
+    admission_controller = None
+    metrics.REGISTRY.reset()
+    startup_stats['pid'] = os.getpid()
+
+def warm_up_worker():
+    """Per-worker warm-up after fork; the worker reports ready once it finishes"""
+    reset_after_fork()
+    warm_up()
+    metrics.REGISTRY.start_flusher()
+    startup_stats['state'] = 'warming'
+    threading.Thread(target=_warm_up_grammar, name='grammar-warm-up', daemon=True).start()
+
+def _warm_up_grammar():
+    start = time.perf_counter()
+    try:
+        get_grammar_tool().check(WARM_UP_TRANSCRIPT)
+    except Exception:
+        app.logger.warning('Grammar backend warm-up failed; requests will fall back if it stays down')
+    startup_stats['grammar_warm_up_seconds'] = round(time.perf_counter() - start, 3)
+    startup_stats['state'] = 'ready'
+
+def format_server_timing(timings):
+    """Format stage timings (milliseconds) as a Server-Timing header value"""
+    return ', '.join(f'{stage};dur={duration}' for stage, duration in timings.items())
+
+def score_grammar(error_count, word_count, rubric):
+    """Convert a grammar error count into the grammar criterion result"""
+    errors_per_100 = (error_count / word_count) * 100 if word_count > 0 else 0
+    
+    grammar_ratio = max(0, 1 - min(errors_per_100 / 10, 1))
+    score = rubric.bands['grammar'].lookup(grammar_ratio)
+    
+    return {
+        'error_count': error_count,
+        'errors_per_100': round(errors_per_100, 2),
+        'grammar_ratio': round(grammar_ratio, 2),
+        'score': score
+    }
+
+def check_grammar_batch(texts, max_chars=BATCH_GRAMMAR_CHUNK_CHARS, language=None):
+    """Per-sentence grammar error counts of many texts, counted as for a single transcript.
+
+    Every text is split with ``grammar_spans`` and looked up in the sentence
+    cache. The unknown sentences of all texts are checked in GrammarWindows,
+    packed into chunks of roughly ``max_chars`` characters and checked
+    concurrently on the shared batch pool. Returns one list of sentence counts
+    per text, or None where a chunk holding part of that text failed.
+    """
+    language = language or get_rubric().grammar_language
+    lookups, windows, owners = [], [], []
+    for index, text in enumerate(texts):
+        spans = grammar_spans(text)
+        sentences = [text[start:end] for start, end in spans]
+        counts = cached_sentence_errors(sentences, language)
+        text_windows = grammar_windows(text, spans, counts)
+        lookups.append((sentences, counts, text_windows))
+        windows.extend(text_windows)
+        owners.extend([index] * len(text_windows))
+    
+    offsets = check_windows(windows, language, max_chars, strict=False) if windows else []
+    found = [[] for _ in texts]
+    for owner, window_offsets in zip(owners, offsets):
+        found[owner].append(window_offsets)
+    
+    error_counts = []
+    for (sentences, counts, text_windows), text_offsets in zip(lookups, found):
+        if any(window_offsets is None for window_offsets in text_offsets):
+            # This transcript falls back to its own check during analysis
+            error_counts.append(None)
+        else:
+            error_counts.append(merge_sentence_errors(sentences, counts, text_windows, text_offsets, language))
+    return error_counts
+
+# (name, max_score) of every criterion, in response order
+CRITERIA = (
+    ('Content & Structure', 40),
+    ('Speech Rate', 10),
+    ('Language & Grammar', 15),
+    ('Vocabulary Richness', 10),
+    ('Clarity', 10),
+    ('Engagement', 15)
+)
 
 class SpeechAnalyzer:
-    def __init__(self, transcript, duration_seconds=52):
-        self.transcript = transcript.strip()
+    def __init__(self, transcript, duration_seconds=52, grammar_error_count=None, rubric=None, reuse=None):
+        # One rubric for the whole analysis, even if it is reloaded meanwhile
+        self.rubric = rubric or get_rubric()
+        # Tokenize once; every analyzer reads from this document
+        self.doc = Document(transcript)
+        self.transcript = self.doc.text
         self.duration_seconds = duration_seconds
-        self.words = self.transcript.lower().split()
-        self.word_count = len(self.words)
-        self.sentences = [s.strip() for s in re.split(r'[.!?]+', self.transcript) if s.strip()]
-        self.sentence_count = len(self.sentences)
-        
-        # Filler words list
-        self.filler_words = [
-            'um', 'uh', 'like', 'you know', 'so', 'actually', 'basically', 
-            'right', 'i mean', 'well', 'kinda', 'sort of', 'okay', 'hmm', 'ah'
-        ]
+        # Precomputed by batch scoring; None means check with LanguageTool
+        self.grammar_error_count = grammar_error_count
+        self._grammar_future = None
+        self._grammar_deadline = None
+        # Set when a criterion fell back to an estimate
+        self.degraded = False
+        # Wall-clock milliseconds per stage of the last analyze() call
+        self.stage_timings = {}
+        self.word_count = self.doc.word_count
+        self.sentences = self.doc.sentences
+        self.sentence_count = self.doc.sentence_count
+        self._phrase_hits = None
+        # A near-duplicate's AnalysisReuse (NO_REUSE if none); None skips collecting our own
+        self.reuse = reuse
+        self.sentence_errors = None
+        self.sentiment_pieces = None
+    
+    @property
+    def phrase_hits(self):
+        """All rubric phrase occurrences, found in a single pass over the lowered transcript"""
+        if self._phrase_hits is None:
+            self._phrase_hits = self.rubric.matcher.scan(self.doc.lower, self.doc.sentence_spans)
+        return self._phrase_hits
     
     def calculate_wpm(self):
         """Calculate words per minute"""
@@ -42,62 +745,31 @@ class SpeechAnalyzer:
     def analyze_salutation(self):
         """Analyze salutation and return score"""
         first_sentence = self.sentences[0].lower() if self.sentences else ""
+        hits = self.phrase_hits
         
-        excellent_phrases = ['excited to introduce', 'feeling great', 'pleasure to introduce']
-        good_phrases = ['good morning', 'good afternoon', 'good evening', 'good day', 'hello everyone']
-        normal_phrases = ['hi', 'hello']
-        
-        for phrase in excellent_phrases:
-            if phrase in first_sentence:
-                return 5, 'Excellent', first_sentence
-        
-        for phrase in good_phrases:
-            if phrase in first_sentence:
-                return 4, 'Good', first_sentence
+        # Tiers are ordered best first; the first one found in the opening sentence wins
+        for tier in self.rubric.salutation_tiers:
+            if hits.contains_any(tier.phrases, sentence=0):
+                return tier.score, tier.label, first_sentence
         
-        for phrase in normal_phrases:
-            if phrase in first_sentence:
-                return 2, 'Normal', first_sentence
-        
-        return 0, 'No Salutation', first_sentence
+        label, score = self.rubric.no_salutation
+        return score, label, first_sentence
     
     def analyze_keywords(self):
         """Analyze presence of must-have and good-to-have keywords"""
-        text_lower = self.transcript.lower()
-        
-        must_have = {
-            'name': ['name', 'myself', 'i am', "i'm"],
-            'age': ['year', 'age', 'old'],
-            'school': ['school', 'class', 'grade', 'studying'],
-            'family': ['family', 'mother', 'father', 'parents', 'siblings', 'brother', 'sister'],
-            'hobbies': ['hobby', 'hobbies', 'enjoy', 'like', 'love', 'play', 'interest']
-        }
-        
-        good_to_have = {
-            'family_details': ['kind', 'caring', 'supportive', 'members', 'people in my family'],
-            'location': ['from', 'live in', 'native', 'hometown'],
-            'ambition': ['want to', 'goal', 'dream', 'ambition', 'aspire', 'future'],
-            'unique_fact': ['fun fact', 'interesting', 'unique', 'special thing'],
-            'strengths': ['strength', 'achievement', 'good at', 'excel']
-        }
+        hits = self.phrase_hits
+        rubric = self.rubric
         
-        must_have_found = []
-        must_have_score = 0
+        whole_words = rubric.whole_word_keywords
+        must_have_found = [category for category, keywords in rubric.must_have
+                           if hits.contains_any(keywords, whole_words=whole_words)]
+        must_have_score = len(must_have_found) * rubric.must_have_points
         
-        for category, keywords in must_have.items():
-            if any(keyword in text_lower for keyword in keywords):
-                must_have_found.append(category)
-                must_have_score += 4
+        good_to_have_found = [category for category, keywords in rubric.good_to_have
+                              if hits.contains_any(keywords, whole_words=whole_words)]
+        good_to_have_score = len(good_to_have_found) * rubric.good_to_have_points
         
-        good_to_have_found = []
-        good_to_have_score = 0
-        
-        for category, keywords in good_to_have.items():
-            if any(keyword in text_lower for keyword in keywords):
-                good_to_have_found.append(category)
-                good_to_have_score += 2
-        
-        total_score = min(must_have_score + good_to_have_score, 20)
+        total_score = min(must_have_score + good_to_have_score, rubric.keyword_max_score)
         
         return {
             'must_have': must_have_found,
@@ -107,86 +779,84 @@ class SpeechAnalyzer:
     
     def analyze_flow(self):
         """Analyze if introduction follows proper order"""
-        text_lower = self.transcript.lower()
-        sentences_lower = [s.lower() for s in self.sentences]
+        hits = self.phrase_hits
+        flow = self.rubric.flow
+        last_sentence = self.sentence_count - 1
         
         # Check order: Salutation -> Name -> Basic Details -> Additional -> Closing
-        has_salutation = any(word in sentences_lower[0] if sentences_lower else "" 
-                            for word in ['hi', 'hello', 'good morning', 'good afternoon', 'good evening'])
+        has_salutation = hits.contains_any(flow.salutation_words, sentence=0)
         
         # Find positions
-        name_pos = next((i for i, s in enumerate(sentences_lower) 
-                        if any(word in s for word in ['myself', 'i am', 'my name'])), -1)
+        name_pos = hits.first_sentence_with(flow.name_words)
         
-        closing_words = ['thank', 'thanks', 'grateful']
-        has_closing = any(word in sentences_lower[-1] if sentences_lower else "" 
-                         for word in closing_words)
+        has_closing = last_sentence >= 0 and hits.contains_any(flow.closing_words, sentence=last_sentence)
         
         # Simple order check
-        if has_salutation and name_pos >= 0 and (name_pos <= 2):
+        if has_salutation and 0 <= name_pos < flow.name_within_sentences:
             if has_closing:
-                return 15, "Good flow with proper opening and closing"
-            return 13, "Good flow but could improve closing"
+                return flow.scores['complete']
+            return flow.scores['no_closing']
         
-        return 10, "Flow could be improved - consider: Salutation → Name → Details → Closing"
+        return flow.scores['unordered']
+    
+    def start_grammar_check(self):
+        """Start the LanguageTool check in the background so other criteria run meanwhile"""
+        if self.grammar_error_count is None and self._grammar_future is None:
+            self._grammar_deadline = time.monotonic() + GRAMMAR_TIMEOUT_SECONDS
+            self._grammar_future = get_grammar_executor().submit(
+                self._timed, 'grammar_check', self._count_grammar_errors
+            )
     
     def analyze_grammar(self):
-        """Analyze grammar errors using LanguageTool"""
+        """Analyze grammar errors using LanguageTool within the latency budget"""
+        if self.grammar_error_count is not None:
+            return score_grammar(self.grammar_error_count, self.word_count, self.rubric)
+        self.start_grammar_check()
         try:
-            tool = get_grammar_tool()
-            matches = tool.check(self.transcript)
-            error_count = len(matches)
-            errors_per_100 = (error_count / self.word_count) * 100 if self.word_count > 0 else 0
-            
-            grammar_ratio = max(0, 1 - min(errors_per_100 / 10, 1))
-            
-            if grammar_ratio >= 0.9:
-                score = 15
-            elif grammar_ratio >= 0.7:
-                score = 12
-            elif grammar_ratio >= 0.5:
-                score = 9
-            elif grammar_ratio >= 0.3:
-                score = 6
-            else:
-                score = 3
-            
-            return {
-                'error_count': error_count,
-                'errors_per_100': round(errors_per_100, 2),
-                'grammar_ratio': round(grammar_ratio, 2),
-                'score': score
-            }
+            remaining = max(0, self._grammar_deadline - time.monotonic())
+            error_count = self._grammar_future.result(timeout=remaining)
+        except FutureTimeoutError:
+            self._grammar_future.cancel()
+            GRAMMAR_ERRORS.inc(reason='timeout')
+            return self._degraded_grammar('timeout')
         except Exception as e:
-            # Fallback if LanguageTool fails
-            return {
-                'error_count': 0,
-                'errors_per_100': 0,
-                'grammar_ratio': 1.0,
-                'score': 15
-            }
+            GRAMMAR_ERRORS.inc(reason='error')
+            app.logger.warning('Grammar check failed, using heuristics: %s', e)
+            return self._degraded_grammar('error')
+        return score_grammar(error_count, self.word_count, self.rubric)
+    
+    def _count_grammar_errors(self):
+        self.sentence_errors = sentence_errors(self.transcript, self.doc.grammar_spans,
+                                               self.rubric.grammar_language, self.known_errors())
+        return sum(self.sentence_errors)
+    
+    def known_errors(self):
+        """Error counts by sentence hash from a near-duplicate checked in the same language"""
+        reuse = self.reuse
+        if reuse is None or reuse.grammar_language != self.rubric.grammar_language:
+            return None
+        return reuse.grammar
+    
+    def _degraded_grammar(self, reason):
+        """Estimate grammar with the built-in heuristics when LanguageTool is unavailable"""
+        self.degraded = True
+        GRAMMAR_FALLBACKS.inc(reason=reason)
+        result = score_grammar(len(heuristic_matches(self.transcript)), self.word_count, self.rubric)
+        result.update({'degraded': True, 'fallback': 'heuristic', 'reason': reason})
+        return result
+    
+    def _distinct_words(self):
+        return self.doc.distinct_words
     
     def analyze_vocabulary_richness(self):
         """Calculate Type-Token Ratio (TTR)"""
         if self.word_count == 0:
             return {'distinct_words': 0, 'total_words': 0, 'ttr': 0, 'score': 0}
         
-        # Clean words
-        cleaned_words = [re.sub(r'[^\w\s]', '', word) for word in self.words]
-        distinct_words = len(set(cleaned_words))
+        distinct_words = self._distinct_words()
         
         ttr = distinct_words / self.word_count
-        
-        if ttr > 0.9:
-            score = 10
-        elif ttr >= 0.7:
-            score = 8
-        elif ttr >= 0.5:
-            score = 6
-        elif ttr >= 0.3:
-            score = 4
-        else:
-            score = 2
+        score = self.rubric.bands['vocabulary'].lookup(ttr)
         
         return {
             'distinct_words': distinct_words,
@@ -195,68 +865,83 @@ class SpeechAnalyzer:
             'score': score
         }
     
-    def analyze_filler_words(self):
-        """Calculate filler word rate"""
-        text_lower = self.transcript.lower()
-        filler_count = 0
-        filler_words_found = []
-        
-        for filler in self.filler_words:
-            if ' ' in filler:  # Multi-word fillers
-                count = text_lower.count(filler)
-                if count > 0:
-                    filler_count += count
-                    filler_words_found.append(f"{filler} ({count})")
-            else:  # Single word fillers
-                pattern = r'\b' + re.escape(filler) + r'\b'
-                matches = re.findall(pattern, text_lower)
-                if matches:
-                    filler_count += len(matches)
-                    filler_words_found.append(f"{filler} ({len(matches)})")
+    def _filler_counts(self):
+        """(filler, count) for every filler word that occurs"""
+        hits = self.phrase_hits
+        counts = []
+        for filler in self.rubric.filler_words:
+            # Multi-word fillers count every occurrence, single words only whole words
+            count = hits.count(filler, whole_word=' ' not in filler)
+            if count > 0:
+                counts.append((filler, count))
+        return counts
+    
+    def analyze_filler_words(self, detailed=True):
+        """Calculate filler word rate; the list of fillers found only when detailed"""
+        filler_counts = self._filler_counts()
+        filler_count = sum(count for _, count in filler_counts)
         
         filler_rate = (filler_count / self.word_count * 100) if self.word_count > 0 else 0
+        score = self.rubric.bands['filler_rate'].lookup(filler_rate)
         
-        if filler_rate < 0.3:
-            score = 10
-        elif filler_rate < 0.5:
-            score = 8
-        elif filler_rate < 0.7:
-            score = 6
-        elif filler_rate < 0.9:
-            score = 4
-        else:
-            score = 2
-        
-        return {
+        result = {
             'filler_count': filler_count,
             'filler_rate': round(filler_rate, 2),
-            'filler_words_found': filler_words_found,
             'score': score
         }
+        if detailed:
+            result['filler_words_found'] = [f"{filler} ({count})" for filler, count in filler_counts]
+        return result
+    
+    def _polarity(self):
+        engine = get_sentiment_engine()
+        if self.reuse is not None and hasattr(engine, 'piece_assessments'):
+            polarity = self._piecewise_polarity(engine)
+            if polarity is not None:
+                return polarity
+        # Same polarity as TextBlob(text).sentiment, fed from the shared tokens
+        return engine.polarity(self.doc.text, self.doc.text_tokens())
+    
+    def _piecewise_polarity(self, engine):
+        """Polarity assembled sentence piece by piece, reusing a near-duplicate's pieces; None if it can't be"""
+        pieces = self.doc.sentence_pieces()
+        if pieces is None:
+            return None
+        known = self.reuse.sentiment
+        assessed = {}
+        reused = 0
+        for piece in pieces:
+            key = hash(piece)
+            if key not in assessed:
+                result = known.get(key)
+                if result is None:
+                    result = engine.piece_assessments(piece)
+                else:
+                    reused += 1
+                assessed[key] = result
+        CACHE_LOOKUPS.inc(reused, cache='near_duplicate_sentiment', result='hit')
+        CACHE_LOOKUPS.inc(len(assessed) - reused, cache='near_duplicate_sentiment', result='miss')
+        self.sentiment_pieces = assessed
+        assessments = sentiment_backends.compose(assessed[hash(piece)] for piece in pieces)
+        return None if assessments is None else sentiment_backends.mean_polarity(assessments)
+    
+    def reuse_results(self):
+        """This analysis's AnalysisReuse, for the near-duplicate index"""
+        grammar = None
+        if self.sentence_errors is not None:
+            grammar = {hash(sentence): count
+                       for sentence, count in zip(self.doc.grammar_sentences(), self.sentence_errors)}
+        return AnalysisReuse(self.rubric.grammar_language, grammar, self.sentiment_pieces or {})
     
     def analyze_sentiment(self):
-        """Analyze sentiment/positivity using TextBlob"""
-        blob = TextBlob(self.transcript)
-        polarity = blob.sentiment.polarity  # -1 to 1
+        """Analyze sentiment/positivity using TextBlob's pattern lexicon"""
+        polarity = self._polarity()  # -1 to 1
         
         # Convert to 0-1 scale for positive probability
         positive_probability = (polarity + 1) / 2
-        
-        if positive_probability >= 0.9:
-            score = 15
-            sentiment = 'Positive'
-        elif positive_probability >= 0.7:
-            score = 12
-            sentiment = 'Positive'
-        elif positive_probability >= 0.5:
-            score = 9
-            sentiment = 'Neutral'
-        elif positive_probability >= 0.3:
-            score = 6
-            sentiment = 'Neutral'
-        else:
-            score = 3
-            sentiment = 'Negative'
+        bands = self.rubric.bands['sentiment']
+        score = bands.lookup(positive_probability)
+        sentiment = bands.label(positive_probability)
         
         return {
             'sentiment': sentiment,
@@ -264,45 +949,79 @@ class SpeechAnalyzer:
             'score': score
         }
     
-    def analyze(self):
-        """Perform complete analysis"""
+    def features(self):
+        """Raw inputs of every criterion, for vectorized batch scoring (see batch_scoring)"""
+        salutation_score, _, _ = self.analyze_salutation()
+        flow_score, _ = self.analyze_flow()
+        return {
+            'word_count': self.word_count,
+            'distinct_words': self._distinct_words(),
+            'filler_count': sum(count for _, count in self._filler_counts()),
+            'wpm': self.calculate_wpm(),
+            'polarity': self._polarity(),
+            'content_score': salutation_score + self.analyze_keywords()['score'] + flow_score
+        }
+    
+    def _timed(self, stage, func, *args):
+        """Call func and record its duration under stage in stage_timings"""
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_timings[stage] = round(elapsed * 1000, 3)
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+    
+    def analyze(self, mode=None, detailed=True):
+        """Perform complete analysis.
+
+        In 'concurrent' mode the grammar check (a LanguageTool round-trip) runs
+        on the grammar pool while the cheap criteria are scored inline, so the
+        critical path is the grammar call alone. 'sequential' scores each
+        criterion in turn. Both produce the same criteria structure.
+        
+        ``detailed=False`` gives the same scores with each criterion reduced to
+        name, score and max_score and no summary; the feedback and details
+        are never built.
+        """
+        mode = mode or ANALYZE_MODE
+        start = time.perf_counter()
+        self.stage_timings = {}
+        TRANSCRIPT_WORDS.observe(self.word_count)
+        
+        # Grammar is the slow stage; it runs while the other criteria are scored
+        if mode == 'concurrent':
+            self.start_grammar_check()
         wpm = self.calculate_wpm()
         
         # Content & Structure (40 points)
-        salutation_score, salutation_type, salutation_text = self.analyze_salutation()
-        keywords_result = self.analyze_keywords()
-        flow_score, flow_feedback = self.analyze_flow()
+        salutation_score, salutation_type, salutation_text = self._timed('salutation', self.analyze_salutation)
+        keywords_result = self._timed('keywords', self.analyze_keywords)
+        flow_score, flow_feedback = self._timed('flow', self.analyze_flow)
         
         content_score = salutation_score + keywords_result['score'] + flow_score
         
         # Speech Rate (10 points)
-        if wpm > 161:
-            speech_score = 2
-            speech_category = 'Too Fast'
-        elif wpm >= 141:
-            speech_score = 6
-            speech_category = 'Fast'
-        elif wpm >= 111:
-            speech_score = 10
-            speech_category = 'Ideal'
-        elif wpm >= 81:
-            speech_score = 6
-            speech_category = 'Slow'
-        else:
-            speech_score = 2
-            speech_category = 'Too Slow'
+        speech_bands = self.rubric.bands['speech_rate']
+        speech_score = speech_bands.lookup(wpm)
+        speech_category = speech_bands.label(wpm)
         
-        # Grammar (15 points)
-        grammar_result = self.analyze_grammar()
+        # Grammar (15 points); in concurrent mode it is collected last
+        if mode != 'concurrent':
+            grammar_result = self._timed('grammar', self.analyze_grammar)
         
         # Vocabulary (10 points)
-        vocab_result = self.analyze_vocabulary_richness()
+        vocab_result = self._timed('vocabulary', self.analyze_vocabulary_richness)
         
         # Clarity (10 points)
-        filler_result = self.analyze_filler_words()
+        filler_result = self._timed('filler_words', self.analyze_filler_words, detailed)
         
         # Engagement (15 points)
-        sentiment_result = self.analyze_sentiment()
+        sentiment_result = self._timed('sentiment', self.analyze_sentiment)
+        
+        if mode == 'concurrent':
+            # Time spent blocked on grammar after the inline criteria finished
+            grammar_result = self._timed('grammar_wait', self.analyze_grammar)
         
         # Calculate overall score
         overall_score = (
@@ -314,6 +1033,23 @@ class SpeechAnalyzer:
             sentiment_result['score']
         )
         
+        if not detailed:
+            self.stage_timings['total'] = round((time.perf_counter() - start) * 1000, 3)
+            scores = (content_score, speech_score, grammar_result['score'], vocab_result['score'],
+                      filler_result['score'], sentiment_result['score'])
+            return {
+                'overall_score': overall_score,
+                'word_count': self.word_count,
+                'sentence_count': self.sentence_count,
+                'duration_seconds': self.duration_seconds,
+                'wpm': wpm,
+                'criteria': [{'name': name, 'score': score, 'max_score': max_score}
+                             for (name, max_score), score in zip(CRITERIA, scores)],
+                'degraded': self.degraded,
+                'rubric_version': self.rubric.version,
+                'language': self.rubric.language
+            }
+        
         # Generate feedback
         criteria = [
             {
@@ -346,7 +1082,8 @@ class SpeechAnalyzer:
                 'max_score': 15,
                 'details': grammar_result,
                 'feedback': f"Found {grammar_result['error_count']} grammar issues. " +
-                           ("Excellent grammar!" if grammar_result['score'] >= 12 else "Review grammar for improvement.")
+                           ("Excellent grammar!" if grammar_result['score'] >= 12 else "Review grammar for improvement.") +
+                           (" (Estimated: grammar service unavailable.)" if grammar_result.get('degraded') else "")
             },
             {
                 'name': 'Vocabulary Richness',
@@ -375,6 +1112,7 @@ class SpeechAnalyzer:
         ]
         
         summary = self._generate_summary(overall_score, criteria)
+        self.stage_timings['total'] = round((time.perf_counter() - start) * 1000, 3)
         
         return {
             'overall_score': overall_score,
@@ -383,7 +1121,10 @@ class SpeechAnalyzer:
             'duration_seconds': self.duration_seconds,
             'wpm': wpm,
             'criteria': criteria,
-            'summary': summary
+            'summary': summary,
+            'degraded': self.degraded,
+            'rubric_version': self.rubric.version,
+            'language': self.rubric.language
         }
     
     def _generate_content_feedback(self, sal_score, keywords, flow_score):
@@ -394,7 +1135,7 @@ class SpeechAnalyzer:
         else:
             feedback.append("Consider a more engaging greeting.")
         
-        missing_must = 5 - len(keywords['must_have'])
+        missing_must = len(self.rubric.must_have) - len(keywords['must_have'])
         if missing_must > 0:
             feedback.append(f"Missing {missing_must} key details.")
         else:
@@ -421,6 +1162,224 @@ class SpeechAnalyzer:
         
         return f"{overall} Focus on improving: {weakest['name']} for better results."
 
+class SessionAnalyzer(SpeechAnalyzer):
+    """SpeechAnalyzer criteria over a streaming session's running totals instead of a Document"""
+    
+    def __init__(self, snapshot, duration_seconds, rubric):
+        self.rubric = rubric
+        self.snapshot = snapshot
+        self.duration_seconds = duration_seconds
+        self.word_count = snapshot.word_count
+        self.sentences = snapshot.sentences
+        self.sentence_count = len(snapshot.sentences)
+        self._phrase_hits = snapshot.hits
+        self.degraded = False
+    
+    def _distinct_words(self):
+        return self.snapshot.distinct_words
+    
+    def _polarity(self):
+        return self.snapshot.polarity
+
+def open_session(language=None):
+    """Start the running state of a new streaming session under the locale's current rubric"""
+    return streaming.StreamState(get_rubric(language), get_sentiment_engine())
+
+def count_session_errors(sentences, language):
+    """Grammar errors of a session's newly completed sentences (provisional; finishing rechecks the transcript)"""
+    return sum(count_grammar_errors(sentences, language))
+
+def check_session_grammar(session, sentences):
+    """Add the grammar errors of newly completed sentences, within the latency budget"""
+    if not sentences:
+        return
+    future = get_grammar_executor().submit(count_session_errors, sentences, session.state.rubric.grammar_language)
+    try:
+        session.state.grammar_errors += future.result(timeout=GRAMMAR_TIMEOUT_SECONDS)
+        return
+    except FutureTimeoutError:
+        future.cancel()
+        reason = 'timeout'
+    except Exception as e:
+        app.logger.warning('Grammar check failed, using heuristics: %s', e)
+        reason = 'error'
+    GRAMMAR_ERRORS.inc(reason=reason)
+    GRAMMAR_FALLBACKS.inc(reason=reason)
+    session.degraded = True
+    session.state.grammar_errors += sum(len(heuristic_matches(sentence)) for sentence in sentences)
+
+def score_session(session):
+    """Provisional scores of everything streamed so far"""
+    state = session.state
+    snapshot = state.snapshot()
+    analyzer = SessionAnalyzer(snapshot, session.elapsed(), state.rubric)
+    features = analyzer.features()
+    keywords = analyzer.analyze_keywords()
+    columns = batch_scoring.feature_columns([features], [state.grammar_errors])
+    scores = batch_scoring.to_records(batch_scoring.score_columns(columns, state.rubric))[0]
+    return {
+        'session_id': session.session_id,
+        'provisional': True,
+        'overall_score': scores['overall_score'],
+        'word_count': snapshot.word_count,
+        'sentence_count': len(snapshot.sentences),
+        'duration_seconds': analyzer.duration_seconds,
+        'wpm': features['wpm'],
+        'scores': {name: scores[name] for name in batch_scoring.SCORE_COLUMNS},
+        'speech_category': scores['speech_category'],
+        'sentiment': scores['sentiment'],
+        'keywords_found': {'must_have': keywords['must_have'], 'good_to_have': keywords['good_to_have']},
+        'filler_count': features['filler_count'],
+        'grammar_errors': state.grammar_errors,
+        'degraded': session.degraded,
+        'rubric_version': state.rubric.version
+    }
+
+def apply_delta(session, text, duration_seconds=None):
+    """Append a transcript delta to a session and return its provisional scores"""
+    with session.lock:
+        if duration_seconds is not None:
+            session.duration_seconds = duration_seconds
+        check_session_grammar(session, session.state.append(text))
+        return score_session(session)
+
+def finish_session(session, duration_seconds=None):
+    """Final full analysis of a session's complete transcript"""
+    with session.lock:
+        if duration_seconds is not None:
+            session.duration_seconds = duration_seconds
+        transcript = session.state.text
+        if not transcript.strip():
+            return None
+        results = score_and_record(transcript, session.elapsed(), session.student_id, session.cohort_id,
+                                   session.state.rubric.language)
+    results['session_id'] = session.session_id
+    results['provisional'] = False
+    return results
+
+def request_endpoint():
+    """Route pattern of the current request (bounded label cardinality)"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.endpoint = request_endpoint()
+    REQUESTS_IN_FLIGHT.inc(endpoint=g.endpoint)
+    REQUEST_BYTES.observe(request.content_length or 0, endpoint=g.endpoint)
+
+@app.before_request
+def enforce_body_limit():
+    """Reject oversized bodies with 413 before admission or any route parses them"""
+    if not MAX_REQUEST_BYTES or request.method not in ('POST', 'PUT', 'PATCH'):
+        return None
+    if request.content_length is not None:
+        if request.content_length > MAX_REQUEST_BYTES:
+            return request_too_large()
+    elif g.endpoint != '/api/sessions/stream':
+        # Chunked bodies have no length up front and are read only up to the
+        # limit, so a body that fills it is treated as oversized
+        if len(request.get_data()) >= MAX_REQUEST_BYTES:
+            return request_too_large()
+    return None
+
+@app.before_request
+def admit_request():
+    """Per-client rate limit and fair queuing before an analysis slot is taken"""
+    if (not admission.ADMISSION_ENABLED or request.method != 'POST'
+            or g.endpoint not in ADMITTED_ENDPOINTS):
+        return None
+    controller = get_admission_controller()
+    client = admission.client_id(request.remote_addr, request.headers.get(admission.CLIENT_HEADER),
+                                 request.headers.get(admission.FORWARDED_HEADER))
+    try:
+        if g.endpoint in UNSLOTTED_ENDPOINTS:
+            controller.charge(client)
+            return None
+        ticket = controller.admit(client, cost=admission_cost())
+        observe_admission(controller)
+        controller.wait(ticket)
+    except admission.Rejected as e:
+        observe_admission(controller)
+        response = jsonify(admission_rejected(e))
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    g.admission_ticket = ticket
+    ADMISSION_WAIT_SECONDS.observe(ticket.waited)
+    observe_admission(controller)
+    return None
+
+def admission_cost():
+    """Tokens the current request costs: one per batch item, else one"""
+    if g.endpoint != '/api/analyze/batch':
+        return 1
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    return max(1, min(len(items), BATCH_MAX_ITEMS)) if isinstance(items, list) else 1
+
+@app.errorhandler(RequestEntityTooLarge)
+def handle_request_too_large(e):
+    return request_too_large()
+
+def request_too_large():
+    return jsonify({'error': f'Request body exceeds the limit of {MAX_REQUEST_BYTES} bytes',
+                    'max_bytes': MAX_REQUEST_BYTES}), 413
+
+def too_many_words(text, already=0):
+    """True if ``already`` words plus those of text exceed MAX_TRANSCRIPT_WORDS"""
+    if not MAX_TRANSCRIPT_WORDS or not text.strip():
+        return False
+    if already >= MAX_TRANSCRIPT_WORDS:
+        return True
+    return exceeds_word_limit(text, MAX_TRANSCRIPT_WORDS - already)
+
+def request_language(data):
+    """Locale asked for in the request body or query string, or None for the default"""
+    language = data.get('language') if isinstance(data, dict) else None
+    return language or request.args.get('language')
+
+def word_limit_error():
+    return {'error': f'Transcript exceeds the limit of {MAX_TRANSCRIPT_WORDS} words',
+            'max_words': MAX_TRANSCRIPT_WORDS}
+
+@app.after_request
+def record_request(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(elapsed, endpoint=g.endpoint, method=request.method,
+                                status=str(response.status_code))
+        if startup_stats['first_request_ms'] is None and g.endpoint == '/api/analyze':
+            startup_stats['first_request_ms'] = round(elapsed * 1000, 3)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """gzip or brotli for large JSON bodies, as the client's Accept-Encoding allows"""
+    if (not response_format.RESPONSE_COMPRESSION or response.direct_passthrough or response.is_streamed
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < response_format.COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = response_format.choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is not None:
+        response.set_data(response_format.compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.teardown_request
+def finish_request(exc=None):
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        controller = get_admission_controller()
+        controller.release(ticket)
+        observe_admission(controller)
+    endpoint = g.pop('endpoint', None)
+    if endpoint is not None:
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     try:
@@ -430,18 +1389,340 @@ def analyze():
         
         if not transcript:
             return jsonify({'error': 'Transcript is required'}), 400
+        if too_many_words(transcript):
+            return jsonify(word_limit_error()), 413
+        try:
+            shape = response_format.parse_shape(data, request.args)
+            language = get_rubric(request_language(data)).language
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        timings = {}
+        profile_mode, inline_profile = request_profile()
+        if profile_mode:
+            results, trace = profile_transcript(transcript, duration, profile_mode, timings, shape.detailed,
+                                                language)
+        else:
+            results = score_transcript(transcript, duration, timings=timings, detailed=shape.detailed,
+                                       language=language)
+        record_result(results, transcript, *owner_ids(data))
+        results = shape.apply(results)
         
-        analyzer = SpeechAnalyzer(transcript, duration)
-        results = analyzer.analyze()
+        if profile_mode and inline_profile:
+            results['_profile'] = trace
+        response = jsonify(results)
+        if timings:
+            response.headers['Server-Timing'] = format_server_timing(timings)
+        return response
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'A non-empty items list is required'}), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({'error': f'Batch exceeds the limit of {BATCH_MAX_ITEMS} items'}), 400
+        try:
+            # One shape for every item; the batch language is the default for its items
+            shape = response_format.parse_shape(data, request.args)
+            batch_language = get_rubric(request_language(data)).language
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
+        # Validate items up front so one bad entry doesn't fail the whole batch,
+        # and answer repeats from the cache before any grammar checking
+        cache = get_analysis_cache()
+        results = [None] * len(items)
+        pending = []
+        for index, item in enumerate(items):
+            transcript = item.get('transcript', '') if isinstance(item, dict) else ''
+            if not isinstance(transcript, str) or not transcript.strip():
+                results[index] = {'index': index, 'error': 'Transcript is required'}
+                continue
+            if too_many_words(transcript):
+                results[index] = dict(word_limit_error(), index=index)
+                continue
+            try:
+                rubric = get_rubric(item.get('language') or batch_language)
+            except UnsupportedLanguageError as e:
+                results[index] = {'index': index, 'error': str(e)}
+                continue
+            duration = item.get('duration_seconds', 52)
+            key = analysis_key(transcript, duration, rubric, shape.detailed)
+            cached = cache.get(key)
+            if cached is not None:
+                results[index] = shape.apply(dict(cached, index=index))
+                record_result(cached, transcript, *owner_ids(item))
+            else:
+                pending.append((index, key, transcript, duration, rubric))
+        
+        # One grammar batch per LanguageTool language
+        by_language = {}
+        for entry in pending:
+            by_language.setdefault(entry[4].grammar_language, []).append(entry)
+        checked = []
+        for language, entries in by_language.items():
+            counts = check_grammar_batch([entry[2].strip() for entry in entries], language=language)
+            checked.extend(zip(entries, counts))
+        
+        for (index, key, transcript, duration, rubric), error_counts in checked:
+            try:
+                # Probed after the earlier items were indexed, so copies within a batch are flagged too
+                probe = probe_near_duplicates(transcript)
+                analyzer = SpeechAnalyzer(transcript, duration, rubric=rubric, reuse=reuse_of(probe))
+                if error_counts is not None:
+                    analyzer.grammar_error_count = sum(error_counts)
+                    analyzer.sentence_errors = error_counts
+                analysis = with_similar_to(analyzer.analyze(detailed=shape.detailed), probe)
+                if not analyzer.degraded:
+                    cache.set(key, analysis)
+                index_analysis(probe, analyzer)
+                record_result(analysis, transcript, *owner_ids(items[index]))
+                results[index] = shape.apply(dict(analysis, index=index))
+            except Exception as e:
+                results[index] = {'index': index, 'error': str(e)}
+        
+        failed = sum(1 for result in results if 'error' in result)
+        return jsonify({
+            'count': len(results),
+            'failed': failed,
+            'results': results
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    try:
+        data = request.get_json()
+        transcript = data.get('transcript', '')
+        duration = data.get('duration_seconds', 52)
+        
+        if not transcript:
+            return jsonify({'error': 'Transcript is required'}), 400
+        if too_many_words(transcript):
+            return jsonify(word_limit_error()), 413
+        try:
+            language = get_rubric(request_language(data)).language
+        except UnsupportedLanguageError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        try:
+            job_id = get_job_queue().submit(transcript, duration, *owner_ids(data), language)
+        except jobs.QueueFullError as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(jobs.JOB_RETRY_AFTER)
+            return response, 429
+        
+        response = jsonify({'job_id': job_id, 'status': jobs.QUEUED})
+        response.headers['Location'] = f'/api/jobs/{job_id}'
+        return response, 202
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    """Open a per-delta session; single-process deployments only (see streaming.py)"""
+    if streaming.SESSION_PROCESSES > 1:
+        return jsonify({'error': 'Per-delta sessions need a single worker process; '
+                                 'stream the session through POST /api/sessions/stream instead'}), 501
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            state = open_session(request_language(data))
+        except UnsupportedLanguageError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            session = get_session_store().create(state, data.get('duration_seconds'), *owner_ids(data))
+        except streaming.SessionLimitError as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = str(jobs.JOB_RETRY_AFTER)
+            return response, 429
+        
+        response = jsonify({'session_id': session.session_id,
+                            'rubric_version': session.state.rubric.version,
+                            'language': session.state.rubric.language})
+        response.headers['Location'] = f'/api/sessions/{session.session_id}'
+        return response, 201
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sessions/<session_id>/delta', methods=['POST'])
+def session_delta(session_id):
+    try:
+        session = get_session_store().get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        data = request.get_json()
+        text = data.get('text', '')
+        if not isinstance(text, str):
+            return jsonify({'error': 'text must be a string'}), 400
+        if too_many_words(text, session.state.word_count):
+            return jsonify(word_limit_error()), 413
+        
+        return jsonify(apply_delta(session, text, data.get('duration_seconds')))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    session = get_session_store().get(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    with session.lock:
+        return jsonify(score_session(session))
+
+@app.route('/api/sessions/<session_id>/finish', methods=['POST'])
+def finish_session_endpoint(session_id):
+    try:
+        session = get_session_store().pop(session_id)
+        if session is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        results = finish_session(session, data.get('duration_seconds'))
+        if results is None:
+            return jsonify({'error': 'Transcript is required'}), 400
         return jsonify(results)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    if get_session_store().pop(session_id) is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return '', 204
+
+@app.route('/api/sessions/stream', methods=['POST'])
+def stream_session():
+    """Whole session in one chunked request: NDJSON deltas in, NDJSON scores out.
+    
+    Each request line ({"text": ..., "duration_seconds": ...}) is answered with
+    a provisional score line as soon as it arrives; the final analysis follows
+    when the request body ends. Nothing is stored between requests, so this
+    works behind any load balancer. student_id, cohort_id and language go in
+    the query string.
+    """
+    try:
+        state = open_session(request.args.get('language'))
+    except UnsupportedLanguageError as e:
+        return jsonify({'error': str(e)}), 400
+    session = streaming.Session(None, state, None, *owner_ids(request.args))
+    
+    def generate():
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                text = data.get('text', '')
+                if not isinstance(text, str):
+                    raise ValueError('text must be a string')
+                if too_many_words(text, session.state.word_count):
+                    yield json.dumps(word_limit_error()) + '\n'
+                    continue
+                yield json.dumps(apply_delta(session, text, data.get('duration_seconds'))) + '\n'
+            except Exception as e:
+                yield json.dumps({'error': str(e)}) + '\n'
+        try:
+            results = finish_session(session)
+            yield json.dumps(results if results is not None else {'error': 'Transcript is required'}) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+    
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/students/<student_id>/results', methods=['GET'])
+def student_history(student_id):
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'Results store is disabled'}), 404
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 1000)
+        before = request.args.get('before', type=float)
+        details = request.args.get('details', '') in ('1', 'true')
+        results = store.history(student_id, limit=limit, before=before, details=details)
+        return jsonify({'student_id': student_id, 'count': len(results), 'results': results})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cohorts/<cohort_id>/summary', methods=['GET'])
+def cohort_summary(cohort_id):
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'Results store is disabled'}), 404
+    try:
+        since = request.args.get('since', type=float)
+        until = request.args.get('until', type=float)
+        return jsonify(store.cohort_summary(cohort_id, since=since, until=until))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_analysis_cache().stats())
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition, merged across workers when METRICS_DIR is set"""
+    return metrics.REGISTRY.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy'})
+    status, code = health_status()
+    return jsonify(status), code
+
+def health_status():
+    """Health report and HTTP status, shared with the ASGI app"""
+    status = {
+        'status': 'healthy',
+        'ready': startup_stats['state'] == 'ready',
+        'rubric_version': get_rubric().fingerprint,
+        'languages': list(get_rubric_store().languages),
+        'startup': startup_stats
+    }
+    if results_db is not None:
+        status['results_store'] = results_db.stats()
+    if admission.ADMISSION_ENABLED and admission_controller is not None:
+        status['admission'] = admission_controller.stats()
+    if grammar_checkers is not None:
+        status['grammar_checkers'] = grammar_checkers.stats()
+    if near_duplicate_index is not None:
+        status['near_duplicates'] = near_duplicate_index.stats()
+    if startup_stats['state'] == 'warming':
+        status['status'] = 'warming_up'
+        return status, 503
+    if grammar_backend.GRAMMAR_BACKEND == 'remote':
+        tool = get_grammar_tool()
+        servers = {url: tool.is_healthy(url) for url in tool.urls}
+        status['grammar_servers'] = servers
+        if not any(servers.values()):
+            status['status'] = 'degraded'
+    return status, 200
+
+startup_stats['import_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 3)
 
 if __name__ == '__main__':
+    warm_up_worker()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,377 @@
+"""ASGI serving mode for /api/analyze and /api/health.
+
+Under sync gunicorn workers every in-flight analysis holds a worker while it
+waits on LanguageTool, so a container serves only as many analyses at once
+as it has workers. This module serves the same two endpoints, with the same
+request and response contract, from an asyncio event loop:
+
+* LanguageTool is called with ``AsyncLanguageToolClient``. A request waiting
+  on grammar is a suspended coroutine, not a blocked thread, so one process
+  can hold hundreds of requests waiting on the grammar servers.
+* The CPU-bound parts (tokenizing, sentence cache lookups, scoring) run on a
+  small thread pool of ASGI_CPU_WORKERS threads, off the event loop.
+* The grammar latency budget, heuristic fallback, sentence and result
+  caches, word and body limits and results store are shared with app.py.
+
+Non-blocking grammar needs GRAMMAR_BACKEND=remote (shared LanguageTool
+servers). With the in-process backend, checks run on the grammar pool
+threads as before.
+
+    GRAMMAR_BACKEND=remote LANGUAGETOOL_URLS=http://127.0.0.1:8081 uvicorn asgi:app --port 5000
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker GRAMMAR_BACKEND=remote \\
+        gunicorn -c gunicorn.conf.py asgi:app
+
+``load_test.py`` compares this mode with the sync gunicorn setup.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import admission
+import app as scoring_app
+import grammar_backend
+import response_format
+from rubric import get_rubric
+
+logger = logging.getLogger(__name__)
+
+# Threads for the CPU-bound scoring work
+ASGI_CPU_WORKERS = int(os.environ.get('ASGI_CPU_WORKERS', min(8, os.cpu_count() or 2)))
+
+cpu_executor = None
+async_grammar = None
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class PrecheckedAnalyzer(scoring_app.SpeechAnalyzer):
+    """SpeechAnalyzer whose grammar result was settled before ``analyze()``"""
+
+    grammar_failure = None
+
+    def analyze_grammar(self):
+        if self.grammar_failure is not None:
+            return self._degraded_grammar(self.grammar_failure)
+        return super().analyze_grammar()
+
+
+class AsyncGrammar:
+    """Awaitable grammar error counts over the configured backend"""
+
+    def __init__(self):
+        self.remote = grammar_backend.GRAMMAR_BACKEND == 'remote'
+        # Created per language on first use; each is just an HTTP connection pool
+        self.clients = {}
+
+    async def check(self, text, language):
+        if self.remote:
+            client = self.clients.get(language)
+            if client is None:
+                client = self.clients[language] = grammar_backend.AsyncLanguageToolClient(
+                    grammar_backend.server_urls(), language=language)
+            return await client.check(text)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(scoring_app.get_grammar_executor(),
+                                          scoring_app.get_grammar_checkers().check, text, language)
+
+    async def _check_chunk(self, texts, language):
+        joined, starts = scoring_app.join_for_check(texts)
+        return scoring_app.match_offsets(await self.check(joined, language), starts)
+
+    async def offsets(self, texts, language):
+        """Match offsets per text; chunks of GRAMMAR_CHUNK_CHARS are checked concurrently"""
+        chunks = scoring_app.pack_chunks(texts, scoring_app.GRAMMAR_CHUNK_CHARS)
+        results = await asyncio.gather(*(self._check_chunk([texts[i] for i in indices], language)
+                                         for indices in chunks))
+        return [offsets for chunk_offsets in results for offsets in chunk_offsets]
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+
+
+def get_cpu_executor():
+    global cpu_executor
+    if cpu_executor is None:
+        cpu_executor = ThreadPoolExecutor(max_workers=ASGI_CPU_WORKERS, thread_name_prefix='asgi-cpu')
+    return cpu_executor
+
+
+def get_async_grammar():
+    # Only ever called on the event loop thread, so no lock is needed
+    global async_grammar
+    if async_grammar is None:
+        async_grammar = AsyncGrammar()
+    return async_grammar
+
+
+async def run_cpu(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_cpu_executor(), func, *args)
+
+
+def prepare(transcript, duration_seconds, rubric, probe):
+    """Tokenize and find the grammar work left after the sentence cache (CPU pool)"""
+    analyzer = PrecheckedAnalyzer(transcript, duration_seconds, rubric=rubric, reuse=scoring_app.reuse_of(probe))
+    sentences = analyzer.doc.grammar_sentences()
+    counts = scoring_app.cached_sentence_errors(sentences, rubric.grammar_language, analyzer.known_errors())
+    windows = scoring_app.grammar_windows(analyzer.transcript, analyzer.doc.grammar_spans, counts)
+    return analyzer, (sentences, counts, windows)
+
+
+async def count_errors(analyzer, lookup):
+    """Grammar error count of the transcript, like ``SpeechAnalyzer._count_grammar_errors``"""
+    language = analyzer.rubric.grammar_language
+    sentences, counts, windows = lookup
+    offsets = await get_async_grammar().offsets([window.text for window in windows], language) if windows else []
+    analyzer.sentence_errors = scoring_app.merge_sentence_errors(sentences, counts, windows, offsets, language)
+    return sum(analyzer.sentence_errors)
+
+
+async def score(transcript, duration_seconds, detailed=True, language=None):
+    """Async ``score_transcript``; returns (results, stage timings)"""
+    cache = scoring_app.get_analysis_cache()
+    rubric = get_rubric(language)
+    key = scoring_app.analysis_key(transcript, duration_seconds, rubric, detailed)
+    cached = cache.get(key)
+    scoring_app.CACHE_LOOKUPS.inc(cache='result', result='miss' if cached is None else 'hit')
+    if cached is not None:
+        return dict(cached), {}
+
+    probe = await run_cpu(scoring_app.probe_near_duplicates, transcript)
+
+    analyzer, lookup = await run_cpu(prepare, transcript, duration_seconds, rubric, probe)
+    start = time.perf_counter()
+    try:
+        analyzer.grammar_error_count = await asyncio.wait_for(
+            count_errors(analyzer, lookup), scoring_app.GRAMMAR_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        scoring_app.GRAMMAR_ERRORS.inc(reason='timeout')
+        analyzer.grammar_failure = 'timeout'
+    except Exception as e:
+        scoring_app.GRAMMAR_ERRORS.inc(reason='error')
+        logger.warning('Grammar check failed, using heuristics: %s', e)
+        analyzer.grammar_failure = 'error'
+    grammar_seconds = time.perf_counter() - start
+    scoring_app.STAGE_SECONDS.observe(grammar_seconds, stage='grammar_check')
+
+    # Grammar is settled, so the sequential path runs without blocking
+    results = await run_cpu(analyzer.analyze, 'sequential', detailed)
+    timings = dict(analyzer.stage_timings, grammar_check=round(grammar_seconds * 1000, 3))
+    results = scoring_app.with_similar_to(results, probe)
+    if not analyzer.degraded:
+        cache.set(key, results)
+    scoring_app.index_analysis(probe, analyzer)
+    return dict(results), timings
+
+
+async def read_body(scope, receive):
+    limit = scoring_app.MAX_REQUEST_BYTES
+    for name, value in scope['headers']:
+        if name == b'content-length' and limit and int(value) > limit:
+            raise BodyTooLarge()
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body = message.get('body', b'')
+        size += len(body)
+        if limit and size > limit:
+            raise BodyTooLarge()
+        chunks.append(body)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def analyze(scope, receive):
+    try:
+        data = json.loads(await read_body(scope, receive))
+    except BodyTooLarge:
+        return 413, {'error': f'Request body exceeds the limit of {scoring_app.MAX_REQUEST_BYTES} bytes',
+                     'max_bytes': scoring_app.MAX_REQUEST_BYTES}, {}
+    except ValueError:
+        return 400, {'error': 'Request body must be JSON'}, {}
+
+    try:
+        transcript = data.get('transcript', '')
+        duration = data.get('duration_seconds', 52)
+
+        if not transcript:
+            return 400, {'error': 'Transcript is required'}, {}
+        if scoring_app.too_many_words(transcript):
+            return 413, scoring_app.word_limit_error(), {}
+        try:
+            args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+            shape = response_format.parse_shape(data, args)
+            language = get_rubric(data.get('language') or args.get('language')).language
+        except ValueError as e:
+            return 400, {'error': str(e)}, {}
+
+        results, timings = await score(transcript, duration, shape.detailed, language)
+        scoring_app.record_result(results, transcript, *scoring_app.owner_ids(data))
+        results = shape.apply(results)
+
+        headers = {}
+        if timings:
+            headers['Server-Timing'] = scoring_app.format_server_timing(timings)
+        return 200, results, headers
+
+    except Exception as e:
+        return 500, {'error': str(e)}, {}
+
+
+async def health(scope, receive):
+    status, code = await run_cpu(scoring_app.health_status)
+    status['server'] = 'asgi'
+    return code, status, {}
+
+
+async def admit(scope):
+    """Admission control as in the Flask app, waiting on the event loop; returns the ticket"""
+    controller = scoring_app.get_admission_controller()
+    headers = dict(scope['headers'])
+    client = admission.client_id(scope['client'][0] if scope.get('client') else None,
+                                 headers.get(admission.CLIENT_HEADER.lower().encode(), b'').decode('latin-1'),
+                                 headers.get(admission.FORWARDED_HEADER.lower().encode(), b'').decode('latin-1'))
+    loop = asyncio.get_running_loop()
+    granted = loop.create_future()
+
+    def notify():
+        loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+    try:
+        ticket = controller.admit(client, notify)
+        scoring_app.observe_admission(controller)
+        if not ticket.granted:
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), admission.ADMISSION_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                controller.expire(ticket)
+    finally:
+        scoring_app.observe_admission(controller)
+    scoring_app.ADMISSION_WAIT_SECONDS.observe(ticket.waited)
+    return ticket
+
+
+ROUTES = {
+    '/api/analyze': ('POST', analyze),
+    '/api/health': ('GET', health)
+}
+
+
+async def send_json(send, status, payload, headers=None, accept_encoding=None):
+    # Same encoding and compression as the Flask app
+    body = response_format.dumps(payload)
+    raw_headers = [(b'content-type', b'application/json')]
+    if response_format.RESPONSE_COMPRESSION and len(body) >= response_format.COMPRESS_MIN_BYTES:
+        raw_headers.append((b'vary', b'Accept-Encoding'))
+        encoding = response_format.choose_encoding(accept_encoding)
+        if encoding is not None:
+            body = response_format.compress(body, encoding)
+            raw_headers.append((b'content-encoding', encoding.encode()))
+    raw_headers.extend([
+        (b'content-length', str(len(body)).encode()),
+        (b'access-control-allow-origin', b'*')
+    ])
+    raw_headers.extend((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_preflight(scope, send, method):
+    requested = dict(scope['headers']).get(b'access-control-request-headers', b'')
+    headers = [
+        (b'access-control-allow-origin', b'*'),
+        (b'access-control-allow-methods', method.encode()),
+        (b'content-length', b'0')
+    ]
+    if requested:
+        headers.append((b'access-control-allow-headers', requested))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def startup():
+    if scoring_app.startup_stats['state'] == 'cold':
+        # Plain uvicorn; under gunicorn post_worker_init has already done this
+        await run_cpu(scoring_app.warm_up_worker)
+    get_async_grammar()
+
+
+async def shutdown():
+    if async_grammar is not None:
+        await async_grammar.close()
+    if scoring_app.results_db is not None:
+        await run_cpu(scoring_app.results_db.flush)
+    if cpu_executor is not None:
+        cpu_executor.shutdown(wait=False)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await startup()
+            except Exception as e:
+                logger.exception('ASGI startup failed')
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    route = ROUTES.get(scope['path'])
+    if route is None:
+        await send_json(send, 404, {'error': 'Not found'})
+        return
+    method, handler = route
+    if scope['method'] == 'OPTIONS':
+        await send_preflight(scope, send, method)
+        return
+    if scope['method'] != method:
+        await send_json(send, 405, {'error': 'Method not allowed'}, {'Allow': method})
+        return
+
+    endpoint = scope['path']
+    started = time.perf_counter()
+    scoring_app.REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    ticket = None
+    # Stays 500 unless a response is sent, so handler exceptions are observed too
+    status = 500
+    try:
+        if admission.ADMISSION_ENABLED and endpoint in scoring_app.ADMITTED_ENDPOINTS:
+            try:
+                ticket = await admit(scope)
+            except admission.Rejected as e:
+                status = 429
+                await send_json(send, status, scoring_app.admission_rejected(e), {'Retry-After': str(e.retry_after)})
+                return
+        status, payload, headers = await handler(scope, receive)
+        accept_encoding = dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1')
+        await send_json(send, status, payload, headers, accept_encoding)
+    finally:
+        if ticket is not None:
+            controller = scoring_app.get_admission_controller()
+            controller.release(ticket)
+            scoring_app.observe_admission(controller)
+        scoring_app.REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        scoring_app.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                            method=method, status=str(status))
@@ -0,0 +1,58 @@
+"""Score band tables for the threshold-based criteria.
+
+Each rubric ladder ("ratio >= 0.9 scores 15, >= 0.7 scores 12, ...") is a
+sorted list of edges plus the value for every interval between them. The
+same table answers a single lookup with ``bisect`` and a whole column of
+transcripts at once with ``numpy.searchsorted``, so the per-request and
+batch paths always agree. The tables themselves are defined in the rubric
+(see rubric.py).
+"""
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+
+def above(threshold):
+    """Edge for a strict ``value > threshold`` comparison"""
+    return math.nextafter(threshold, math.inf)
+
+
+class Bands:
+    """Maps a value to the value of the interval it falls in.
+
+    ``edges`` are ascending lower bounds (inclusive); a value below the first
+    edge gets ``values[0]`` and a value at or above ``edges[i]`` (and below
+    ``edges[i + 1]``) gets ``values[i + 1]``.
+    """
+
+    def __init__(self, edges, values, labels=None):
+        if len(values) != len(edges) + 1:
+            raise ValueError('Bands need exactly one more value than edges')
+        if list(edges) != sorted(edges):
+            raise ValueError('Band edges must be ascending')
+        self.edges = tuple(edges)
+        self.values = tuple(values)
+        self.labels = tuple(labels) if labels is not None else None
+        self._edge_array = np.asarray(self.edges, dtype=np.float64)
+        self._value_array = np.asarray(self.values)
+        self._label_array = np.asarray(self.labels, dtype=object) if labels is not None else None
+
+    def index(self, value):
+        return bisect_right(self.edges, value)
+
+    def lookup(self, value):
+        return self.values[self.index(value)]
+
+    def label(self, value):
+        return self.labels[self.index(value)]
+
+    def indices(self, values):
+        return np.searchsorted(self._edge_array, np.asarray(values, dtype=np.float64), side='right')
+
+    def lookup_array(self, values):
+        return self._value_array[self.indices(values)]
+
+    def label_array(self, values):
+        return self._label_array[self.indices(values)]
+
@@ -0,0 +1,69 @@
+"""Vectorized scoring for many transcripts at once.
+
+Tokenizing, phrase matching and sentiment lookups are inherently per
+transcript, so they produce one row of raw features per transcript
+(``SpeechAnalyzer.features``). Everything after that -- rates, ratios and the
+rubric's threshold ladders -- runs column-wise over NumPy arrays using the
+shared band tables, and gives exactly the scores ``SpeechAnalyzer.analyze()``
+would under the same rubric.
+"""
+import numpy as np
+
+FEATURE_COLUMNS = ('word_count', 'distinct_words', 'filler_count', 'wpm', 'polarity', 'content_score')
+
+SCORE_COLUMNS = ('content_structure', 'speech_rate', 'language_grammar', 'vocabulary_richness',
+                 'clarity', 'engagement')
+
+
+def feature_columns(rows, grammar_error_counts):
+    """Stack feature rows into one float64 array per feature"""
+    columns = {name: np.fromiter((row[name] for row in rows), dtype=np.float64, count=len(rows))
+               for name in FEATURE_COLUMNS}
+    columns['grammar_errors'] = np.asarray(grammar_error_counts, dtype=np.float64)
+    return columns
+
+
+def score_columns(columns, rubric):
+    """Apply every criterion's formula and the rubric's bands to whole feature columns.
+
+    Mirrors the scalar arithmetic operation for operation so the floating
+    point results (and therefore band boundaries) match exactly.
+    """
+    word_count = columns['word_count']
+    has_words = word_count > 0
+    words = np.where(has_words, word_count, 1)
+
+    errors_per_100 = np.where(has_words, columns['grammar_errors'] / words * 100, 0.0)
+    grammar_ratio = np.maximum(0, 1 - np.minimum(errors_per_100 / 10, 1))
+    ttr = columns['distinct_words'] / words
+    filler_rate = np.where(has_words, columns['filler_count'] / words * 100, 0.0)
+    positive_probability = (columns['polarity'] + 1) / 2
+    bands = rubric.bands
+
+    scores = {
+        'content_structure': columns['content_score'].astype(np.int64),
+        'speech_rate': bands['speech_rate'].lookup_array(columns['wpm']),
+        'language_grammar': bands['grammar'].lookup_array(grammar_ratio),
+        'vocabulary_richness': np.where(has_words, bands['vocabulary'].lookup_array(ttr), 0),
+        'clarity': bands['filler_rate'].lookup_array(filler_rate),
+        'engagement': bands['sentiment'].lookup_array(positive_probability)
+    }
+    scores['overall_score'] = sum(scores[name] for name in SCORE_COLUMNS)
+    scores['speech_category'] = bands['speech_rate'].label_array(columns['wpm'])
+    scores['sentiment'] = bands['sentiment'].label_array(positive_probability)
+    return scores
+
+
+def score_analyzers(analyzers, grammar_error_counts, rubric):
+    """Score SpeechAnalyzer instances (all built with ``rubric``) together; returns score columns"""
+    columns = feature_columns([analyzer.features() for analyzer in analyzers], grammar_error_counts)
+    scores = score_columns(columns, rubric)
+    scores['word_count'] = columns['word_count'].astype(np.int64)
+    scores['wpm'] = columns['wpm']
+    return scores
+
+
+def to_records(scores):
+    """Split score columns into one plain dict per transcript"""
+    names = list(scores)
+    return [dict(zip(names, values)) for values in zip(*(scores[name].tolist() for name in names))]
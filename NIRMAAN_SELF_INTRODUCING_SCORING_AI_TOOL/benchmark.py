@@ -0,0 +1,370 @@
+"""Offline benchmark harness for the scoring pipeline.
+
+Generates a reproducible synthetic transcript corpus (varying length, filler
+density and sentence count), scores it with the grammar backend replaced by
+the in-process stub, and reports:
+
+* per-criterion timings (``analyze_grammar``, ``analyze_sentiment``, ...)
+* end-to-end ``SpeechAnalyzer.analyze()`` latency by transcript size
+* request throughput through the Flask test client
+* memory high-water marks (traced Python allocations and process RSS)
+* optionally, near-duplicate index lookup latency with N transcripts indexed
+  (``--near-duplicate-entries 1000000``)
+
+Results are written as JSON so a run can be compared against a saved baseline:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Never reach for a real LanguageTool, a shared cache file or the results
+# database while benchmarking
+os.environ['GRAMMAR_BACKEND'] = 'local'
+os.environ['RESULT_CACHE_PATH'] = ''
+os.environ['RESULTS_DB_PATH'] = ''
+
+import app as scoring_app
+import grammar_pool
+import near_duplicates
+from grammar_stub import StubGrammarTool
+
+CRITERIA = (
+    'calculate_wpm',
+    'analyze_salutation',
+    'analyze_keywords',
+    'analyze_flow',
+    'analyze_grammar',
+    'analyze_vocabulary_richness',
+    'analyze_filler_words',
+    'analyze_sentiment'
+)
+
+# Synthetic transcript vocabulary
+NAMES = ['Asha', 'Rohan', 'Muskan', 'Arjun', 'Priya', 'Kabir', 'Meera', 'Dev']
+OPENINGS = [
+    'Hello everyone, myself {name}.',
+    'Good morning everyone, I am {name}.',
+    'Hi, my name is {name}.',
+    'I am excited to introduce myself, my name is {name}.',
+    'Hello, I am {name}.'
+]
+DETAILS = [
+    'I am {age} years old.',
+    'I study in class {grade} at {school}.',
+    'I live with my family in {city}.',
+    'There are {size} people in my family.',
+    'My hobby is {hobby} and I enjoy {hobby} in my free time.',
+    'My favorite subject is {subject} because it is interesting.',
+    'I want to become a {career} when I grow up.',
+    'My goal is to learn something new every day.',
+    'I am proud of winning a prize in {subject}.',
+    'One fun fact about me is that I love {hobby}.',
+    'My strength is that I am curious and hardworking.',
+    'i go to school by bus with my friends',
+    'My mother is a teacher and my father is a doctor.'
+]
+CLOSINGS = ['Thank you for listening.', 'Thank you.', 'That is all about me, thanks.', 'Bye.']
+FILLERS = ['um', 'uh', 'like', 'you know', 'so', 'actually', 'basically', 'right']
+SLOTS = {
+    'age': ['12', '13', '14', '15'],
+    'grade': ['7', '8', '9', '10'],
+    'school': ['Christ Public School', 'the city high school', 'Green Valley School'],
+    'city': ['Pune', 'Mumbai', 'Delhi', 'Bengaluru'],
+    'size': ['three', 'four', 'five'],
+    'hobby': ['playing cricket', 'reading books', 'painting', 'dancing', 'coding'],
+    'subject': ['science', 'mathematics', 'history', 'art'],
+    'career': ['doctor', 'engineer', 'scientist', 'teacher']
+}
+
+
+def _fill(rng, template, name):
+    values = {slot: rng.choice(options) for slot, options in SLOTS.items()}
+    return template.format(name=name, **values)
+
+
+def _add_fillers(rng, sentence, density):
+    words = []
+    for word in sentence.split():
+        if density and rng.random() < density:
+            words.append(rng.choice(FILLERS) + ',')
+        words.append(word)
+    return ' '.join(words)
+
+
+def generate_transcript(rng, sentence_count, filler_density=0.0):
+    """Build one synthetic self-introduction of ``sentence_count`` sentences"""
+    name = rng.choice(NAMES)
+    sentences = [_fill(rng, rng.choice(OPENINGS), name)]
+    while len(sentences) < sentence_count - 1:
+        sentences.append(_fill(rng, rng.choice(DETAILS), name))
+    if sentence_count > 1:
+        sentences.append(rng.choice(CLOSINGS))
+    return ' '.join(_add_fillers(rng, sentence, filler_density) for sentence in sentences)
+
+
+def build_corpus(seed=7, sentence_counts=(3, 8, 20, 60), filler_densities=(0.0, 0.05, 0.15), per_cell=10):
+    """Deterministic corpus covering every (sentence count, filler density) pair"""
+    rng = random.Random(seed)
+    corpus = []
+    for sentence_count in sentence_counts:
+        for density in filler_densities:
+            for _ in range(per_cell):
+                transcript = generate_transcript(rng, sentence_count, density)
+                words = len(transcript.split())
+                corpus.append({
+                    'transcript': transcript,
+                    'sentence_count': sentence_count,
+                    'filler_density': density,
+                    # Keep WPM in a realistic range regardless of length
+                    'duration_seconds': max(10, round(words / rng.uniform(100, 160) * 60))
+                })
+    return corpus
+
+
+def summarize(samples_ms):
+    """Mean / percentile summary of a list of millisecond samples"""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'p50_ms': round(ordered[len(ordered) // 2], 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        'max_ms': round(ordered[-1], 4)
+    }
+
+
+def _reset_caches():
+    scoring_app.sentence_grammar_cache.clear()
+    scoring_app.get_analysis_cache().clear()
+    if scoring_app.near_duplicate_index is not None:
+        scoring_app.near_duplicate_index.clear()
+
+
+def bench_criteria(corpus, repeat):
+    """Time each criterion method in isolation with grammar caches cold"""
+    samples = {name: [] for name in CRITERIA}
+    for _ in range(repeat):
+        for item in corpus:
+            _reset_caches()
+            analyzer = scoring_app.SpeechAnalyzer(item['transcript'], item['duration_seconds'])
+            for name in CRITERIA:
+                method = getattr(analyzer, name)
+                start = time.perf_counter()
+                method()
+                samples[name].append((time.perf_counter() - start) * 1000)
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def bench_end_to_end(corpus, repeat, mode):
+    """Time full ``analyze()`` calls, overall and per transcript size"""
+    overall = []
+    by_size = {}
+    for _ in range(repeat):
+        for item in corpus:
+            _reset_caches()
+            start = time.perf_counter()
+            scoring_app.SpeechAnalyzer(item['transcript'], item['duration_seconds']).analyze(mode=mode)
+            elapsed = (time.perf_counter() - start) * 1000
+            overall.append(elapsed)
+            by_size.setdefault(str(item['sentence_count']), []).append(elapsed)
+    return {
+        'mode': mode,
+        'overall': summarize(overall),
+        'by_sentence_count': {size: summarize(values) for size, values in by_size.items()}
+    }
+
+
+def bench_throughput(corpus, repeat):
+    """Requests per second through the Flask test client (result cache cold)"""
+    client = scoring_app.app.test_client()
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _reset_caches()
+        for item in corpus:
+            request_start = time.perf_counter()
+            response = client.post('/api/analyze', json={
+                'transcript': item['transcript'],
+                'duration_seconds': item['duration_seconds']
+            })
+            latencies.append((time.perf_counter() - request_start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 4),
+        'requests_per_second': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency': summarize(latencies)
+    }
+
+
+def bench_near_duplicates(corpus, entries, seed=7):
+    """Near-duplicate lookups against an index holding ``entries`` transcripts.
+
+    The index holds the corpus plus random signatures up to ``entries``; each
+    lookup is a corpus transcript with its first word changed, so it should match.
+    """
+    index = near_duplicates.NearDuplicateIndex(capacity=entries)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    filler = max(0, entries - len(corpus))
+    index.add_many(rng.integers(0, 1 << 32, (filler, index.hasher.permutations), dtype=np.uint32),
+                   (str(i) for i in range(filler)))
+    for number, item in enumerate(corpus):
+        index.add(index.hasher.signature(item['transcript']), f'corpus-{number}')
+    index.rebuild()
+    load_seconds = time.perf_counter() - start
+
+    lookups, probes = [], []
+    matches = 0
+    for item in corpus:
+        text = 'Well ' + item['transcript'].split(' ', 1)[-1]
+        start = time.perf_counter()
+        signature = index.hasher.signature(text)
+        lookup_start = time.perf_counter()
+        match = index.query(signature)
+        end = time.perf_counter()
+        probes.append((end - start) * 1000)
+        lookups.append((end - lookup_start) * 1000)
+        matches += match is not None
+    return {
+        'entries': index.size,
+        'load_seconds': round(load_seconds, 3),
+        'rebuild_seconds': index.rebuild_seconds,
+        'memory_mb': index.memory_mb(),
+        'matched': matches,
+        'lookup': summarize(lookups),
+        'signature_and_lookup': summarize(probes)
+    }
+
+
+def bench_memory(corpus):
+    """Peak traced allocation for one pass over the corpus, plus process max RSS"""
+    _reset_caches()
+    tracemalloc.start()
+    for item in corpus:
+        scoring_app.SpeechAnalyzer(item['transcript'], item['duration_seconds']).analyze(mode='sequential')
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    if sys.platform == 'darwin':
+        max_rss //= 1024
+    return {
+        'traced_peak_kb': round(peak / 1024, 1),
+        'max_rss_kb': max_rss
+    }
+
+
+def run(seed=7, per_cell=10, repeat=3, grammar_latency=0.0, mode=None, near_duplicate_entries=0):
+    """Run every benchmark and return the JSON-serialisable report"""
+    stub = StubGrammarTool(latency=grammar_latency)
+    scoring_app.grammar_checkers = grammar_pool.GrammarToolPool(lambda language: stub)
+    scoring_app.warm_up()
+    corpus = build_corpus(seed=seed, per_cell=per_cell)
+    mode = mode or scoring_app.ANALYZE_MODE
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rubric_version': scoring_app.get_rubric().fingerprint,
+            'seed': seed,
+            'repeat': repeat,
+            'grammar_backend': 'stub',
+            'sentiment_backend': scoring_app.get_sentiment_engine().name,
+            'grammar_latency_seconds': grammar_latency
+        },
+        'corpus': {
+            'transcripts': len(corpus),
+            'words': sum(len(item['transcript'].split()) for item in corpus),
+            'sentence_counts': sorted({item['sentence_count'] for item in corpus}),
+            'filler_densities': sorted({item['filler_density'] for item in corpus})
+        },
+        'criteria': bench_criteria(corpus, repeat),
+        'end_to_end': bench_end_to_end(corpus, repeat, mode),
+        'throughput': bench_throughput(corpus, repeat),
+        'memory': bench_memory(corpus)
+    }
+    if near_duplicate_entries:
+        report['near_duplicates'] = bench_near_duplicates(corpus, near_duplicate_entries, seed)
+    return report
+
+
+def compare(report, baseline, threshold, min_delta_ms=0.05):
+    """Print mean-latency changes against a baseline; return the regressed metric names"""
+    rows = [(f'criteria.{name}', report['criteria'][name], baseline.get('criteria', {}).get(name))
+            for name in CRITERIA]
+    rows.append(('end_to_end', report['end_to_end']['overall'], baseline.get('end_to_end', {}).get('overall')))
+    rows.append(('throughput.latency', report['throughput']['latency'],
+                 baseline.get('throughput', {}).get('latency')))
+
+    regressions = []
+    print(f'{"metric":<36}{"baseline ms":>14}{"current ms":>14}{"change":>10}')
+    for name, current, previous in rows:
+        if not previous or not previous.get('mean_ms'):
+            print(f'{name:<36}{"-":>14}{current["mean_ms"]:>14.4f}{"new":>10}')
+            continue
+        change = (current['mean_ms'] - previous['mean_ms']) / previous['mean_ms']
+        # Sub-microsecond stages are pure noise in relative terms
+        regressed = change > threshold and current['mean_ms'] - previous['mean_ms'] > min_delta_ms
+        flag = ' !' if regressed else ''
+        print(f'{name:<36}{previous["mean_ms"]:>14.4f}{current["mean_ms"]:>14.4f}{change:>+10.1%}{flag}')
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the scoring pipeline offline')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--per-cell', type=int, default=10, help='Transcripts per (length, filler density) pair')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the corpus per benchmark')
+    parser.add_argument('--grammar-latency', type=float, default=0.0, help='Seconds the stub sleeps per check')
+    parser.add_argument('--mode', choices=['concurrent', 'sequential'], help='Analyze mode (default ANALYZE_MODE)')
+    parser.add_argument('--near-duplicate-entries', type=int, default=0,
+                        help='Also time near-duplicate lookups with this many transcripts indexed')
+    parser.add_argument('--output', help='Write the JSON report to this path')
+    parser.add_argument('--compare', help='Baseline JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Mean slowdown that counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='Ignore slowdowns smaller than this')
+    args = parser.parse_args(argv)
+
+    report = run(args.seed, args.per_cell, args.repeat, args.grammar_latency, args.mode,
+                 args.near_duplicate_entries)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Wrote {args.output}')
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f'Regressions beyond {args.threshold:.0%}: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Offline bulk scoring without HTTP.
+
+Streams transcripts from an NDJSON or CSV file (records shaped like
+``sample_data_json.json``: ``transcript``, optional ``duration_seconds`` and
+``id``), scores them on a process pool where every process keeps its own
+warm grammar tool, and writes results in input order as they complete.
+Only a bounded window of chunks is in flight, so memory stays flat no matter
+how large the input is.
+
+With ``--scores-only`` each chunk goes through the vectorized batch scorer
+instead and only the criterion scores are written (no feedback text).
+
+A checkpoint file records how many records have been written; ``--resume``
+truncates any partial output after the last checkpoint and carries on.
+
+    python bulk_score.py transcripts.ndjson results.ndjson --workers 8
+    python bulk_score.py transcripts.csv results.csv --resume
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import app as scoring_app
+import batch_scoring
+import grammar_pool
+from grammar_heuristics import heuristic_matches
+
+# Room for very long transcripts in CSV cells
+csv.field_size_limit(2 ** 31 - 1)
+
+CSV_COLUMNS = ['index', 'id', 'overall_score', 'word_count', 'wpm',
+               'content_structure', 'speech_rate', 'language_grammar', 'vocabulary_richness',
+               'clarity', 'engagement',
+               'degraded', 'error']
+CRITERION_COLUMNS = {
+    'Content & Structure': 'content_structure',
+    'Speech Rate': 'speech_rate',
+    'Language & Grammar': 'language_grammar',
+    'Vocabulary Richness': 'vocabulary_richness',
+    'Clarity': 'clarity',
+    'Engagement': 'engagement'
+}
+
+
+def detect_format(path, explicit=None):
+    if explicit:
+        return explicit
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def read_records(path, fmt, skip=0):
+    """Yield (index, record) pairs from an NDJSON or CSV file, skipping the first ``skip``"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            rows = csv.DictReader(f)
+        else:
+            rows = (line for line in f if line.strip())
+        for index, row in enumerate(rows):
+            if index < skip:
+                continue
+            if fmt == 'csv':
+                yield index, row
+                continue
+            try:
+                yield index, json.loads(row)
+            except ValueError as e:
+                yield index, {'_error': f'Invalid JSON: {e}'}
+
+
+def _init_worker(stub_grammar):
+    """Give each pool process its own warm grammar tool and lexicon"""
+    scoring_app.reset_after_fork()
+    if stub_grammar:
+        from grammar_stub import StubGrammarTool
+        scoring_app.grammar_checkers = grammar_pool.GrammarToolPool(lambda language: StubGrammarTool())
+    scoring_app.warm_up()
+    scoring_app.get_grammar_tool()
+
+
+def _parse_record(index, record):
+    """Return (result stub, transcript, duration); the stub carries 'error' if invalid"""
+    result = {'index': index}
+    if not isinstance(record, dict):
+        result['error'] = 'Record must be an object'
+        return result, None, None
+    if record.get('id') not in (None, ''):
+        result['id'] = record['id']
+    if '_error' in record:
+        result['error'] = record['_error']
+        return result, None, None
+    transcript = record.get('transcript') or ''
+    if not isinstance(transcript, str) or not transcript.strip():
+        result['error'] = 'Transcript is required'
+        return result, None, None
+    duration = parse_duration(record.get('duration_seconds', 52))
+    if duration is None:
+        result['error'] = 'duration_seconds must be a number'
+        return result, None, None
+    return result, transcript, duration
+
+
+def parse_duration(value):
+    """duration_seconds as the API takes it (0 stays 0), or None if not a number.
+
+    CSV cells are strings: an empty cell means the default, anything else is
+    parsed as a number.
+    """
+    if isinstance(value, str):
+        if not value.strip():
+            return 52
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return value
+
+
+def score_chunk(chunk):
+    """Score a list of (index, record) pairs inside a pool process"""
+    results = []
+    for index, record in chunk:
+        result, transcript, duration = _parse_record(index, record)
+        if 'error' not in result:
+            try:
+                result.update(scoring_app.score_transcript(transcript, duration))
+            except Exception as e:
+                result['error'] = str(e)
+        results.append(result)
+    return results
+
+
+def score_chunk_compact(chunk):
+    """Scores only, via batched grammar checks and the vectorized batch scorer per chunk"""
+    rubric = scoring_app.get_rubric()
+    results, valid, analyzers = [], [], []
+    for index, record in chunk:
+        result, transcript, duration = _parse_record(index, record)
+        results.append(result)
+        if 'error' not in result:
+            valid.append(result)
+            analyzers.append(scoring_app.SpeechAnalyzer(transcript, duration, rubric=rubric))
+    if not analyzers:
+        return results
+
+    # Counted sentence by sentence like every other path, so both modes agree
+    texts = [analyzer.transcript for analyzer in analyzers]
+    sentence_counts = scoring_app.check_grammar_batch(texts, language=rubric.grammar_language)
+    error_counts = [len(heuristic_matches(text)) if counts is None else sum(counts)
+                    for text, counts in zip(texts, sentence_counts)]
+    scores = batch_scoring.score_analyzers(analyzers, error_counts, rubric)
+    for result, row, counts in zip(valid, batch_scoring.to_records(scores), sentence_counts):
+        result.update(row, degraded=counts is None)
+    return results
+
+
+def _chunks(records, size):
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_in_order(records, workers, chunk_size, max_pending, stub_grammar=False, scores_only=False):
+    """Yield results in input order, keeping at most ``max_pending`` chunks in flight"""
+    chunks = _chunks(records, chunk_size)
+    score = score_chunk_compact if scores_only else score_chunk
+    if workers <= 1:
+        _init_worker(stub_grammar)
+        for chunk in chunks:
+            yield from score(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(stub_grammar,)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(score, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class ResultWriter:
+    """Appends results as NDJSON lines or CSV rows"""
+
+    def __init__(self, f, fmt, write_header):
+        self.f = f
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            if write_header:
+                self.writer.writeheader()
+
+    def write(self, result):
+        if self.fmt != 'csv':
+            self.f.write(json.dumps(result) + '\n')
+            return
+        row = {column: result.get(column) for column in CSV_COLUMNS}
+        for criterion in result.get('criteria', []):
+            column = CRITERION_COLUMNS.get(criterion['name'])
+            if column:
+                row[column] = criterion['score']
+        self.writer.writerow(row)
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path, state):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class Progress:
+    """Periodic records/second readout on stderr"""
+
+    def __init__(self, interval, already_done=0):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.already_done = already_done
+        self.done = 0
+        self.failed = 0
+
+    def update(self, result):
+        self.done += 1
+        if 'error' in result:
+            self.failed += 1
+        now = time.monotonic()
+        if self.interval and now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def report(self, now=None):
+        elapsed = (now or time.monotonic()) - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        print(f'{self.already_done + self.done} scored ({self.failed} failed) '
+              f'in {elapsed:.1f}s, {rate:.1f} transcripts/s', file=sys.stderr, flush=True)
+
+
+def run(input_path, output_path, input_format=None, output_format=None, workers=None,
+        chunk_size=16, checkpoint_path=None, checkpoint_every=1000, resume=False,
+        progress_interval=5.0, stub_grammar=False, scores_only=False):
+    """Score every record of input_path into output_path; returns the Progress totals"""
+    input_format = detect_format(input_path, input_format)
+    output_format = detect_format(output_path, output_format)
+    workers = workers or os.cpu_count() or 1
+    checkpoint_path = checkpoint_path or f'{output_path}.checkpoint'
+
+    done = 0
+    output_bytes = 0
+    if resume:
+        state = load_checkpoint(checkpoint_path)
+        if state and state.get('input') == os.path.abspath(input_path):
+            done = state['records']
+            output_bytes = state['output_bytes']
+
+    # Drop anything written after the last checkpoint, then append from there
+    mode = 'r+' if done and os.path.exists(output_path) else 'w'
+    with open(output_path, mode, newline='', encoding='utf-8') as out:
+        out.seek(output_bytes)
+        out.truncate()
+        writer = ResultWriter(out, output_format, write_header=not done)
+        progress = Progress(progress_interval, already_done=done)
+        records = read_records(input_path, input_format, skip=done)
+        for result in score_in_order(records, workers, chunk_size, max_pending=workers * 4,
+                                     stub_grammar=stub_grammar, scores_only=scores_only):
+            writer.write(result)
+            progress.update(result)
+            if checkpoint_every and (done + progress.done) % checkpoint_every == 0:
+                out.flush()
+                save_checkpoint(checkpoint_path, {
+                    'input': os.path.abspath(input_path),
+                    'records': done + progress.done,
+                    'output_bytes': out.tell()
+                })
+        out.flush()
+        save_checkpoint(checkpoint_path, {
+            'input': os.path.abspath(input_path),
+            'records': done + progress.done,
+            'output_bytes': out.tell(),
+            'complete': True
+        })
+    progress.report()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score transcripts in bulk without the HTTP API')
+    parser.add_argument('input', help='NDJSON or CSV file, one transcript per record')
+    parser.add_argument('output', help='Results file (.ndjson or .csv)')
+    parser.add_argument('--input-format', choices=['ndjson', 'csv'])
+    parser.add_argument('--output-format', choices=['ndjson', 'csv'])
+    parser.add_argument('--workers', type=int, help='Scoring processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=16, help='Records sent to a worker at a time')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help='Records between checkpoints')
+    parser.add_argument('--resume', action='store_true', help='Continue from the last checkpoint')
+    parser.add_argument('--progress-interval', type=float, default=5.0, help='Seconds between progress lines')
+    parser.add_argument('--stub-grammar', action='store_true',
+                        help='Use the built-in heuristic grammar stub instead of LanguageTool')
+    parser.add_argument('--scores-only', action='store_true',
+                        help='Write criterion scores only, using the vectorized batch scorer')
+    args = parser.parse_args(argv)
+
+    progress = run(args.input, args.output, args.input_format, args.output_format, args.workers,
+                   args.chunk_size, args.checkpoint, args.checkpoint_every, args.resume,
+                   args.progress_interval, args.stub_grammar, args.scores_only)
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
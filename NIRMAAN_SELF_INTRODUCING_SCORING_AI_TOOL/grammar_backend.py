@@ -0,0 +1,290 @@
+"""Shared LanguageTool server backend.
+
+Instead of every gunicorn worker starting its own LanguageTool JVM, the
+master process spawns one (or a small pool of) LanguageTool HTTP servers and
+every worker talks to them through a pooled keep-alive HTTP client.
+"""
+import itertools
+import logging
+import os
+import shlex
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Backend configuration
+GRAMMAR_BACKEND = os.environ.get('GRAMMAR_BACKEND', 'local')  # 'local' or 'remote'
+LANGUAGETOOL_URLS = os.environ.get('LANGUAGETOOL_URLS', '')
+LANGUAGETOOL_SERVERS = int(os.environ.get('LANGUAGETOOL_SERVERS', 1))
+LANGUAGETOOL_BASE_PORT = int(os.environ.get('LANGUAGETOOL_BASE_PORT', 8081))
+LANGUAGETOOL_HOME = os.environ.get('LANGUAGETOOL_HOME', '/opt/languagetool')
+LANGUAGETOOL_SERVER_CMD = os.environ.get(
+    'LANGUAGETOOL_SERVER_CMD',
+    'java -cp {home}/languagetool-server.jar org.languagetool.server.HTTPServer '
+    '--port {port} --allow-origin "*"'
+)
+LANGUAGETOOL_TIMEOUT = float(os.environ.get('LANGUAGETOOL_TIMEOUT', 30))
+LANGUAGETOOL_POOL_SIZE = int(os.environ.get('LANGUAGETOOL_POOL_SIZE', 16))
+# Open connections per server for the asyncio client (one per in-flight check)
+LANGUAGETOOL_ASYNC_CONNECTIONS = int(os.environ.get('LANGUAGETOOL_ASYNC_CONNECTIONS', 256))
+HEALTH_CHECK_INTERVAL = float(os.environ.get('LANGUAGETOOL_HEALTH_INTERVAL', 5))
+STARTUP_TIMEOUT = float(os.environ.get('LANGUAGETOOL_STARTUP_TIMEOUT', 120))
+MAX_HEALTH_FAILURES = int(os.environ.get('LANGUAGETOOL_MAX_HEALTH_FAILURES', 3))
+
+WARM_UP_TEXT = 'Hello everyone, myself Asha. I am thirteen years old.'
+
+GrammarMatch = namedtuple('GrammarMatch', ['offset', 'length', 'rule_id', 'message'])
+
+
+def server_urls():
+    """Return the LanguageTool server URLs workers should talk to"""
+    if LANGUAGETOOL_URLS:
+        return [url.strip().rstrip('/') for url in LANGUAGETOOL_URLS.split(',') if url.strip()]
+    return [f'http://127.0.0.1:{LANGUAGETOOL_BASE_PORT + i}' for i in range(LANGUAGETOOL_SERVERS)]
+
+
+class LanguageToolClient:
+    """Pooled keep-alive HTTP client for one or more LanguageTool servers.
+
+    Mirrors the ``check(text)`` call of ``language_tool_python.LanguageTool`` so
+    it can be used wherever the in-process tool was used. Requests are spread
+    round-robin over the servers and retried on the next server when one is
+    unreachable.
+    """
+
+    def __init__(self, urls, language='en-US', timeout=LANGUAGETOOL_TIMEOUT,
+                 pool_size=LANGUAGETOOL_POOL_SIZE):
+        if not urls:
+            raise ValueError('At least one LanguageTool server URL is required')
+        self.urls = list(urls)
+        self.language = language
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.urls), pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._next_url = itertools.cycle(self.urls)
+        self._lock = threading.Lock()
+
+    def _pick_urls(self):
+        with self._lock:
+            first = next(self._next_url)
+        start = self.urls.index(first)
+        return self.urls[start:] + self.urls[:start]
+
+    def check(self, text):
+        """Check text and return a list of GrammarMatch"""
+        last_error = None
+        for url in self._pick_urls():
+            try:
+                response = self.session.post(
+                    f'{url}/v2/check',
+                    data={'text': text, 'language': self.language},
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+            except requests.ConnectionError as e:
+                last_error = e
+                continue
+            return parse_matches(response.json())
+        raise last_error
+
+    def is_healthy(self, url):
+        """Return True if the server at url answers its health endpoint"""
+        try:
+            return self.session.get(f'{url}/v2/languages', timeout=2).ok
+        except requests.RequestException:
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+def parse_matches(payload):
+    return [
+        GrammarMatch(m['offset'], m['length'], m.get('rule', {}).get('id'), m.get('message'))
+        for m in payload.get('matches', [])
+    ]
+
+
+class AsyncLanguageToolClient:
+    """``LanguageToolClient`` for asyncio code: ``await client.check(text)``.
+
+    Used by the ASGI app so a request waiting on LanguageTool holds no thread.
+    Built on httpx, which is imported only when the client is created. The
+    client belongs to the event loop it was created in.
+    """
+
+    def __init__(self, urls, language='en-US', timeout=LANGUAGETOOL_TIMEOUT,
+                 pool_size=LANGUAGETOOL_ASYNC_CONNECTIONS):
+        import httpx
+        if not urls:
+            raise ValueError('At least one LanguageTool server URL is required')
+        self.urls = list(urls)
+        self.language = language
+        self._errors = (httpx.ConnectError, httpx.ConnectTimeout)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size * len(self.urls),
+                                max_keepalive_connections=pool_size * len(self.urls))
+        )
+        self._next_url = itertools.cycle(self.urls)
+
+    def _pick_urls(self):
+        # Single-threaded event loop: no lock needed around the cycle
+        first = next(self._next_url)
+        start = self.urls.index(first)
+        return self.urls[start:] + self.urls[:start]
+
+    async def check(self, text):
+        """Check text and return a list of GrammarMatch"""
+        last_error = None
+        for url in self._pick_urls():
+            try:
+                response = await self.client.post(
+                    f'{url}/v2/check',
+                    data={'text': text, 'language': self.language}
+                )
+                response.raise_for_status()
+            except self._errors as e:
+                last_error = e
+                continue
+            return parse_matches(response.json())
+        raise last_error
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LanguageToolServer:
+    """A single locally spawned LanguageTool HTTP server process"""
+
+    def __init__(self, port, command=LANGUAGETOOL_SERVER_CMD, home=LANGUAGETOOL_HOME):
+        self.port = port
+        self.url = f'http://127.0.0.1:{port}'
+        self.command = shlex.split(command.format(port=port, home=home))
+        self.process = None
+        self.restarts = 0
+        self.health_failures = 0
+
+    def start(self):
+        logger.info('Starting LanguageTool server on port %s', self.port)
+        self.process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+class LanguageToolServerPool:
+    """Spawns, warms and supervises a small pool of LanguageTool servers.
+
+    Meant to run in the gunicorn master (see gunicorn.conf.py) so all workers
+    share the same JVMs. A monitor thread health-checks every server and
+    restarts any that crashed or stopped answering.
+    """
+
+    def __init__(self, size=LANGUAGETOOL_SERVERS, base_port=LANGUAGETOOL_BASE_PORT,
+                 command=LANGUAGETOOL_SERVER_CMD, health_interval=HEALTH_CHECK_INTERVAL):
+        self.servers = [LanguageToolServer(base_port + i, command) for i in range(size)]
+        self.client = LanguageToolClient([server.url for server in self.servers])
+        self.health_interval = health_interval
+        self._stop = threading.Event()
+        self._monitor = None
+
+    @property
+    def urls(self):
+        return [server.url for server in self.servers]
+
+    def start(self, timeout=STARTUP_TIMEOUT):
+        """Start every server, wait until healthy, warm them up and begin monitoring"""
+        for server in self.servers:
+            server.start()
+        for server in self.servers:
+            self.wait_until_healthy(server, timeout)
+            self.warm_up(server)
+        self._stop.clear()
+        self._monitor = threading.Thread(target=self._monitor_loop, name='languagetool-monitor',
+                                         daemon=True)
+        self._monitor.start()
+
+    def wait_until_healthy(self, server, timeout=STARTUP_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not server.is_running():
+                raise RuntimeError(f'LanguageTool server on port {server.port} exited during startup')
+            if self.client.is_healthy(server.url):
+                return
+            time.sleep(0.2)
+        raise TimeoutError(f'LanguageTool server on port {server.port} did not become healthy')
+
+    def warm_up(self, server):
+        """Send a first check so rule loading happens before real traffic"""
+        try:
+            self.client.session.post(
+                f'{server.url}/v2/check',
+                data={'text': WARM_UP_TEXT, 'language': self.client.language},
+                timeout=STARTUP_TIMEOUT
+            )
+        except Exception:
+            logger.warning('Warm-up request to %s failed', server.url)
+
+    def health(self):
+        """Return a health report for every server"""
+        return [
+            {
+                'url': server.url,
+                'running': server.is_running(),
+                'healthy': server.is_running() and self.client.is_healthy(server.url),
+                'restarts': server.restarts
+            }
+            for server in self.servers
+        ]
+
+    def _monitor_loop(self):
+        while not self._stop.wait(self.health_interval):
+            for server in self.servers:
+                if server.is_running():
+                    if self.client.is_healthy(server.url):
+                        server.health_failures = 0
+                        continue
+                    # A busy server may miss one probe; only restart after repeated failures
+                    server.health_failures += 1
+                    if server.health_failures < MAX_HEALTH_FAILURES:
+                        continue
+                server.health_failures = 0
+                logger.warning('LanguageTool server on port %s is down, restarting', server.port)
+                server.stop()
+                server.restarts += 1
+                try:
+                    server.start()
+                    self.wait_until_healthy(server)
+                    self.warm_up(server)
+                except Exception:
+                    logger.exception('Restarting LanguageTool server on port %s failed', server.port)
+
+    def stop(self):
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=self.health_interval + 1)
+        for server in self.servers:
+            server.stop()
+        self.client.close()
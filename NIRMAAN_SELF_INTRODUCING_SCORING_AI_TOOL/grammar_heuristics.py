@@ -0,0 +1,32 @@
+"""Fast built-in grammar heuristics.
+
+Used as a fallback when LanguageTool is slow or unavailable, so a request
+still gets an estimated grammar score (clearly flagged as degraded) instead
+of blocking or silently receiving full marks.
+"""
+import re
+from collections import namedtuple
+
+HeuristicMatch = namedtuple('HeuristicMatch', ['offset', 'length', 'rule_id', 'message'])
+
+# (rule id, pattern, message); the last group of the pattern marks the error span
+HEURISTIC_RULES = [
+    ('I_LOWERCASE', re.compile(r'\bi\b'), 'The pronoun "I" should be capitalized.'),
+    ('ENGLISH_WORD_REPEAT_RULE', re.compile(r'\b(\w+)\s+\1\b', re.IGNORECASE), 'Possible typo: you repeated a word.'),
+    ('WHITESPACE_RULE', re.compile(r'(?<=\S) {2,}(?=\S)'), 'Possible typo: you repeated a whitespace.'),
+    ('COMMA_WHITESPACE', re.compile(r'(?<=[a-zA-Z]),(?=[a-zA-Z])'), 'Put a space after the comma.'),
+    # MULTILINE so every paragraph of a batched check counts, as it would on its own
+    ('UPPERCASE_SENTENCE_START', re.compile(r'(?:^|[.!?]\s+)([a-z])', re.MULTILINE),
+     'This sentence does not start with an uppercase letter.'),
+]
+
+
+def heuristic_matches(text):
+    """Return the heuristic matches found in text, ordered by offset"""
+    matches = []
+    for rule_id, pattern, message in HEURISTIC_RULES:
+        for found in pattern.finditer(text):
+            start, end = found.span(found.lastindex or 0)
+            matches.append(HeuristicMatch(start, end - start, rule_id, message))
+    matches.sort(key=lambda match: match.offset)
+    return matches
@@ -0,0 +1,240 @@
+"""Keyed pool of grammar checkers, one per LanguageTool language.
+
+A checker is created the first time its language is asked for. At most
+GRAMMAR_POOL_MAX_TOOLS checkers stay resident, and the least recently used
+one is evicted when another language needs room. Eviction also happens when:
+
+* a checker has been idle for GRAMMAR_POOL_IDLE_SECONDS
+* the checkers' own memory exceeds GRAMMAR_POOL_MAX_MEMORY_MB (the RSS of
+  each in-process LanguageTool's JVM)
+* the machine has less than GRAMMAR_POOL_MIN_AVAILABLE_MB available
+
+The pinned languages (the default one) are never evicted, and the checker
+being created is always kept. An evicted checker that is still in use is
+closed once its last check returns. Memory is read from /proc; where that is
+unavailable, only the count and idle limits apply.
+
+Remote clients (GRAMMAR_BACKEND=remote) are cheap HTTP sessions; they go
+through the same pool so the call sites don't depend on the backend.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration
+GRAMMAR_POOL_MAX_TOOLS = int(os.environ.get('GRAMMAR_POOL_MAX_TOOLS', 3))
+GRAMMAR_POOL_IDLE_SECONDS = float(os.environ.get('GRAMMAR_POOL_IDLE_SECONDS', 1800))
+GRAMMAR_POOL_MAX_MEMORY_MB = float(os.environ.get('GRAMMAR_POOL_MAX_MEMORY_MB', 0))  # 0: no limit
+GRAMMAR_POOL_MIN_AVAILABLE_MB = float(os.environ.get('GRAMMAR_POOL_MIN_AVAILABLE_MB', 512))
+# Seconds between memory and idle checks on the request path
+GRAMMAR_POOL_CHECK_INTERVAL = float(os.environ.get('GRAMMAR_POOL_CHECK_INTERVAL', 30))
+
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo, or None"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def process_memory_mb(pid):
+    """Resident memory of a process from /proc, or None"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def tool_memory_mb(tool):
+    """Memory held by a checker: its LanguageTool server process, 0 for remote clients"""
+    server = getattr(tool, '_server', None)
+    if server is None:
+        return 0.0
+    return process_memory_mb(server.pid)
+
+
+class PooledTool:
+    __slots__ = ('language', 'tool', 'users', 'uses', 'created', 'last_used', 'evicted')
+
+    def __init__(self, language, tool):
+        self.language = language
+        self.tool = tool
+        self.users = 0
+        self.uses = 0
+        self.created = self.last_used = time.monotonic()
+        self.evicted = False
+
+
+class GrammarToolPool:
+    """LRU pool of grammar checkers keyed by language; ``factory(language)`` makes one"""
+
+    def __init__(self, factory, max_tools=GRAMMAR_POOL_MAX_TOOLS, idle_seconds=GRAMMAR_POOL_IDLE_SECONDS,
+                 max_memory_mb=GRAMMAR_POOL_MAX_MEMORY_MB, min_available_mb=GRAMMAR_POOL_MIN_AVAILABLE_MB,
+                 pinned=(), check_interval=GRAMMAR_POOL_CHECK_INTERVAL):
+        self.factory = factory
+        self.max_tools = max(1, max_tools)
+        self.idle_seconds = idle_seconds
+        self.max_memory_mb = max_memory_mb
+        self.min_available_mb = min_available_mb
+        self.pinned = frozenset(pinned)
+        self.check_interval = check_interval
+        self.created = 0
+        self.evictions = {'lru': 0, 'idle': 0, 'memory': 0}
+        self._tools = OrderedDict()  # language -> PooledTool, least recently used first
+        self._creating = {}          # language -> Event while its checker is being created
+        self._next_check = time.monotonic() + check_interval
+        self._lock = threading.Lock()
+
+    def _acquire(self, language):
+        while True:
+            with self._lock:
+                entry = self._tools.get(language)
+                if entry is not None:
+                    self._tools.move_to_end(language)
+                    entry.users += 1
+                    entry.last_used = time.monotonic()
+                    due = entry.last_used >= self._next_check
+                    if due:
+                        self._next_check = entry.last_used + self.check_interval
+                    break
+                creating = self._creating.get(language)
+                if creating is None:
+                    self._creating[language] = threading.Event()
+            if creating is not None:
+                # Another thread is starting this language's checker
+                creating.wait()
+                continue
+            try:
+                entry = PooledTool(language, self.factory(language))
+            finally:
+                with self._lock:
+                    self._creating.pop(language).set()
+            logger.info('Created grammar checker for %s', language)
+            with self._lock:
+                self.created += 1
+                entry.users += 1
+                self._tools[language] = entry
+            due = True
+            break
+        if due:
+            self.trim(keep=language)
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.uses += 1
+            close = entry.evicted and entry.users == 0
+        if close:
+            self._close(entry)
+
+    @contextmanager
+    def lease(self, language):
+        """The language's checker, held for the duration of the block"""
+        entry = self._acquire(language)
+        try:
+            yield entry.tool
+        finally:
+            self._release(entry)
+
+    def check(self, text, language):
+        with self.lease(language) as tool:
+            return tool.check(text)
+
+    def get(self, language):
+        """The language's checker without holding it (warm-up and health checks)"""
+        entry = self._acquire(language)
+        self._release(entry)
+        return entry.tool
+
+    def _evictable(self, keep):
+        return [entry for language, entry in self._tools.items()
+                if language != keep and language not in self.pinned]
+
+    def _evict(self, entry, reason):
+        del self._tools[entry.language]
+        entry.evicted = True
+        self.evictions[reason] += 1
+        logger.info('Evicting %s grammar checker (%s)', entry.language, reason)
+        return entry
+
+    def trim(self, keep=None):
+        """Evict checkers over the count, idle and memory limits; ``keep`` is never evicted"""
+        with self._lock:
+            entries = list(self._tools.values())
+        # Memory is read outside the lock: /proc reads are slow next to a dict lookup
+        measure = self.max_memory_mb or self.min_available_mb
+        memory = {entry.language: tool_memory_mb(entry.tool) for entry in entries} if measure else {}
+        available = available_memory_mb() if self.min_available_mb else None
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for entry in self._evictable(keep):
+                if self.idle_seconds and entry.users == 0 and now - entry.last_used > self.idle_seconds:
+                    evicted.append(self._evict(entry, 'idle'))
+            while len(self._tools) > self.max_tools and self._evictable(keep):
+                evicted.append(self._evict(self._evictable(keep)[0], 'lru'))
+            while self._evictable(keep) and self._over_memory(memory, available, evicted, keep):
+                evicted.append(self._evict(self._evictable(keep)[0], 'memory'))
+        for entry in evicted:
+            if entry.users == 0:
+                self._close(entry)
+        return [entry.language for entry in evicted]
+
+    def _over_memory(self, memory, available, evicted, keep):
+        """True while the resident checkers are over the memory budget"""
+        if self.max_memory_mb and sum(memory.get(language) or 0 for language in self._tools) > self.max_memory_mb:
+            return True
+        if available is None:
+            return False
+        # Memory of this round's evictions is not back in MemAvailable yet
+        freed = sum(memory.get(entry.language) or 0 for entry in evicted)
+        # Evicting checkers that hold no memory (remote clients) would not help
+        return (available + freed < self.min_available_mb and
+                any(memory.get(entry.language) for entry in self._evictable(keep)))
+
+    def _close(self, entry):
+        close = getattr(entry.tool, 'close', None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception:
+            logger.warning('Closing the %s grammar checker failed', entry.language, exc_info=True)
+
+    def close(self):
+        with self._lock:
+            entries = list(self._tools.values())
+            self._tools.clear()
+        for entry in entries:
+            entry.evicted = True
+            self._close(entry)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._tools.values())
+            stats = {
+                'max_tools': self.max_tools,
+                'created': self.created,
+                'evictions': dict(self.evictions)
+            }
+        stats['tools'] = [{
+            'language': entry.language,
+            'users': entry.users,
+            'uses': entry.uses,
+            'idle_seconds': round(now - entry.last_used, 1),
+            'memory_mb': tool_memory_mb(entry.tool)
+        } for entry in entries]
+        return stats
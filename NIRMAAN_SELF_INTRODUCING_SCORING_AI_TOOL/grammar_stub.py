@@ -0,0 +1,91 @@
+"""Lightweight local stand-in for a LanguageTool server.
+
+Speaks the subset of the LanguageTool HTTP API the app uses (``/v2/check``
+and ``/v2/languages``) and flags the built-in heuristic patterns, so the
+shared-server backend can be exercised without Java:
+
+    python grammar_stub.py --port 8081
+    LANGUAGETOOL_SERVER_CMD="python grammar_stub.py --port {port}" gunicorn -c gunicorn.conf.py app:app
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from grammar_backend import GrammarMatch
+from grammar_heuristics import heuristic_matches
+
+
+def stub_matches(text):
+    """Return GrammarMatch objects for the built-in heuristic rules"""
+    return [GrammarMatch(*match) for match in heuristic_matches(text)]
+
+
+class StubGrammarTool:
+    """In-process stand-in with the same ``check(text)`` call as the real tool"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def check(self, text):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return stub_matches(text)
+
+
+class StubLanguageToolHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/v2/languages'):
+            self._send_json([{'name': 'English (US)', 'code': 'en', 'longCode': 'en-US'}])
+        else:
+            self._send_json({'error': 'Not found'}, 404)
+
+    def do_POST(self):
+        if not self.path.startswith('/v2/check'):
+            self._send_json({'error': 'Not found'}, 404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        text = form.get('text', [''])[0]
+        if self.latency:
+            time.sleep(self.latency)
+        self._send_json({
+            'matches': [
+                {'offset': m.offset, 'length': m.length, 'message': m.message, 'rule': {'id': m.rule_id}}
+                for m in stub_matches(text)
+            ]
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1', latency=0.0):
+    StubLanguageToolHandler.latency = latency
+    # Room for load tests that open hundreds of connections at once
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer((host, port), StubLanguageToolHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a LanguageTool stand-in server')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to sleep per check')
+    args = parser.parse_args()
+    serve(args.port, args.host, args.latency).serve_forever()
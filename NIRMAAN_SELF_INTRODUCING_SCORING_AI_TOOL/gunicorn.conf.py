@@ -0,0 +1,98 @@
+"""Gunicorn configuration.
+
+With GRAMMAR_BACKEND=remote the master process spawns and supervises the
+shared LanguageTool server pool before any worker is forked, so all workers
+talk to the same warmed-up JVMs instead of starting one each.
+
+The app is preloaded in the master and its read-only resources (sentiment
+lexicon, compiled matchers) are warmed there, so workers share them
+copy-on-write. Anything that is not fork-safe (grammar tool, thread pools)
+is created per worker in post_worker_init.
+
+Workers are threaded (gthread) by default: admission control queues
+requests inside a worker, which a sync worker holding one request at a time
+cannot do, so sync workers are refused while ADMISSION_ENABLED=1. Every
+worker enforces its share of the admission limits (see admission.py), and
+its running plus queued analyses are capped at ``threads`` minus
+ADMISSION_RESERVED_THREADS, so health checks and metrics still get a thread.
+
+Several workers need a job store they all read, so unless JOB_STORE_PATH is
+set, jobs go to a temporary SQLite file for the life of the master. Live
+sessions stay in one worker, so with several workers only the single-request
+/api/sessions/stream endpoint is served (see streaming.py).
+
+When METRICS_DIR is set, workers write metric snapshots there and
+/api/metrics on any worker reports the merged totals; the directory is
+cleared when the master starts.
+"""
+import os
+import tempfile
+
+import admission
+import grammar_backend
+import jobs
+import metrics
+import streaming
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+# uvicorn.workers.UvicornWorker serves asgi:app (see asgi.py)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Spawn the pool here unless LANGUAGETOOL_URLS points at servers managed elsewhere
+SPAWN_LANGUAGETOOL = (grammar_backend.GRAMMAR_BACKEND == 'remote'
+                      and not grammar_backend.LANGUAGETOOL_URLS)
+
+if admission.ADMISSION_ENABLED and worker_class == 'sync':
+    raise RuntimeError('Admission control needs GUNICORN_WORKER_CLASS=gthread or the ASGI worker; '
+                       'sync workers hold one request each (or set ADMISSION_ENABLED=0)')
+# Workers are forked from this process, so they all see the worker count
+admission.ADMISSION_PROCESSES = workers
+if worker_class == 'gthread':
+    admission.ADMISSION_THREADS = threads
+streaming.SESSION_PROCESSES = workers
+
+# A status poll may reach any worker, which the in-memory job store can't answer
+TEMPORARY_JOB_STORE = workers > 1 and not jobs.JOB_STORE_PATH
+if TEMPORARY_JOB_STORE:
+    jobs.JOB_STORE_PATH = os.path.join(tempfile.gettempdir(), f'nirmaan-jobs-{os.getpid()}.db')
+
+languagetool_pool = None
+
+
+def on_starting(server):
+    global languagetool_pool
+    if metrics.METRICS_DIR:
+        os.makedirs(metrics.METRICS_DIR, exist_ok=True)
+        metrics.REGISTRY.clear_directory()
+    if SPAWN_LANGUAGETOOL:
+        languagetool_pool = grammar_backend.LanguageToolServerPool()
+        languagetool_pool.start()
+        server.log.info('LanguageTool pool ready: %s', ', '.join(languagetool_pool.urls))
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.warm_up()
+        server.log.info('App warmed up before fork in %ss (import took %ss)',
+                        app.startup_stats['warm_up_seconds'], app.startup_stats['import_seconds'])
+
+
+def post_worker_init(worker):
+    import app
+    app.warm_up_worker()
+
+
+def on_exit(server):
+    if languagetool_pool is not None:
+        languagetool_pool.stop()
+    if TEMPORARY_JOB_STORE:
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(jobs.JOB_STORE_PATH + suffix)
+            except FileNotFoundError:
+                pass
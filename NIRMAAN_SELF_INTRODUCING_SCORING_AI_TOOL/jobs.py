@@ -0,0 +1,174 @@
+"""Asynchronous analysis jobs.
+
+Long transcripts are submitted as jobs that run on a bounded background pool
+while the request returns immediately with a job id. Job state lives either
+in process memory or, when JOB_STORE_PATH is set, in a SQLite file so any
+gunicorn worker can answer a status poll. No external broker is needed.
+
+The memory store only works for a single process: with several workers a
+poll usually reaches a worker that never saw the job. gunicorn.conf.py
+therefore points JOB_STORE_PATH at a temporary SQLite file when it runs more
+than one worker and none is configured.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Job configuration
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 100))
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', '')
+JOB_TTL = float(os.environ.get('JOB_TTL', 3600))
+JOB_RETRY_AFTER = int(os.environ.get('JOB_RETRY_AFTER', 5))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its depth limit"""
+
+
+class MemoryJobStore:
+    """In-process job store; finished jobs expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl=JOB_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        with self._lock:
+            self._purge()
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': QUEUED,
+                'created': time.time(),
+                'started': None,
+                'finished': None,
+                'result': None,
+                'error': None
+            }
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job store in a SQLite file shared by every worker process"""
+
+    def __init__(self, path, ttl=JOB_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'job_id TEXT PRIMARY KEY, status TEXT NOT NULL, created REAL NOT NULL, '
+                'started REAL, finished REAL, result TEXT, error TEXT)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute('DELETE FROM jobs WHERE finished < ?', (now - self.ttl,))
+            conn.execute('INSERT INTO jobs (job_id, status, created) VALUES (?, ?, ?)',
+                         (job_id, QUEUED, now))
+
+    def update(self, job_id, **fields):
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'])
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        conn = self._connect()
+        with conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['result'] is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+
+class JobQueue:
+    """Runs jobs on a bounded thread pool with a queue-depth limit"""
+
+    def __init__(self, run, store=None, workers=JOB_WORKERS, max_queued=JOB_QUEUE_LIMIT):
+        self.run = run
+        self.store = store if store is not None else (
+            SQLiteJobStore(JOB_STORE_PATH) if JOB_STORE_PATH else MemoryJobStore()
+        )
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis-job')
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self):
+        """Jobs accepted but not yet finished"""
+        return self._outstanding
+
+    def submit(self, *args):
+        """Queue a job and return its id, or raise QueueFullError"""
+        with self._lock:
+            if self._outstanding >= self.max_queued:
+                raise QueueFullError(f'Job queue is full ({self.max_queued} outstanding jobs)')
+            self._outstanding += 1
+        job_id = uuid.uuid4().hex
+        try:
+            self.store.create(job_id)
+            self.executor.submit(self._execute, job_id, args)
+        except Exception:
+            with self._lock:
+                self._outstanding -= 1
+            raise
+        return job_id
+
+    def _execute(self, job_id, args):
+        try:
+            self.store.update(job_id, status=RUNNING, started=time.time())
+            result = self.run(*args)
+            self.store.update(job_id, status=DONE, finished=time.time(), result=result)
+        except Exception as e:
+            self.store.update(job_id, status=FAILED, finished=time.time(), error=str(e))
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+
+    def get(self, job_id):
+        return self.store.get(job_id)
@@ -0,0 +1,185 @@
+"""Closed-loop HTTP load test for /api/analyze.
+
+``--concurrency`` clients each send requests back to back. Every request
+carries a distinct synthetic transcript (from ``benchmark.generate_transcript``
+plus a unique closing sentence), so the result cache never answers and
+every request waits on a grammar check. The report gives throughput, latency
+percentiles and status counts per target.
+
+Against running servers:
+
+    python load_test.py --url http://localhost:5000 --concurrency 200 --requests 2000
+
+``--compare`` starts everything itself and runs the same load against both
+deployments. A LanguageTool stand-in (grammar_stub.py) answers with a fixed
+``--grammar-latency``. The two servers are ``gunicorn -w 4`` with sync
+workers (app:app) and a single uvicorn process (asgi:app):
+
+    python load_test.py --compare --grammar-latency 0.2 --concurrency 200 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from benchmark import generate_transcript, summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_payloads(count, seed=7):
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        transcript = generate_transcript(rng, rng.choice((3, 8, 20)), rng.choice((0.0, 0.05)))
+        payloads.append({
+            'transcript': f'{transcript} My roll number is {i}.',
+            'duration_seconds': 52
+        })
+    return payloads
+
+
+async def run_load(url, payloads, concurrency, timeout=120):
+    """Send every payload with ``concurrency`` workers; returns the report"""
+    latencies, statuses, degraded = [], Counter(), 0
+    pending = iter(payloads)
+    # Expire idle connections before the server does (uvicorn closes them after 5 s)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=2)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal degraded
+            for payload in pending:
+                start = time.perf_counter()
+                try:
+                    response = await client.post('/api/analyze', json=payload)
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[str(response.status_code)] += 1
+                if response.status_code == 200 and response.json().get('degraded'):
+                    degraded += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'url': url,
+        'requests': len(payloads),
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(payloads) / elapsed, 1),
+        'statuses': dict(statuses),
+        'degraded': degraded,
+        'latency': summarize(latencies)
+    }
+
+
+def wait_for_health(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server for {url} exited with {process.returncode}')
+        try:
+            if httpx.get(f'{url}/api/health', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f'{url} did not become healthy')
+
+
+def start(command, env):
+    return subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def compare(args, payloads):
+    """Run the load against gunicorn -w 4 (sync) and uvicorn (ASGI), each on a fresh server"""
+    stub_port, port = args.base_port, args.base_port + 1
+    env = dict(os.environ,
+               GRAMMAR_BACKEND='remote',
+               LANGUAGETOOL_URLS=f'http://127.0.0.1:{stub_port}',
+               RESULTS_DB_PATH='',
+               RESULT_CACHE_PATH='',
+               METRICS_DIR='',
+               PROFILE_DIR='',
+               # One client sends all the load; compare raw serving capacity
+               ADMISSION_ENABLED='0')
+    targets = [
+        ('gunicorn -w 4 (sync)', [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                  '--workers', '4', '--worker-class', 'sync', '--bind', f'127.0.0.1:{port}', 'app:app']),
+        ('uvicorn (asgi)', [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1',
+                            '--port', str(port), '--workers', str(args.asgi_workers), '--log-level', 'warning'])
+    ]
+    stub = start([sys.executable, 'grammar_stub.py', '--port', str(stub_port),
+                  '--latency', str(args.grammar_latency)], env)
+    reports = []
+    try:
+        for name, command in targets:
+            server = start(command, env)
+            url = f'http://127.0.0.1:{port}'
+            try:
+                wait_for_health(url, server)
+                report = asyncio.run(run_load(url, payloads, args.concurrency))
+            finally:
+                stop(server)
+            report['target'] = name
+            reports.append(report)
+    finally:
+        stop(stub)
+    return reports
+
+
+def print_reports(reports):
+    print(f"{'target':<24} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}  statuses")
+    for report in reports:
+        latency = report['latency']
+        print(f"{report.get('target', report['url']):<24} {report['throughput_rps']:>8} "
+              f"{latency.get('p50_ms', 0):>9.1f} {latency.get('p95_ms', 0):>9.1f} "
+              f"{latency.get('max_ms', 0):>9.1f}  {report['statuses']} degraded={report['degraded']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test /api/analyze')
+    parser.add_argument('--url', action='append', help='Server to load (repeatable)')
+    parser.add_argument('--compare', action='store_true', help='Start and compare gunicorn -w 4 and uvicorn')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--grammar-latency', type=float, default=0.2, help='Stub LanguageTool seconds per check')
+    parser.add_argument('--asgi-workers', type=int, default=1)
+    parser.add_argument('--base-port', type=int, default=5100)
+    parser.add_argument('--output', help='Write the JSON reports to this path')
+    args = parser.parse_args(argv)
+    if not args.compare and not args.url:
+        parser.error('give --url or --compare')
+
+    payloads = make_payloads(args.requests)
+    if args.compare:
+        reports = compare(args, payloads)
+    else:
+        reports = [asyncio.run(run_load(url, payloads, args.concurrency)) for url in args.url]
+    print_reports(reports)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are kept in plain dicts behind one lock, so
+recording a sample costs a few microseconds. Under gunicorn each worker has
+its own registry; when METRICS_DIR is set every worker periodically writes a
+JSON snapshot there and ``/api/metrics`` merges all snapshots, so a scrape of
+any worker reports totals for the whole server.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Metrics configuration
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+WORD_BUCKETS = (25, 50, 100, 200, 400, 800, 1600, 3200, 6400)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._registry = registry
+        self._samples = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        # Label values must already be strings; this runs on every sample
+        return tuple(map(labels.__getitem__, self.labels))
+
+    def snapshot(self):
+        return {
+            'type': self.kind,
+            'help': self.description,
+            'labels': list(self.labels),
+            'samples': [[list(key), value] for key, value in self._samples.items()]
+        }
+
+    def reset(self):
+        self._samples.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._registry.lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge summed across live workers (e.g. requests in flight)"""
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._registry.lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._registry.lock:
+            self._samples[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, description, labels)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._registry.lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                # Per-bucket (non-cumulative) counts, then +Inf, sum and count
+                sample = self._samples[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class Registry:
+    """All metrics of one process, optionally shared with sibling workers via METRICS_DIR"""
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._flusher_pid = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+
+    def counter(self, name, description, labels=()):
+        return Counter(self, name, description, labels)
+
+    def gauge(self, name, description, labels=()):
+        return Gauge(self, name, description, labels)
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        return Histogram(self, name, description, labels, buckets)
+
+    def reset(self):
+        """Forget every sample (a forked worker must not re-report its parent's)"""
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.reset()
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    # Cross-worker aggregation
+
+    def _snapshot_path(self, pid=None):
+        return os.path.join(self.directory, f'worker-{pid or os.getpid()}.json')
+
+    def start_flusher(self):
+        """Start this process's background snapshot writer (once per pid)"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        """Atomically write this process's snapshot into the shared directory"""
+        path = self._snapshot_path()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'pid': os.getpid(), 'time': time.time(), 'metrics': self.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def clear_directory(self):
+        """Remove every worker snapshot (call once when the server starts)"""
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json*')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def collect(self):
+        """Merged snapshot of every worker, or of this process alone without METRICS_DIR"""
+        if not self.directory:
+            return self.snapshot()
+        self.start_flusher()
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return merge(snapshots)
+
+    def render(self):
+        return render(self.collect())
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(snapshots):
+    """Sum worker snapshots; gauges only count workers that are still running"""
+    merged = {}
+    for snapshot in snapshots:
+        alive = _pid_alive(snapshot['pid'])
+        for name, metric in snapshot['metrics'].items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            if metric['type'] == 'gauge' and not alive:
+                continue
+            for labels, value in metric['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = current + value
+    for metric in merged.values():
+        metric['samples'] = [[list(key), value] for key, value in metric['samples'].items()]
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        for labels, value in sorted(metric['samples']):
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_label_text(metric["labels"], labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + [float('inf')], value):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f'{name}_bucket{_label_text(metric["labels"], labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_label_text(metric["labels"], labels)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_label_text(metric["labels"], labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
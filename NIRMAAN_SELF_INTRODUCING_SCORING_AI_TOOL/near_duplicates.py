@@ -0,0 +1,324 @@
+"""In-memory near-duplicate index of analyzed transcripts (MinHash + LSH).
+
+Self-introductions are often copied from a classmate or from a template with
+only the name and a few details changed. Every analyzed transcript is added
+to this index, and every new transcript is looked up in it first:
+
+* a transcript's shingles are its runs of NEAR_DUPLICATE_SHINGLE_WORDS
+  consecutive lowercased words. Its MinHash signature is the minimum of each
+  of NEAR_DUPLICATE_PERMUTATIONS hash functions over those shingles. The
+  share of positions where two signatures agree estimates the Jaccard
+  similarity of the two shingle sets.
+* each signature is cut into NEAR_DUPLICATE_BANDS bands. Transcripts that
+  agree on a whole band are candidates. With the defaults (16 bands of 4
+  rows), a pair at similarity 0.6 becomes a candidate 89% of the time, at
+  0.7 99% of the time, and at 0.3 only 12% of the time.
+* the candidate with the highest estimated similarity is the match, if that
+  similarity is at least NEAR_DUPLICATE_THRESHOLD.
+
+A lookup is two binary searches per band over one sorted array of band keys,
+plus a comparison with the candidates' signatures. Its cost therefore barely
+grows with the number of indexed transcripts. Each key packs the band, the
+band's hash and the entry's slot into 64 bits, so the array is rebuilt with
+a plain sort, in a background thread. Meanwhile, transcripts added since the
+last rebuild are found through a dict.
+
+The index keeps at most NEAR_DUPLICATE_INDEX_SIZE transcripts (0 disables
+it). When it is full, the oldest one is evicted ('fifo'). With
+NEAR_DUPLICATE_EVICTION=lru, a matched transcript counts as new again, so
+the least recently matched one goes first. Signatures and band tables take
+about 4 * permutations + 8 * bands + 64 bytes per transcript, which is 448
+bytes with the defaults. The optional payload of each entry comes on top.
+Like the result cache, each worker process has its own index.
+"""
+import os
+import re
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+# Index configuration
+NEAR_DUPLICATE_INDEX_SIZE = int(os.environ.get('NEAR_DUPLICATE_INDEX_SIZE', 100000))  # 0: disabled
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.6))
+NEAR_DUPLICATE_PERMUTATIONS = int(os.environ.get('NEAR_DUPLICATE_PERMUTATIONS', 64))
+NEAR_DUPLICATE_BANDS = int(os.environ.get('NEAR_DUPLICATE_BANDS', 16))
+NEAR_DUPLICATE_SHINGLE_WORDS = int(os.environ.get('NEAR_DUPLICATE_SHINGLE_WORDS', 3))
+NEAR_DUPLICATE_EVICTION = os.environ.get('NEAR_DUPLICATE_EVICTION', 'fifo')  # 'fifo' or 'lru'
+
+WORD = re.compile(r'\w+')
+# Band table key: band (5 bits) | band hash (32 bits) | slot (27 bits)
+SLOT_BITS = 27
+HASH_SHIFT = np.uint64(SLOT_BITS)
+BAND_SHIFT = np.uint64(SLOT_BITS + 32)
+MAX_BANDS = 32
+MAX_CAPACITY = 1 << SLOT_BITS
+# Rebuild the band tables once this share of the entries is only in the dict
+REBUILD_FRACTION = 0.02
+REBUILD_MIN_ENTRIES = 1024
+# Entries taken from one band bucket (a template copied thousands of times)
+MAX_BUCKET_CANDIDATES = 64
+# Signatures turned into band keys at a time during a rebuild
+REBUILD_CHUNK = 65536
+
+Probe = namedtuple('Probe', ['signature', 'ref', 'match'])
+Match = namedtuple('Match', ['ref', 'similarity', 'payload'])
+
+
+def _odd_constants(rng, count):
+    return rng.integers(1, 1 << 63, count, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+class MinHasher:
+    """Shingling and MinHash signatures, with multiply-shift hash functions"""
+
+    def __init__(self, permutations=NEAR_DUPLICATE_PERMUTATIONS, shingle_words=NEAR_DUPLICATE_SHINGLE_WORDS,
+                 seed=1):
+        rng = np.random.default_rng(seed)
+        self.permutations = permutations
+        self.shingle_words = max(1, shingle_words)
+        self._mix = _odd_constants(rng, self.shingle_words)
+        self._a = _odd_constants(rng, permutations)[:, None]
+        self._b = rng.integers(0, 1 << 63, permutations, dtype=np.uint64)[:, None]
+
+    def shingles(self, text):
+        """Distinct 32-bit hashes of the text's word shingles"""
+        words = WORD.findall(text.lower())
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+        size = min(self.shingle_words, len(words))
+        count = len(words) - size + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            shingles += hashes[offset:offset + count] * self._mix[offset]
+        return np.unique(shingles >> np.uint64(32))
+
+    def signature(self, text):
+        """uint32 MinHash signature of a text, or None if it has no words"""
+        shingles = self.shingles(text)
+        if not len(shingles):
+            return None
+        values = (self._a * shingles + self._b) >> np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """Bounded MinHash/LSH index; an entry is a signature, a ref (up to 64 ASCII characters) and a payload"""
+
+    def __init__(self, capacity=NEAR_DUPLICATE_INDEX_SIZE, threshold=NEAR_DUPLICATE_THRESHOLD,
+                 permutations=NEAR_DUPLICATE_PERMUTATIONS, bands=NEAR_DUPLICATE_BANDS,
+                 shingle_words=NEAR_DUPLICATE_SHINGLE_WORDS, eviction=NEAR_DUPLICATE_EVICTION):
+        if not 1 <= bands <= MAX_BANDS or permutations % bands:
+            raise ValueError(f'NEAR_DUPLICATE_BANDS must be 1 to {MAX_BANDS} and divide NEAR_DUPLICATE_PERMUTATIONS')
+        if capacity > MAX_CAPACITY:
+            raise ValueError(f'NEAR_DUPLICATE_INDEX_SIZE must be at most {MAX_CAPACITY}')
+        if eviction not in ('fifo', 'lru'):
+            raise ValueError(f'Unknown NEAR_DUPLICATE_EVICTION {eviction!r}')
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = permutations // bands
+        self.eviction = eviction
+        self.hasher = MinHasher(permutations, shingle_words)
+        rng = np.random.default_rng(2)
+        self._row_mix = _odd_constants(rng, self.rows)
+        self._band_ids = np.arange(bands, dtype=np.uint64) << BAND_SHIFT
+
+        self.signatures = np.zeros((self.capacity, permutations), dtype=np.uint32)
+        self.refs = np.zeros(self.capacity, dtype='S64')  # b'' marks a free slot
+        self.payloads = [None] * self.capacity
+        self.size = 0
+        self.added = 0
+        self.evictions = 0
+        self.lookups = 0
+        self.matches = 0
+        self.rebuilds = 0
+        self.rebuild_seconds = None
+        self._next = 0          # slot the next entry goes to (a ring over the arrays)
+        self._filled = 0        # slots written at least once
+        # Sorted band table keys of every filled slot, as of the last rebuild
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._recent = {}       # band key (slot bits 0) -> slots added since the rebuild started
+        self._unsorted = 0      # entries only in _recent
+        self._building = {}     # the previous _recent while a rebuild runs
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def band_keys(self, signatures):
+        """Band table keys (slot bits 0) of one signature or an (n, permutations) array"""
+        bands = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        hashes = (bands * self._row_mix).sum(axis=2) >> np.uint64(32)
+        return ((hashes << HASH_SHIFT) | self._band_ids).reshape(signatures.shape[:-1] + (self.bands,))
+
+    def probe(self, text, ref):
+        """Probe(signature, ref, match) for a text; the match is None without a near-duplicate"""
+        signature = self.hasher.signature(text)
+        match = None if signature is None else self.query(signature)
+        return Probe(signature, ref, match)
+
+    def query(self, signature):
+        """Most similar indexed entry as a Match, or None below the threshold"""
+        keys = self.band_keys(signature)
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            lows = np.searchsorted(self._keys, keys)
+            highs = np.searchsorted(self._keys, keys + np.uint64(MAX_CAPACITY))
+            for low, high in zip(lows.tolist(), highs.tolist()):
+                if high > low:
+                    bucket = self._keys[low:min(high, low + MAX_BUCKET_CANDIDATES)] & np.uint64(MAX_CAPACITY - 1)
+                    candidates.update(bucket.tolist())
+            for key in keys.tolist():
+                for recent in (self._recent, self._building):
+                    slots = recent.get(key)
+                    if slots:
+                        candidates.update(slots[-MAX_BUCKET_CANDIDATES:])
+            if not candidates:
+                return None
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            # Band tables may point at slots reused since; the signature check settles it
+            agree = (self.signatures[slots] == signature).sum(axis=1)
+            agree[self.refs[slots] == b''] = -1
+            best = int(agree.argmax())
+            similarity = agree[best] / len(signature)
+            if similarity < self.threshold:
+                return None
+            slot = int(slots[best])
+            self.matches += 1
+            match = Match(self.refs[slot].decode('ascii'), float(similarity), self.payloads[slot])
+            if self.eviction == 'lru':
+                self._move_to_front(slot)
+            return match
+
+    def add(self, signature, ref, payload=None):
+        """Index an entry, evicting the oldest one when full"""
+        keys = self.band_keys(signature).tolist()
+        with self._lock:
+            self._store(signature, ref, payload, keys)
+            self._maybe_rebuild()
+
+    def add_many(self, signatures, refs):
+        """Index many entries without payloads at once, then rebuild the band tables (bulk loads)"""
+        with self._lock:
+            for signature, ref in zip(signatures, refs):
+                slot = self._take_slot()
+                self.signatures[slot] = signature
+                self.refs[slot] = ref
+        self.rebuild()
+
+    def _take_slot(self):
+        slot = self._next
+        if self.refs[slot] != b'':
+            self.evictions += 1
+            self.size -= 1
+        self.payloads[slot] = None
+        self._next = (slot + 1) % self.capacity
+        self._filled = max(self._filled, self._next or self.capacity)
+        self.size += 1
+        self.added += 1
+        return slot
+
+    def _store(self, signature, ref, payload, keys):
+        slot = self._take_slot()
+        self.signatures[slot] = signature
+        self.refs[slot] = ref
+        self.payloads[slot] = payload
+        for key in keys:
+            self._recent.setdefault(key, []).append(slot)
+        self._unsorted += 1
+        return slot
+
+    def _move_to_front(self, slot):
+        """Re-add an entry at the head of the ring so it is evicted last"""
+        signature = self.signatures[slot].copy()
+        ref, payload = self.refs[slot].decode('ascii'), self.payloads[slot]
+        self.refs[slot] = b''
+        self.payloads[slot] = None
+        self.size -= 1
+        self.added -= 1
+        self._store(signature, ref, payload, self.band_keys(signature).tolist())
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if self._rebuilding or self._unsorted < max(REBUILD_MIN_ENTRIES, REBUILD_FRACTION * self.size):
+            return
+        self._start_rebuild()
+        threading.Thread(target=self._rebuild, name='near-duplicate-rebuild', daemon=True).start()
+
+    def _start_rebuild(self):
+        self._rebuilding = True
+        self._building, self._recent = self._recent, {}
+        self._unsorted = 0
+
+    def rebuild(self):
+        """Rebuild the band tables now, unless a background rebuild is running"""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._start_rebuild()
+        self._rebuild()
+
+    def _rebuild(self):
+        start = time.perf_counter()
+        try:
+            # Slots written after this point are in _recent; the tables may miss them
+            filled = self._filled
+            parts = [np.empty(0, dtype=np.uint64)]
+            for offset in range(0, filled, REBUILD_CHUNK):
+                # Freed slots are left out, so they don't crowd a bucket's live entries
+                slots = offset + np.flatnonzero(self.refs[offset:min(offset + REBUILD_CHUNK, filled)] != b'')
+                keys = self.band_keys(self.signatures[slots]) | slots.astype(np.uint64)[:, None]
+                parts.append(keys.ravel())
+            keys = np.concatenate(parts)
+            keys.sort()
+        except BaseException:
+            with self._lock:
+                # Keep the entries findable through the dict
+                for key, building in self._building.items():
+                    self._recent.setdefault(key, [])[:0] = building
+                self._building = {}
+                self._rebuilding = False
+            raise
+        with self._lock:
+            self._keys = keys
+            self._building = {}
+            self._rebuilding = False
+            self.rebuilds += 1
+            self.rebuild_seconds = round(time.perf_counter() - start, 3)
+
+    def clear(self):
+        with self._lock:
+            self.refs[:] = b''
+            self.payloads = [None] * self.capacity
+            self.size = self._next = self._filled = 0
+            self._keys = np.empty(0, dtype=np.uint64)
+            self._recent = {}
+            self._building = {}
+            self._unsorted = 0
+
+    def memory_mb(self):
+        """Approximate memory of the signatures, refs and band tables (payloads excluded)"""
+        arrays = (self.signatures, self.refs, self._keys)
+        return round(sum(array.nbytes for array in arrays) / (1024 * 1024), 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'size': self.size,
+                'added': self.added,
+                'evictions': self.evictions,
+                'eviction': self.eviction,
+                'lookups': self.lookups,
+                'matches': self.matches,
+                'threshold': self.threshold,
+                'permutations': self.hasher.permutations,
+                'bands': self.bands,
+                'unsorted': self._unsorted,
+                'rebuilds': self.rebuilds,
+                'rebuild_seconds': self.rebuild_seconds,
+                'memory_mb': self.memory_mb()
+            }
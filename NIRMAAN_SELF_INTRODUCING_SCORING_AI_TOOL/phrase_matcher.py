@@ -0,0 +1,139 @@
+"""Single-pass multi-phrase matching for the rubric phrase lists.
+
+An Aho-Corasick automaton is built once over every rubric phrase (salutations,
+keywords, flow markers and filler words). Scanning a transcript walks the
+text a single time and records every occurrence of every phrase together with
+the sentence it falls in and whether it sits on word boundaries, so each
+analyzer can answer its questions from the recorded hits instead of
+rescanning the text.
+"""
+import re
+from bisect import bisect_right
+from collections import defaultdict
+
+SENTENCE_DELIMITERS = re.compile(r'[^.!?]+')
+WORD_CHAR = re.compile(r'\w')
+
+
+def sentence_spans(text):
+    """Return (start, end) spans of the non-empty sentences in text.
+
+    Splits exactly like ``re.split(r'[.!?]+', text)`` and drops blank pieces, so
+    span i corresponds to ``SpeechAnalyzer.sentences[i]``.
+    """
+    return [match.span() for match in SENTENCE_DELIMITERS.finditer(text) if match.group().strip()]
+
+
+def is_boundary(text, position):
+    """True where ``\\b`` would match in text at position"""
+    before = position > 0 and WORD_CHAR.match(text, position - 1) is not None
+    after = position < len(text) and WORD_CHAR.match(text, position) is not None
+    return before != after
+
+
+class PhraseHits:
+    """Every phrase occurrence found in one scan of a text"""
+
+    def __init__(self, text, occurrences):
+        self.text = text
+        # phrase -> list of (start, end, sentence_index, whole_word), ordered by start
+        self.occurrences = occurrences
+
+    def contains(self, phrase, sentence=None, whole_word=False):
+        """True if phrase occurs as a substring, or as whole words (optionally within one sentence index)"""
+        hits = self.occurrences.get(phrase, ())
+        if sentence is None and not whole_word:
+            return bool(hits)
+        return any((sentence is None or hit[2] == sentence) and (hit[3] or not whole_word) for hit in hits)
+
+    def contains_any(self, phrases, sentence=None, whole_words=frozenset()):
+        """True if any phrase occurs; those in whole_words must sit on word boundaries"""
+        return any(self.contains(phrase, sentence, phrase in whole_words) for phrase in phrases)
+
+    def first_sentence_with(self, phrases):
+        """Index of the first sentence containing any of phrases, or -1"""
+        indices = [hit[2] for phrase in phrases for hit in self.occurrences.get(phrase, ()) if hit[2] >= 0]
+        return min(indices) if indices else -1
+
+    def count(self, phrase, whole_word=False):
+        """Count non-overlapping occurrences, scanning left to right.
+
+        With whole_word=False this matches ``str.count``; with whole_word=True it
+        matches ``len(re.findall(r'\\b' + re.escape(phrase) + r'\\b', text))``.
+        """
+        count = 0
+        next_free = 0
+        for start, end, _, is_word in self.occurrences.get(phrase, ()):
+            if start < next_free or (whole_word and not is_word):
+                continue
+            count += 1
+            next_free = end
+        return count
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over a fixed set of phrases"""
+
+    def __init__(self, phrases):
+        self.phrases = tuple(dict.fromkeys(phrase.strip() for phrase in phrases if phrase.strip()))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for char in phrase:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = self._output[state] + (index,)
+        self._build_failure_links()
+        self._lengths = tuple(len(phrase) for phrase in self.phrases)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        position = 0
+        while position < len(queue):
+            state = queue[position]
+            position += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def scan(self, text, spans=None):
+        """Scan text once and return PhraseHits.
+
+        ``spans`` are the sentence spans used to tag each hit with its sentence
+        index; they default to ``sentence_spans(text)``.
+        """
+        if spans is None:
+            spans = sentence_spans(text)
+        sentence_starts = [start for start, _ in spans]
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._lengths
+        found = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                end = position + 1
+                for index in output[state]:
+                    found.append((index, end - lengths[index], end))
+
+        occurrences = defaultdict(list)
+        for index, start, end in sorted(found, key=lambda hit: hit[1]):
+            sentence = bisect_right(sentence_starts, start) - 1
+            if sentence >= 0 and start >= spans[sentence][1]:
+                sentence = -1
+            whole_word = is_boundary(text, start) and is_boundary(text, end)
+            occurrences[self.phrases[index]].append((start, end, sentence, whole_word))
+        return PhraseHits(text, dict(occurrences))
@@ -0,0 +1,119 @@
+"""Summarize profile traces written by profiled /api/analyze requests.
+
+Reads every trace in a trace directory (PROFILE_DIR by default) and prints
+per-stage latency statistics sorted by total time, the slowest traces
+with their slowest stages, and, for cProfile traces, the functions with
+the most cumulative time across traces.
+
+    python profile_report.py
+    python profile_report.py logs/profiles --slowest 20 --since 3600
+    python profile_report.py --json > report.json
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+
+import profiling
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def summarize(traces, slowest=10, functions=15):
+    stages = defaultdict(list)
+    calls = defaultdict(lambda: [0, 0, 0.0])  # function -> [traces, calls, cumulative ms]
+    collected = []
+    for trace in traces:
+        collected.append(trace)
+        for stage, ms in trace.get('stages', {}).items():
+            stages[stage].append(ms)
+        for row in trace.get('functions') or ():
+            entry = calls[row['function']]
+            entry[0] += 1
+            entry[1] += row['calls']
+            entry[2] += row['cumulative_ms']
+
+    stage_rows = []
+    for stage, values in stages.items():
+        values.sort()
+        stage_rows.append({
+            'stage': stage,
+            'count': len(values),
+            'total_ms': round(sum(values), 3),
+            'mean_ms': round(sum(values) / len(values), 3),
+            'p50_ms': percentile(values, 0.5),
+            'p95_ms': percentile(values, 0.95),
+            'max_ms': values[-1]
+        })
+    stage_rows.sort(key=lambda row: row['total_ms'], reverse=True)
+
+    collected.sort(key=lambda trace: trace.get('elapsed_ms', 0), reverse=True)
+    slow_rows = [{
+        'id': trace.get('id'),
+        'time': trace.get('time'),
+        'elapsed_ms': trace.get('elapsed_ms'),
+        'word_count': trace.get('word_count'),
+        'transcript_hash': trace.get('transcript_hash'),
+        'top_stages': sorted(trace.get('stages', {}).items(), key=lambda item: item[1], reverse=True)[:3]
+    } for trace in collected[:slowest]]
+
+    function_rows = sorted((
+        {'function': name, 'traces': count, 'calls': n, 'cumulative_ms': round(ms, 3)}
+        for name, (count, n, ms) in calls.items()
+    ), key=lambda row: row['cumulative_ms'], reverse=True)[:functions]
+
+    return {'traces': len(collected), 'stages': stage_rows, 'slowest': slow_rows, 'functions': function_rows}
+
+
+def print_report(report, out=sys.stdout):
+    print(f"{report['traces']} traces", file=out)
+    if not report['traces']:
+        return
+    print(f"\n{'stage':<16} {'count':>6} {'total ms':>11} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}", file=out)
+    for row in report['stages']:
+        print(f"{row['stage']:<16} {row['count']:>6} {row['total_ms']:>11.3f} {row['mean_ms']:>9.3f} "
+              f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['max_ms']:>9.3f}", file=out)
+
+    print('\nSlowest traces', file=out)
+    for row in report['slowest']:
+        stages = ', '.join(f'{stage} {ms:.1f}ms' for stage, ms in row['top_stages'])
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['time'] or 0))
+        print(f"  {row['elapsed_ms']:>9.3f} ms  {when}  {row['word_count']} words  "
+              f"{(row['transcript_hash'] or '')[:12]}  {stages}", file=out)
+
+    if report['functions']:
+        print('\nHottest functions (cProfile traces)', file=out)
+        for row in report['functions']:
+            print(f"  {row['cumulative_ms']:>11.3f} ms  {row['calls']:>8} calls  {row['function']}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate profile traces by stage')
+    parser.add_argument('directory', nargs='?', default=profiling.PROFILE_DIR, help='Trace directory')
+    parser.add_argument('--since', type=float, help='Only traces from the last N seconds')
+    parser.add_argument('--slowest', type=int, default=10, help='Slowest traces to list')
+    parser.add_argument('--functions', type=int, default=15, help='cProfile functions to list')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    traces = profiling.load_traces(args.directory)
+    if args.since is not None:
+        cutoff = time.time() - args.since
+        traces = (trace for trace in traces if trace.get('time', 0) >= cutoff)
+    report = summarize(traces, args.slowest, args.functions)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Opt-in per-request profiling of the analysis pipeline.
+
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE, the
+production path, or when it asks for it (the ``X-Profile`` header or the
+``profile`` query parameter). Asking is off unless PROFILE_REQUESTS=1, since
+a profiled request bypasses the cache and its trace exposes internal
+function names and paths; with PROFILE_TOKEN set, the request must also
+carry that token in the ``X-Profile-Token`` header.
+A profiled request skips the result cache lookup so the analysis really
+runs. Its trace holds the per-stage timings of ``SpeechAnalyzer.analyze()``
+and, in 'cprofile' mode, the hottest functions from a cProfile run.
+
+Explicitly requested traces are returned inline under ``_profile``. Every
+trace is also written as a JSON file to PROFILE_DIR, which is rotated to
+the newest PROFILE_MAX_TRACES files. ``profile_report.py`` aggregates them.
+
+cProfile only sees the request thread. In concurrent mode the grammar check
+runs on the grammar pool and shows up as the 'grammar_check' stage only.
+Only one request is cProfiled at a time; others fall back to stage timings.
+"""
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+
+# Profiling configuration
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_MODE = os.environ.get('PROFILE_SAMPLE_MODE', 'stages')
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get(
+    'PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'profiles'))
+PROFILE_MAX_TRACES = int(os.environ.get('PROFILE_MAX_TRACES', 1000))
+PROFILE_TOP_FUNCTIONS = int(os.environ.get('PROFILE_TOP_FUNCTIONS', 25))
+
+PROFILE_HEADER = 'X-Profile'
+TOKEN_HEADER = 'X-Profile-Token'
+MODES = ('stages', 'cprofile')
+
+# cProfile hooks are process-wide on newer Pythons; profile one request at a time
+_cprofile_lock = threading.Lock()
+
+
+def parse_mode(value):
+    """Profiling mode asked for by a header or query value, or None"""
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    return value if value in MODES else 'stages'
+
+
+def may_request(token):
+    """True if a request presenting token may ask to be profiled"""
+    if not PROFILE_REQUESTS:
+        return False
+    return not PROFILE_TOKEN or hmac.compare_digest((token or '').encode(), PROFILE_TOKEN.encode())
+
+
+def sampled(rate=None):
+    """True for a random PROFILE_SAMPLE_RATE fraction of calls"""
+    rate = PROFILE_SAMPLE_RATE if rate is None else rate
+    return rate > 0 and random.random() < rate
+
+
+class Profiler:
+    """Context manager timing a block, optionally under cProfile"""
+
+    def __init__(self, mode='stages'):
+        self.mode = mode
+        self.started = None
+        self.elapsed = None
+        self._profile = None
+
+    def __enter__(self):
+        if self.mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        if self._profile is not None:
+            self._profile.disable()
+            _cprofile_lock.release()
+        return False
+
+    def top_functions(self, limit=PROFILE_TOP_FUNCTIONS):
+        """Functions with the most cumulative time, as plain dicts"""
+        if self._profile is None:
+            return None
+        stats = pstats.Stats(self._profile)
+        rows = []
+        for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f'{os.path.basename(filename)}:{line}({name})',
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3)
+            })
+        rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+        return rows[:limit]
+
+    def trace(self, stage_timings, **fields):
+        """JSON-ready trace of the profiled block"""
+        trace = {
+            'id': uuid.uuid4().hex,
+            'time': time.time(),
+            'mode': self.mode,
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+            'stages': dict(stage_timings)
+        }
+        trace.update(fields)
+        if self.mode == 'cprofile':
+            # None when another request held the profiler
+            trace['functions'] = self.top_functions()
+        return trace
+
+
+class TraceWriter:
+    """Writes traces as JSON files, keeping only the newest ``max_traces``"""
+
+    def __init__(self, directory=PROFILE_DIR, max_traces=PROFILE_MAX_TRACES):
+        self.directory = directory
+        self.max_traces = max_traces
+        self.written = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, trace):
+        name = f"{int(trace['time'] * 1000):015d}-{trace['id']}.json"
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        with self._lock:
+            self.written += 1
+            # Listing the directory on every write would cost more than the trace
+            if self.written % max(1, self.max_traces // 10) == 0:
+                self.rotate()
+        return path
+
+    def rotate(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        for name in names[:max(0, len(names) - self.max_traces)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def load_traces(directory=PROFILE_DIR):
+    """Yield the traces in a trace directory, oldest first"""
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            # Rotated away or still being written
+            continue
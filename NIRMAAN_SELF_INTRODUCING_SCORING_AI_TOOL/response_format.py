@@ -0,0 +1,177 @@
+"""Response shaping, JSON encoding and compression for analysis responses.
+
+Clients that only need scores can ask for less:
+
+* ``compact`` (true/false) reduces every criterion to its name, score and
+  max_score and leaves out the summary. The analysis then never builds the
+  feedback strings, the ``details`` dicts or the filler word list.
+* ``fields`` (a list or a comma-separated string) keeps only the named
+  top-level fields of the result, e.g. ``overall_score,criteria``. When
+  neither 'criteria' nor 'summary' is selected the analysis runs compact.
+
+Both are read from the JSON body, else from the query string. Responses are
+encoded with orjson when it is installed, in the same form as Flask's
+jsonify (sorted keys, compact separators, trailing newline), and JSON bodies
+of at least COMPRESS_MIN_BYTES are compressed with brotli (when installed)
+or gzip according to the client's Accept-Encoding.
+"""
+import gzip
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compression configuration
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', '1') == '1'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+
+# Top-level fields of an analysis result that ``fields`` may select
+RESULT_FIELDS = ('overall_score', 'word_count', 'sentence_count', 'duration_seconds', 'wpm',
+                 'criteria', 'summary', 'degraded', 'rubric_version', 'language', 'similar_to')
+# Kept whatever is selected: batch item positions, errors and session state
+ALWAYS_KEPT = ('index', 'error', 'session_id', 'provisional', '_profile')
+CRITERION_FIELDS = ('name', 'score', 'max_score')
+
+if orjson is not None:
+    # Dates and dataclasses go through Flask's default() so both encoders agree
+    ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE |
+                      orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+class Shape:
+    """The parts of an analysis result a client asked for"""
+
+    __slots__ = ('compact', 'fields')
+
+    def __init__(self, compact=False, fields=None):
+        self.compact = compact
+        self.fields = fields
+
+    @property
+    def full(self):
+        return not self.compact and self.fields is None
+
+    def wants(self, field):
+        if self.fields is None:
+            return not (self.compact and field == 'summary')
+        return field in self.fields
+
+    @property
+    def detailed(self):
+        """True if the analysis must build feedback, details and the summary"""
+        return self.wants('summary') or (self.wants('criteria') and not self.compact)
+
+    def apply(self, result):
+        """The selected view of a result; full results are returned as they are"""
+        if self.full or 'error' in result:
+            return result
+        result = {key: value for key, value in result.items() if self.wants(key) or key in ALWAYS_KEPT}
+        if self.compact and 'criteria' in result:
+            result['criteria'] = compact_criteria(result['criteria'])
+        return result
+
+
+FULL = Shape()
+
+
+def compact_criteria(criteria):
+    return [{key: criterion[key] for key in CRITERION_FIELDS} for criterion in criteria]
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def parse_shape(data, args=None):
+    """Shape from a request body dict, falling back to query args; raises ValueError"""
+    data = data if isinstance(data, dict) else {}
+    args = args or {}
+    compact = _flag(data['compact'] if 'compact' in data else args.get('compact', False))
+    fields = data['fields'] if 'fields' in data else args.get('fields')
+    if fields is None:
+        return Shape(compact) if compact else FULL
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise ValueError('fields must be a list or a comma-separated string of field names')
+    fields = frozenset(field.strip() for field in fields if field.strip())
+    unknown = sorted(fields.difference(RESULT_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return Shape(compact, fields)
+
+
+def dumps(obj):
+    """Encode like jsonify, with orjson when available; returns bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Values orjson refuses (big ints, non-str keys); the stdlib copes
+            pass
+    return (json.dumps(obj, default=DefaultJSONProvider.default, sort_keys=True,
+                       separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider whose jsonify responses are encoded by ``dumps``"""
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            # Indented output for debugging
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    """'br', 'gzip' or None for an Accept-Encoding header, preferring brotli on ties"""
+    if not RESPONSE_COMPRESSION:
+        return None
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0.0)
+    best, best_q = None, 0.0
+    for coding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
@@ -0,0 +1,239 @@
+"""Persistent history of analysis results.
+
+Every analysis is stored in a SQLite file with its criterion scores as
+columns, indexed by student, cohort, time and transcript hash. Student
+history and cohort summaries (means per criterion, score distributions) are
+then SQL queries over stored rows instead of re-running analyses.
+
+Recording never blocks a request: ``record()`` puts the result on a bounded
+queue and a background thread inserts queued rows in batches, one
+transaction per batch. Rows become visible to every worker process once
+their batch commits, normally within RESULTS_FLUSH_INTERVAL seconds. When the
+queue is full the result is dropped and counted rather than slowing the
+analyze path down.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from result_cache import normalize_transcript
+
+logger = logging.getLogger(__name__)
+
+# Results store configuration ('' disables it; docker_compose.txt keeps it in the data volume)
+RESULTS_DB_PATH = os.environ.get('RESULTS_DB_PATH', '')
+RESULTS_BATCH_SIZE = int(os.environ.get('RESULTS_BATCH_SIZE', 200))
+RESULTS_FLUSH_INTERVAL = float(os.environ.get('RESULTS_FLUSH_INTERVAL', 0.5))
+RESULTS_QUEUE_SIZE = int(os.environ.get('RESULTS_QUEUE_SIZE', 10000))
+
+CRITERION_COLUMNS = {
+    'Content & Structure': 'content_structure',
+    'Speech Rate': 'speech_rate',
+    'Language & Grammar': 'language_grammar',
+    'Vocabulary Richness': 'vocabulary_richness',
+    'Clarity': 'clarity',
+    'Engagement': 'engagement'
+}
+SCORE_COLUMNS = ('overall_score',) + tuple(CRITERION_COLUMNS.values())
+HISTORY_COLUMNS = ('created', 'student_id', 'cohort_id', 'transcript_hash', 'rubric_version',
+                   'word_count', 'wpm', 'duration_seconds', 'degraded') + SCORE_COLUMNS
+INSERT_SQL = (f'INSERT INTO results ({", ".join(HISTORY_COLUMNS)}, result) '
+              f'VALUES ({", ".join("?" * (len(HISTORY_COLUMNS) + 1))})')
+DISTRIBUTION_BUCKETS = ('0-9', '10-19', '20-29', '30-39', '40-49', '50-59', '60-69', '70-79', '80-89', '90-100')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS results ('
+    'id INTEGER PRIMARY KEY, created REAL NOT NULL, student_id TEXT, cohort_id TEXT, '
+    'transcript_hash TEXT NOT NULL, rubric_version TEXT, word_count INTEGER, wpm REAL, '
+    'duration_seconds REAL, degraded INTEGER NOT NULL, overall_score INTEGER NOT NULL, '
+    'content_structure INTEGER, speech_rate INTEGER, language_grammar INTEGER, '
+    'vocabulary_richness INTEGER, clarity INTEGER, engagement INTEGER, result TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS results_student ON results (student_id, created)',
+    'CREATE INDEX IF NOT EXISTS results_cohort ON results (cohort_id, created)',
+    'CREATE INDEX IF NOT EXISTS results_created ON results (created)',
+    'CREATE INDEX IF NOT EXISTS results_hash ON results (transcript_hash)'
+)
+
+
+def transcript_hash(transcript):
+    """Hash of the normalized transcript, matching how the result cache sees it"""
+    return hashlib.sha256(normalize_transcript(transcript).encode('utf-8')).hexdigest()
+
+
+def _row(created, result, transcript, student_id, cohort_id):
+    scores = {CRITERION_COLUMNS[criterion['name']]: criterion['score']
+              for criterion in result.get('criteria', []) if criterion['name'] in CRITERION_COLUMNS}
+    return (
+        created, student_id, cohort_id, transcript_hash(transcript), result.get('rubric_version'),
+        result.get('word_count'), result.get('wpm'), result.get('duration_seconds'),
+        int(bool(result.get('degraded'))), result['overall_score'],
+        *(scores.get(column) for column in SCORE_COLUMNS[1:]),
+        json.dumps(result)
+    )
+
+
+class ResultsStore:
+    """SQLite results table with a batching background writer"""
+
+    def __init__(self, path=RESULTS_DB_PATH, batch_size=RESULTS_BATCH_SIZE,
+                 flush_interval=RESULTS_FLUSH_INTERVAL, queue_size=RESULTS_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._queue = queue.Queue(queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        with self._connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        # Connections are per thread and must not survive a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def record(self, result, transcript, student_id=None, cohort_id=None):
+        """Queue one analysis result for storage; returns False if it was dropped"""
+        self._start_writer()
+        try:
+            self._queue.put_nowait((time.time(), result, transcript, student_id, cohort_id))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _start_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='results-writer', daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        try:
+            rows = [_row(*entry) for entry in batch]
+            conn = self._connect()
+            with conn:
+                conn.executemany(INSERT_SQL, rows)
+            self.written += len(rows)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error('Failed to store %d results: %s', len(batch), e)
+
+    def flush(self):
+        """Block until every queued result has been written"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def history(self, student_id, limit=50, before=None, details=False):
+        """A student's results, newest first"""
+        columns = HISTORY_COLUMNS + (('result',) if details else ())
+        sql = f'SELECT {", ".join(columns)} FROM results WHERE student_id = ?'
+        params = [student_id]
+        if before is not None:
+            sql += ' AND created < ?'
+            params.append(before)
+        sql += ' ORDER BY created DESC LIMIT ?'
+        params.append(limit)
+        rows = []
+        for row in self._connect().execute(sql, params):
+            row = dict(row)
+            row['degraded'] = bool(row['degraded'])
+            if details:
+                row['result'] = json.loads(row['result'])
+            rows.append(row)
+        return rows
+
+    def cohort_summary(self, cohort_id, since=None, until=None):
+        """Aggregate scores of a cohort's results in an optional time window"""
+        where = 'cohort_id = ?'
+        params = [cohort_id]
+        if since is not None:
+            where += ' AND created >= ?'
+            params.append(since)
+        if until is not None:
+            where += ' AND created < ?'
+            params.append(until)
+        conn = self._connect()
+
+        aggregates = ', '.join(f'AVG({column}) AS mean_{column}' for column in SCORE_COLUMNS)
+        totals = conn.execute(
+            f'SELECT COUNT(*) AS results, COUNT(DISTINCT student_id) AS students, '
+            f'MIN(overall_score) AS min_score, MAX(overall_score) AS max_score, '
+            f'MIN(created) AS first_result, MAX(created) AS last_result, {aggregates} '
+            f'FROM results WHERE {where}', params
+        ).fetchone()
+        summary = {
+            'cohort_id': cohort_id,
+            'results': totals['results'],
+            'students': totals['students'],
+            'min_score': totals['min_score'],
+            'max_score': totals['max_score'],
+            'first_result': totals['first_result'],
+            'last_result': totals['last_result'],
+            'mean': {column: round(totals[f'mean_{column}'], 2) if totals[f'mean_{column}'] is not None else None
+                     for column in SCORE_COLUMNS}
+        }
+
+        buckets = dict.fromkeys(DISTRIBUTION_BUCKETS, 0)
+        for row in conn.execute(
+            f'SELECT MIN(overall_score / 10, 9) AS bucket, COUNT(*) AS n FROM results '
+            f'WHERE {where} GROUP BY bucket', params
+        ):
+            buckets[DISTRIBUTION_BUCKETS[max(0, row['bucket'])]] = row['n']
+        summary['overall_distribution'] = buckets
+
+        criteria = {column: {} for column in CRITERION_COLUMNS.values()}
+        union = ' UNION ALL '.join(
+            f"SELECT '{column}' AS criterion, {column} AS score, COUNT(*) AS n FROM results "
+            f'WHERE {where} AND {column} IS NOT NULL GROUP BY {column}'
+            for column in CRITERION_COLUMNS.values()
+        )
+        for row in conn.execute(union, params * len(CRITERION_COLUMNS)):
+            criteria[row['criterion']][str(row['score'])] = row['n']
+        summary['criterion_distributions'] = criteria
+        return summary
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed
+        }
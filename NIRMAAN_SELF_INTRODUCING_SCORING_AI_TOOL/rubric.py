@@ -0,0 +1,305 @@
+"""Versioned scoring rubric, compiled once and hot-reloaded.
+
+The rubric phrases, keyword categories, flow rules, filler words and score
+bands live in ``rubric.json``. Loading compiles them into an immutable
+``Rubric``: tuples of phrases, ``Bands`` tables and a single ``PhraseMatcher``
+over every phrase. All requests share the current ``Rubric``; each analysis
+captures it once, so a reload never changes the rules mid-analysis.
+
+The ``languages`` section lists the supported locales. Each entry overrides
+parts of the base definition for that locale (filler words, keyword
+categories, salutations) and may name the LanguageTool language its grammar
+is checked in (``grammar_language``, the locale itself by default). Keyword
+phrases a locale adds to the base lists only count as whole words, so a
+short word like 'mum' does not fire inside 'minimum'; the base phrases keep
+matching as substrings, as they always have. Every
+locale compiles into its own ``Rubric``; ``get_rubric(language)`` picks one,
+with 'en' style codes falling back to the first locale of that language.
+
+``get_rubric()`` re-checks the file's modification time at most every
+RUBRIC_RELOAD_INTERVAL seconds and swaps in the recompiled rubric, so every
+gunicorn worker picks up an edited rubric without a restart. A file that
+fails to load is logged and the previous rubric stays in use.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from bands import Bands, above
+from phrase_matcher import PhraseMatcher
+
+logger = logging.getLogger(__name__)
+
+# Rubric configuration
+RUBRIC_PATH = os.environ.get('RUBRIC_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rubric.json'))
+RUBRIC_RELOAD_INTERVAL = float(os.environ.get('RUBRIC_RELOAD_INTERVAL', 5))
+
+BAND_NAMES = ('speech_rate', 'grammar', 'vocabulary', 'filler_rate', 'sentiment')
+
+SalutationTier = namedtuple('SalutationTier', ['label', 'score', 'phrases'])
+FlowRules = namedtuple('FlowRules', ['salutation_words', 'name_words', 'closing_words',
+                                     'name_within_sentences', 'scores'])
+Rubric = namedtuple('Rubric', [
+    'version',          # human-facing version from the file, returned in responses
+    'fingerprint',      # version, content digest and locale, used in cache keys
+    'language',         # locale this rubric scores, e.g. 'en-IN'
+    'grammar_language', # LanguageTool language code for the grammar check
+    'salutation_tiers',
+    'no_salutation',
+    'must_have',        # ((category, phrases), ...)
+    'must_have_points',
+    'good_to_have',
+    'good_to_have_points',
+    'keyword_max_score',
+    'whole_word_keywords',  # keyword phrases matched only on word boundaries
+    'flow',
+    'filler_words',
+    'bands',            # read-only mapping of band name -> Bands
+    'matcher'
+])
+
+
+class RubricError(ValueError):
+    """Raised when a rubric definition is malformed"""
+
+
+class UnsupportedLanguageError(ValueError):
+    """Raised when no locale of the rubric matches a requested language"""
+
+
+def _phrases(values, where):
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise RubricError(f'{where} must be a list of strings')
+    return tuple(value.lower() for value in values)
+
+
+def _categories(section, where):
+    return tuple((name, _phrases(phrases, f'{where}.{name}')) for name, phrases in section['categories'].items())
+
+
+def _bands(spec, name):
+    strict = set(spec.get('strict', ()))
+    edges = [above(edge) if edge in strict else edge for edge in spec['edges']]
+    try:
+        return Bands(edges, spec['scores'], spec.get('labels'))
+    except ValueError as e:
+        raise RubricError(f'bands.{name}: {e}') from e
+
+
+def _merge(base, override):
+    """Copy of base with override applied; nested dicts merge, anything else replaces"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _keyword_phrases(keywords):
+    return {phrase for section in ('must_have', 'good_to_have')
+            for _, phrases in _categories(keywords[section], f'keywords.{section}') for phrase in phrases}
+
+
+def compile_rubric(definition, digest='', language='en-US', grammar_language=None, base_keywords=None):
+    """Compile a parsed rubric definition into an immutable Rubric
+
+    Keyword phrases that are not in ``base_keywords`` (the base definition's
+    keywords section, for a locale) are matched as whole words only.
+    """
+    try:
+        salutation = definition['salutation']
+        keywords = definition['keywords']
+        flow = definition['flow']
+        tiers = tuple(
+            SalutationTier(tier['label'], int(tier['score']), _phrases(tier['phrases'], f'salutation.{tier["label"]}'))
+            for tier in salutation['tiers']
+        )
+        must_have = _categories(keywords['must_have'], 'keywords.must_have')
+        good_to_have = _categories(keywords['good_to_have'], 'keywords.good_to_have')
+        substring_keywords = _keyword_phrases(base_keywords) if base_keywords is not None else None
+        flow_rules = FlowRules(
+            _phrases(flow['salutation_words'], 'flow.salutation_words'),
+            _phrases(flow['name_words'], 'flow.name_words'),
+            _phrases(flow['closing_words'], 'flow.closing_words'),
+            int(flow['name_within_sentences']),
+            MappingProxyType({outcome: (int(score), feedback) for outcome, (score, feedback) in flow['scores'].items()})
+        )
+        filler_words = _phrases(definition['filler_words'], 'filler_words')
+        bands = MappingProxyType({name: _bands(definition['bands'][name], name) for name in BAND_NAMES})
+        version = str(definition['version'])
+        no_salutation = (salutation['none']['label'], int(salutation['none']['score']))
+    except (KeyError, TypeError, ValueError) as e:
+        if isinstance(e, RubricError):
+            raise
+        raise RubricError(f'Invalid rubric: {e!r}') from e
+    for outcome in ('complete', 'no_closing', 'unordered'):
+        if outcome not in flow_rules.scores:
+            raise RubricError(f'flow.scores.{outcome} is required')
+
+    matcher = PhraseMatcher(
+        [phrase for tier in tiers for phrase in tier.phrases] +
+        [phrase for _, phrases in must_have + good_to_have for phrase in phrases] +
+        list(flow_rules.salutation_words + flow_rules.name_words + flow_rules.closing_words + filler_words)
+    )
+    whole_word_keywords = frozenset(
+        phrase for _, phrases in must_have + good_to_have for phrase in phrases
+        if substring_keywords is not None and phrase not in substring_keywords
+    )
+    fingerprint = f'{version}:{digest[:12]}' if digest else version
+    return Rubric(
+        version=version,
+        fingerprint=f'{fingerprint}:{language}',
+        language=language,
+        grammar_language=grammar_language or language,
+        salutation_tiers=tiers,
+        no_salutation=no_salutation,
+        must_have=must_have,
+        must_have_points=int(keywords['must_have']['points']),
+        good_to_have=good_to_have,
+        good_to_have_points=int(keywords['good_to_have']['points']),
+        keyword_max_score=int(keywords['max_score']),
+        whole_word_keywords=whole_word_keywords,
+        flow=flow_rules,
+        filler_words=filler_words,
+        bands=bands,
+        matcher=matcher
+    )
+
+
+class RubricSet:
+    """The compiled rubric of every locale, with language code resolution"""
+
+    def __init__(self, rubrics, default_language):
+        self.rubrics = MappingProxyType(rubrics)
+        self.default_language = default_language
+        self.default = rubrics[default_language]
+        self.fingerprint = self.default.fingerprint
+        self._aliases = {}
+        for language in rubrics:
+            self._aliases.setdefault(language.lower(), language)
+            self._aliases.setdefault(language.split('-')[0].lower(), language)
+
+    @property
+    def languages(self):
+        return tuple(self.rubrics)
+
+    def get(self, language=None):
+        """Rubric of a locale; raises UnsupportedLanguageError for unknown ones"""
+        if not language:
+            return self.default
+        if not isinstance(language, str):
+            raise UnsupportedLanguageError('language must be a string')
+        rubric = self.rubrics.get(language)
+        if rubric is not None:
+            return rubric
+        code = language.replace('_', '-').lower()
+        resolved = self._aliases.get(code) or self._aliases.get(code.split('-')[0])
+        if resolved is None:
+            raise UnsupportedLanguageError(
+                f"Unsupported language '{language}'; supported: {', '.join(self.rubrics)}")
+        return self.rubrics[resolved]
+
+
+def compile_rubrics(definition, digest=''):
+    """Compile the base definition once per locale into a RubricSet"""
+    try:
+        locales = definition.get('languages') or {'en-US': {}}
+        default_language = definition.get('default_language') or next(iter(locales))
+        if default_language not in locales:
+            raise RubricError(f'default_language {default_language} is not in languages')
+        base = {key: value for key, value in definition.items() if key not in ('languages', 'default_language')}
+        rubrics = {}
+        for language, override in locales.items():
+            override = dict(override)
+            grammar_language = override.pop('grammar_language', None)
+            rubrics[language] = compile_rubric(_merge(base, override), digest, language, grammar_language,
+                                               base.get('keywords'))
+    except (AttributeError, TypeError) as e:
+        raise RubricError(f'Invalid rubric languages: {e!r}') from e
+    return RubricSet(rubrics, default_language)
+
+
+def load_rubric(path=RUBRIC_PATH):
+    """Read and compile a rubric file into a RubricSet"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        definition = json.loads(raw)
+    except ValueError as e:
+        raise RubricError(f'{path} is not valid JSON: {e}') from e
+    return compile_rubrics(definition, hashlib.sha256(raw).hexdigest())
+
+
+class RubricStore:
+    """Holds the current compiled rubric and reloads it when the file changes"""
+
+    def __init__(self, path=RUBRIC_PATH, reload_interval=RUBRIC_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._rubric = load_rubric(path)
+        self._next_check = time.monotonic() + reload_interval
+        self.reloads = 0
+
+    def get(self, language=None):
+        if self.reload_interval and time.monotonic() >= self._next_check:
+            self.reload()
+        return self._rubric.get(language)
+
+    @property
+    def languages(self):
+        return self._rubric.languages
+
+    @property
+    def default_language(self):
+        return self._rubric.default_language
+
+    def reload(self, force=False):
+        """Recompile the rubric if its file changed (or always with force); returns the default locale's"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.reload_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if not force and mtime == self._mtime:
+                    return self._rubric
+                # Remember the attempt so a broken file is reported once, not every interval
+                self._mtime = mtime
+                rubric = load_rubric(self.path)
+            except (OSError, RubricError) as e:
+                logger.error('Keeping rubric %s; reload failed: %s', self._rubric.fingerprint, e)
+                return self._rubric.default
+            if rubric.fingerprint != self._rubric.fingerprint:
+                logger.info('Loaded rubric %s from %s', rubric.fingerprint, self.path)
+                self.reloads += 1
+            self._rubric = rubric
+        return self._rubric.default
+
+
+store = None
+store_lock = threading.Lock()
+
+
+def get_rubric_store():
+    global store
+    if store is None:
+        with store_lock:
+            if store is None:
+                store = RubricStore()
+    return store
+
+
+def get_rubric(language=None):
+    """The current rubric of a locale (the default one if None), shared by every request in the process"""
+    return get_rubric_store().get(language)
+
+
+def reload_rubric(force=False):
+    return get_rubric_store().reload(force=force)
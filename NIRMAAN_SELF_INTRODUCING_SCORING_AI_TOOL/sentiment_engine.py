@@ -0,0 +1,191 @@
+"""Sentiment polarity engines for the Engagement criterion.
+
+``TextBlobSentiment`` is TextBlob's default analyzer: the pattern
+``Sentiment`` lexicon applied to the whole transcript, re-tokenized by
+pattern's tokenizer on every call.
+
+``LexiconSentiment`` gives the same polarity without the per-call overhead.
+The lexicon is flattened once into a single dict of
+``word -> (polarity, intensity, is_adverb)``. Pattern's tokenizer is applied
+per whitespace token and memoized, so a transcript costs one dict lookup
+per token. The assessment pass is the same state machine as pattern's
+``Sentiment.assessments``: modifiers ("very good"), negations ("not
+good"), exclamation boosts, the "(!)" irony marker and emoticons. It runs
+over plain lists instead of per-word dicts. The only divergences are
+constructs that pattern's tokenizer joins across whitespace (a spaced-out
+"( ! )" or ": )"), so results match TextBlob to float precision on ordinary
+transcripts.
+
+``LexiconSentiment.piece_assessments`` assesses a piece of a text on its
+own (near-duplicate transcripts reuse the pieces they share). Pieces cut at
+whitespace give the whole text's assessments when concatenated, unless the
+state machine carries something across a cut; see ``compose``.
+
+Select the engine with SENTIMENT_BACKEND ('lexicon' or 'textblob').
+"""
+import os
+
+from text_pipeline import TOKEN
+
+SENTIMENT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'lexicon')
+
+# Bound on memoized token splits; cleared when full (vocabularies are small)
+TOKEN_CACHE_SIZE = 100000
+
+
+class TextBlobSentiment:
+    """TextBlob's PatternAnalyzer polarity, as reference and fallback"""
+
+    name = 'textblob'
+
+    def __init__(self):
+        # textblob (and NLTK behind it) are only imported when first needed
+        from textblob.en import sentiment
+        sentiment.load()
+        self.sentiment = sentiment
+
+    def assessments(self, text, tokens=None):
+        """Polarity of every assessed word or phrase, in order"""
+        words = ' '.join(self.sentiment.tokenizer(text)).lower().split()
+        return [polarity for _, polarity, _, _ in self.sentiment.assessments((word, None) for word in words)]
+
+    def polarity(self, text, tokens=None):
+        polarity, _ = self.sentiment(text)
+        return polarity
+
+
+class LexiconSentiment:
+    """Pattern's sentiment scoring over a precomputed lexicon table"""
+
+    name = 'lexicon'
+
+    def __init__(self):
+        from textblob import _text
+        from textblob.en import sentiment
+        sentiment.load()
+        self._find_tokens = _text.find_tokens
+        modifiers = sentiment.modifiers
+        # word -> (polarity, intensity, may modify the next word); pos-independent scores
+        self.table = {
+            word: (float(scores[None][0]), float(scores[None][2]), any(tag in scores for tag in modifiers))
+            for word, scores in dict.items(sentiment)
+        }
+        self.negations = frozenset(sentiment.negations)
+        self.is_modifier = sentiment.modifier
+        self.punctuation = _text.PUNCTUATION
+        self.emoticons = {}
+        for (_, polarity), emoticons in _text.EMOTICONS.items():
+            for emoticon in emoticons:
+                # Pattern checks the moods in order; the first match wins
+                self.emoticons.setdefault(emoticon.lower(), polarity)
+        self._split = {}
+
+    def words(self, tokens):
+        """Lowercased sentiment words of whitespace tokens, split like pattern's tokenizer"""
+        split = self._split
+        for token in tokens:
+            parts = split.get(token)
+            if parts is None:
+                if len(split) >= TOKEN_CACHE_SIZE:
+                    split.clear()
+                parts = split[token] = tuple(' '.join(self._find_tokens(token)).lower().split())
+            yield from parts
+
+    def assessments(self, text, tokens=None):
+        """Polarity of every assessed word or phrase, in order (see ``Sentiment.assessments``)"""
+        return self._assess(self.words(TOKEN.findall(text) if tokens is None else tokens))[0]
+
+    def piece_assessments(self, text):
+        """(assessments, open_end, leading_bang) of a piece of a text assessed on its own.
+
+        ``open_end``: the piece ends with a modifier or negation pending, which
+        would apply to the next piece. ``leading_bang``: it has a "!" before its
+        first assessment, which would boost the previous piece's last one.
+        """
+        return self._assess(self.words(TOKEN.findall(text)))
+
+    def _assess(self, words):
+        table, negations, emoticons, punctuation = self.table, self.negations, self.emoticons, self.punctuation
+        polarities, intensities, negated = [], [], []
+        modifier = None   # preceding adverb ("really good")
+        negation = None   # preceding negation ("not good")
+        leading_bang = False
+        for word in words:
+            entry = table.get(word)
+            if entry is not None:
+                polarity, intensity, is_adverb = entry
+                if modifier is None:
+                    polarities.append(polarity)
+                    intensities.append(intensity)
+                    negated.append(False)
+                else:
+                    polarities[-1] = max(-1.0, min(polarity * intensities[-1], 1.0))
+                    intensities[-1] = intensity
+                if negation is not None:
+                    intensities[-1] = 1.0 / intensities[-1]
+                    negated[-1] = True
+                modifier = word if is_adverb else None
+                negation = word if word in negations else None
+                continue
+            if word in negations:
+                negation = word
+            elif negation and len(word.strip("'")) > 1:
+                negation = None
+            if negation is not None and modifier is not None and self.is_modifier(modifier):
+                # "really not good"
+                negated[-1] = True
+                negation = None
+            elif modifier and len(word) > 2:
+                modifier = None
+            if word == '!':
+                if polarities:
+                    polarities[-1] = max(-1.0, min(polarities[-1] * 1.25, 1.0))
+                else:
+                    leading_bang = True
+            if word == '(!)':
+                polarities.append(0.0)
+                intensities.append(1.0)
+                negated.append(False)
+            if word.isalpha() is False and len(word) <= 5 and word not in punctuation:
+                polarity = emoticons.get(word)
+                if polarity is not None:
+                    polarities.append(polarity)
+                    intensities.append(1.0)
+                    negated.append(False)
+        assessments = [polarity * -0.5 if is_negated else polarity
+                       for polarity, is_negated in zip(polarities, negated)]
+        return assessments, modifier is not None or negation is not None, leading_bang
+
+    def polarity(self, text, tokens=None):
+        return mean_polarity(self.assessments(text, tokens))
+
+
+def mean_polarity(assessments):
+    total = 0
+    for polarity in assessments:
+        total += polarity
+    return total / float(len(assessments) or 1)
+
+
+def compose(pieces):
+    """Concatenated assessments of consecutive ``piece_assessments`` results, or None.
+
+    None when a piece's state would have carried into the next one, so the
+    text has to be assessed as a whole.
+    """
+    assessments = []
+    open_end = False
+    for piece, piece_open_end, leading_bang in pieces:
+        if open_end or (leading_bang and assessments):
+            return None
+        assessments.extend(piece)
+        open_end = piece_open_end
+    return assessments
+
+
+def create_engine(backend=SENTIMENT_BACKEND):
+    if backend == 'textblob':
+        return TextBlobSentiment()
+    if backend == 'lexicon':
+        return LexiconSentiment()
+    raise ValueError(f'Unknown SENTIMENT_BACKEND {backend!r}')
@@ -0,0 +1,267 @@
+"""Incremental scoring state for live transcription sessions.
+
+A client streaming a transcript sends text deltas; each one is appended to a
+``StreamState`` that keeps running totals instead of re-tokenizing the whole
+transcript:
+
+* words: the token count and the set of cleaned tokens (a trailing token that
+  may continue in the next delta is held back until whitespace ends it)
+* sentences: text up to the last ``.!?`` is complete; each completed sentence
+  is phrase-scanned once and folded into per-phrase sentence indices and
+  counts, its sentiment assessments are added to a running sum, and it is
+  queued for a grammar check
+* the open sentence after the last delimiter is only looked at when a
+  snapshot is taken, as if the stream ended there
+
+So appending a delta and taking a snapshot cost time proportional to the
+delta and the open sentence, not to the transcript so far. Snapshots are
+provisional: sentiment is assessed per delta rather than over the whole text,
+and grammar only covers completed sentences. The final score of a session is
+a regular full analysis of the concatenated text.
+
+Sessions live in the memory of the worker process that created them. Only
+``POST /api/sessions/stream``, which carries a whole session in one chunked
+request, works with several worker processes; it is the endpoint to use
+with the shipped gunicorn setup. The per-delta endpoints
+(``/api/sessions/<id>/delta`` and friends) are for single-process
+deployments: gunicorn.conf.py sets SESSION_PROCESSES to its worker count,
+and with more than one, opening such a session is refused rather than
+having its deltas land on workers that never saw it.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+
+from phrase_matcher import SENTENCE_DELIMITERS
+from text_pipeline import NON_WORD, TOKEN
+
+# Session configuration
+SESSION_TTL = float(os.environ.get('SESSION_TTL', 600))
+SESSION_LIMIT = int(os.environ.get('SESSION_LIMIT', 1000))
+SESSION_PROCESSES = max(1, int(os.environ.get('SESSION_PROCESSES', 1)))
+
+Snapshot = namedtuple('Snapshot', ['word_count', 'distinct_words', 'hits', 'sentences', 'polarity'])
+
+
+class SessionLimitError(Exception):
+    """Raised when the process already holds SESSION_LIMIT open sessions"""
+
+
+class StreamHits:
+    """``PhraseHits`` interface over completed sentences plus the open sentence"""
+
+    def __init__(self, state, tail_hits, tail_index):
+        self.state = state
+        self.tail_hits = tail_hits
+        self.tail_index = tail_index
+
+    def _tail_contains(self, phrase, sentence, whole_word):
+        if self.tail_hits is None:
+            return False
+        if sentence is None:
+            return self.tail_hits.contains(phrase, whole_word=whole_word)
+        return sentence == self.tail_index and self.tail_hits.contains(phrase, 0, whole_word)
+
+    def contains(self, phrase, sentence=None, whole_word=False):
+        sentences = self.state.word_sentences if whole_word else self.state.phrase_sentences
+        indices = sentences.get(phrase)
+        if indices and (sentence is None or sentence in indices):
+            return True
+        return self._tail_contains(phrase, sentence, whole_word)
+
+    def contains_any(self, phrases, sentence=None, whole_words=frozenset()):
+        return any(self.contains(phrase, sentence, phrase in whole_words) for phrase in phrases)
+
+    def first_sentence_with(self, phrases):
+        indices = [self.state.first_sentence[phrase] for phrase in phrases if phrase in self.state.first_sentence]
+        if indices:
+            return min(indices)
+        if self.tail_hits is not None and self.tail_hits.contains_any(phrases):
+            return self.tail_index
+        return -1
+
+    def count(self, phrase, whole_word=False):
+        count = self.state.phrase_counts[phrase, whole_word]
+        if self.tail_hits is not None:
+            count += self.tail_hits.count(phrase, whole_word)
+        return count
+
+
+class StreamSentences:
+    """Read-only sequence of the completed sentences followed by the open one"""
+
+    def __init__(self, completed, tail):
+        self.completed = completed
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.completed) + (1 if self.tail else 0)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index == len(self.completed) and self.tail:
+            return self.tail
+        return self.completed[index]
+
+
+class StreamState:
+    """Running analysis state of one streamed transcript"""
+
+    def __init__(self, rubric, sentiment):
+        self.rubric = rubric
+        self.sentiment = sentiment
+        self.chunks = []
+        self.word_count = 0
+        self.distinct = set()
+        self.sentences = []
+        self.phrase_sentences = {}      # phrase -> set of completed sentence indices
+        self.word_sentences = {}        # phrase -> those where it occurs as whole words
+        self.first_sentence = {}        # phrase -> first completed sentence index
+        self.phrase_counts = Counter()  # (phrase, whole_word) -> occurrences
+        self.polarity_sum = 0.0
+        self.assessments = 0
+        self.grammar_errors = 0
+        self._token_tail = ''
+        self._sentence_tail = ''
+
+    @property
+    def text(self):
+        return ''.join(self.chunks)
+
+    def append(self, delta):
+        """Fold a text delta into the running state; returns the sentences it completed"""
+        if not delta:
+            return []
+        self.chunks.append(delta)
+
+        buffer = self._token_tail + delta
+        tokens = TOKEN.findall(buffer)
+        self._token_tail = ''
+        if tokens and not buffer[-1].isspace():
+            # The last token may continue in the next delta
+            self._token_tail = tokens.pop()
+        self.word_count += len(tokens)
+        self.distinct.update(NON_WORD.sub('', token.lower()) for token in tokens)
+
+        buffer = self._sentence_tail + delta
+        cut = max(buffer.rfind('.'), buffer.rfind('!'), buffer.rfind('?')) + 1
+        self._sentence_tail = buffer[cut:]
+        if not cut:
+            return []
+        closed = buffer[:cut]
+        completed = []
+        for match in SENTENCE_DELIMITERS.finditer(closed):
+            sentence = match.group().strip()
+            if sentence:
+                self._add_sentence(sentence)
+                completed.append(sentence)
+        self._add_sentiment(closed)
+        return completed
+
+    def _add_sentence(self, sentence):
+        index = len(self.sentences)
+        self.sentences.append(sentence)
+        hits = self.rubric.matcher.scan(sentence.lower())
+        for phrase in hits.occurrences:
+            self.phrase_sentences.setdefault(phrase, set()).add(index)
+            self.first_sentence.setdefault(phrase, index)
+            self.phrase_counts[phrase, False] += hits.count(phrase)
+            words = hits.count(phrase, whole_word=True)
+            if words:
+                self.phrase_counts[phrase, True] += words
+                self.word_sentences.setdefault(phrase, set()).add(index)
+
+    def _add_sentiment(self, text):
+        for polarity in self.sentiment.assessments(text):
+            self.polarity_sum += polarity
+            self.assessments += 1
+
+    def snapshot(self):
+        """Totals as if the stream ended now, including the open sentence"""
+        word_count = self.word_count
+        distinct_words = len(self.distinct)
+        token = self._token_tail.lower()
+        if token:
+            word_count += 1
+            distinct_words += NON_WORD.sub('', token) not in self.distinct
+
+        tail = self._sentence_tail.strip()
+        tail_hits = self.rubric.matcher.scan(tail.lower()) if tail else None
+        polarity_sum, assessments = self.polarity_sum, self.assessments
+        if tail:
+            for polarity in self.sentiment.assessments(self._sentence_tail):
+                polarity_sum += polarity
+                assessments += 1
+        return Snapshot(
+            word_count=word_count,
+            distinct_words=distinct_words,
+            hits=StreamHits(self, tail_hits, len(self.sentences)),
+            sentences=StreamSentences(self.sentences, tail),
+            polarity=polarity_sum / float(assessments or 1)
+        )
+
+
+class Session:
+    """One streaming session; ``lock`` serializes its deltas"""
+
+    def __init__(self, session_id, state, duration_seconds=None, student_id=None, cohort_id=None):
+        self.session_id = session_id
+        self.state = state
+        self.duration_seconds = duration_seconds
+        self.student_id = student_id
+        self.cohort_id = cohort_id
+        self.started = time.monotonic()
+        self.last_seen = self.started
+        self.degraded = False
+        self.lock = threading.Lock()
+
+    def elapsed(self):
+        """Audio duration so far: as reported by the client, else wall-clock time"""
+        if self.duration_seconds is not None:
+            return self.duration_seconds
+        return round(time.monotonic() - self.started, 3)
+
+
+class SessionStore:
+    """In-process sessions; idle sessions expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=SESSION_LIMIT):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, state, duration_seconds=None, student_id=None, cohort_id=None):
+        with self._lock:
+            self._purge()
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitError(f'Too many open sessions ({self.max_sessions})')
+            session = Session(uuid.uuid4().hex, state, duration_seconds, student_id, cohort_id)
+            self._sessions[session.session_id] = session
+            return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if session.last_seen < time.monotonic() - self.ttl:
+                    del self._sessions[session_id]
+                    return None
+                session.last_seen = time.monotonic()
+            return session
+
+    def pop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _purge(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [session_id for session_id, session in self._sessions.items() if session.last_seen < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
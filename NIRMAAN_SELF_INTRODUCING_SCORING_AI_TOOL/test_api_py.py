@@ -1,6 +1,8 @@
 import requests
 import json
+import os
 import sys
+import time
 
 def test_health_endpoint():
     """Test the health check endpoint"""
@@ -169,6 +171,381 @@ def test_edge_cases():
     else:
         print("❌ Failed to process long transcript")
 
+def test_batch_endpoint():
+    """Test the batch analyze endpoint"""
+    print("\n" + "=" * 60)
+    print("Testing Batch Analyze Endpoint")
+    print("=" * 60)
+    
+    items = [
+        {"transcript": "Hello everyone, myself Asha. I am 12 years old. Thank you.", "duration_seconds": 10},
+        {"transcript": "", "duration_seconds": 10},
+        {"transcript": "Good morning. My name is Ravi and I love cricket. Thanks.", "duration_seconds": 12}
+    ]
+    
+    try:
+        response = requests.post(
+            'http://localhost:5000/api/analyze/batch',
+            json={"items": items},
+            timeout=60
+        )
+        
+        print(f"Status Code: {response.status_code}")
+        
+        if response.status_code != 200:
+            print(f"❌ Batch analysis failed: {response.text}")
+            return False
+        
+        result = response.json()
+        indices = [item['index'] for item in result['results']]
+        print(f"Count: {result['count']}, Failed: {result['failed']}")
+        
+        if indices == [0, 1, 2] and result['failed'] == 1 and 'error' in result['results'][1]:
+            print("✅ Batch results returned in order with per-item errors")
+            return True
+        else:
+            print("❌ Unexpected batch results")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_jobs_endpoint():
+    """Test asynchronous job submission and polling"""
+    print("\n" + "=" * 60)
+    print("Testing Jobs Endpoint")
+    print("=" * 60)
+    
+    data = {
+        "transcript": "Hello everyone, myself Asha. I am 12 years old and I love painting. Thank you.",
+        "duration_seconds": 15
+    }
+    
+    try:
+        response = requests.post('http://localhost:5000/api/jobs', json=data, timeout=10)
+        print(f"Submit Status Code: {response.status_code}")
+        
+        if response.status_code != 202:
+            print(f"❌ Job submission failed: {response.text}")
+            return False
+        
+        job_id = response.json()['job_id']
+        for _ in range(60):
+            job = requests.get(f'http://localhost:5000/api/jobs/{job_id}', timeout=5).json()
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.5)
+        
+        print(f"Job Status: {job['status']}")
+        
+        if job['status'] == 'done' and 'overall_score' in job['result']:
+            print(f"✅ Job completed (score: {job['result']['overall_score']})")
+            return True
+        else:
+            print(f"❌ Job did not complete: {job.get('error')}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_metrics_endpoint():
+    """Test the Prometheus metrics endpoint"""
+    print("\n" + "=" * 60)
+    print("Testing Metrics Endpoint")
+    print("=" * 60)
+    
+    try:
+        response = requests.get('http://localhost:5000/api/metrics', timeout=5)
+        print(f"Status Code: {response.status_code}")
+        
+        expected = ['nirmaan_request_duration_seconds_bucket', 'nirmaan_stage_duration_seconds_count']
+        missing = [name for name in expected if name not in response.text]
+        
+        if response.status_code == 200 and not missing:
+            print("✅ Metrics exposed")
+            return True
+        else:
+            print(f"❌ Metrics missing: {missing}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_sessions_endpoint():
+    """Test streaming a transcript through a live session (one chunked NDJSON request)"""
+    print("\n" + "=" * 60)
+    print("Testing Streaming Sessions")
+    print("=" * 60)
+    
+    deltas = ["Hello everyone, myself Asha. I am 13 ", "years old and I study in class 8. ",
+              "I enjoy playing cricket. Thank you."]
+    
+    def body():
+        for index, text in enumerate(deltas, 1):
+            yield (json.dumps({'text': text, 'duration_seconds': 5 * index}) + '\n').encode()
+    
+    try:
+        response = requests.post('http://localhost:5000/api/sessions/stream', data=body(),
+                                 headers={'Content-Type': 'application/x-ndjson'}, stream=True, timeout=30)
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        for index, provisional in enumerate(lines[:-1], 1):
+            print(f"Delta {index}: {provisional.get('word_count')} words, "
+                  f"provisional score {provisional.get('overall_score')}")
+        final = lines[-1] if lines else {}
+        
+        if (response.status_code == 200 and len(lines) == len(deltas) + 1
+                and final.get('provisional') is False and final['word_count'] == lines[-2]['word_count']):
+            print(f"✅ Session finished with score {final['overall_score']}/100")
+            return True
+        else:
+            print(f"❌ Unexpected final result: {final}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_results_history():
+    """Test stored results: student history and cohort summary (server started with RESULTS_DB_PATH set)"""
+    print("\n" + "=" * 60)
+    print("Testing Results History")
+    print("=" * 60)
+    
+    student_id = f"test-student-{int(time.time())}"
+    
+    try:
+        for duration in (40, 52):
+            requests.post('http://localhost:5000/api/analyze',
+                          json={'transcript': "Hello everyone, myself Asha. I enjoy cricket. Thank you.",
+                                'duration_seconds': duration, 'student_id': student_id,
+                                'cohort_id': 'test-cohort'},
+                          timeout=30)
+        
+        # Results are written in the background in small batches
+        time.sleep(2)
+        history = requests.get(f'http://localhost:5000/api/students/{student_id}/results', timeout=5).json()
+        summary = requests.get('http://localhost:5000/api/cohorts/test-cohort/summary', timeout=5).json()
+        print(f"History entries: {history.get('count')}")
+        print(f"Cohort results: {summary.get('results')}, mean score: {summary.get('mean', {}).get('overall_score')}")
+        
+        if history.get('count') == 2 and summary.get('results', 0) >= 2:
+            print("✅ Results stored and aggregated")
+            return True
+        else:
+            print(f"❌ Unexpected history: {history}")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_request_limits():
+    """Test that oversized transcripts are rejected with 413"""
+    print("\n" + "=" * 60)
+    print("Testing Request Limits")
+    print("=" * 60)
+    
+    try:
+        response = requests.post('http://localhost:5000/api/analyze',
+                                 json={'transcript': 'word ' * 20001}, timeout=30)
+        print(f"Status Code: {response.status_code}")
+        print(f"Response: {response.json()}")
+        
+        if response.status_code == 413 and 'max_words' in response.json():
+            print("✅ Oversized transcript rejected")
+            return True
+        else:
+            print("❌ Expected a 413 response")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_profiling():
+    """Test the opt-in per-request profile (server started with PROFILE_REQUESTS=1 and PROFILE_TOKEN)"""
+    print("\n" + "=" * 60)
+    print("Testing Request Profiling")
+    print("=" * 60)
+    
+    payload = {'transcript': "Hello everyone, myself Asha. I enjoy cricket. Thank you."}
+    token = os.environ.get('PROFILE_TOKEN', '')
+    try:
+        anonymous = requests.post('http://localhost:5000/api/analyze', json=payload,
+                                  headers={'X-Profile': 'cprofile'}, timeout=30)
+        print(f"Without token: {anonymous.status_code} profiled={'_profile' in anonymous.json()}")
+        if '_profile' in anonymous.json():
+            print("❌ Profile returned without the token")
+            return False
+        if not token:
+            print("✅ Profiling refused without a token (set PROFILE_TOKEN to test the profile itself)")
+            return True
+        
+        response = requests.post('http://localhost:5000/api/analyze', json=payload,
+                                 headers={'X-Profile': '1', 'X-Profile-Token': token}, timeout=30)
+        profile = response.json().get('_profile', {})
+        print(f"Status Code: {response.status_code}")
+        print(f"Stages: {profile.get('stages')}")
+        
+        if response.status_code == 200 and profile.get('stages'):
+            print("✅ Stage timings returned")
+            return True
+        else:
+            print("❌ Missing _profile")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_admission_control():
+    """Test that a client sending faster than its rate limit gets 429 with Retry-After"""
+    print("\n" + "=" * 60)
+    print("Testing Admission Control")
+    print("=" * 60)
+    
+    try:
+        for attempt in range(100):
+            response = requests.post('http://localhost:5000/api/analyze',
+                                     json={'transcript': "Hello everyone, myself Asha. Thank you."},
+                                     headers={'X-Client-Id': 'test-flood'}, timeout=30)
+            if response.status_code == 429:
+                break
+        print(f"Requests sent: {attempt + 1}")
+        print(f"Status Code: {response.status_code}")
+        print(f"Retry-After: {response.headers.get('Retry-After')}")
+        
+        if response.status_code == 429 and response.headers.get('Retry-After'):
+            print("✅ Flooding client rate limited")
+            return True
+        else:
+            print("❌ Expected a 429 response")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_compact_response():
+    """Test compact mode, field selection and gzip negotiation"""
+    print("\n" + "=" * 60)
+    print("Testing Compact Responses")
+    print("=" * 60)
+    
+    headers = {'X-Client-Id': 'test-compact'}
+    payload = {'transcript': "Hello everyone, myself Asha. I am 13 years old. Thank you.", 'duration_seconds': 20}
+    
+    try:
+        full = requests.post('http://localhost:5000/api/analyze', json=payload, headers=headers, timeout=30).json()
+        compact = requests.post('http://localhost:5000/api/analyze', json=dict(payload, compact=True),
+                                headers=headers, timeout=30).json()
+        selected = requests.post('http://localhost:5000/api/analyze?fields=overall_score',
+                                 json=payload, headers=headers, timeout=30).json()
+        compressed = requests.post('http://localhost:5000/api/analyze', json=payload,
+                                   headers=dict(headers, **{'Accept-Encoding': 'gzip'}), timeout=30)
+        
+        print(f"Compact: {compact}")
+        print(f"Selected: {selected}")
+        print(f"Content-Encoding: {compressed.headers.get('Content-Encoding')}")
+        
+        compact_ok = (compact['overall_score'] == full['overall_score'] and 'summary' not in compact and
+                      all(set(criterion) == {'name', 'score', 'max_score'} for criterion in compact['criteria']))
+        # A repeated transcript is flagged as similar to its first submission
+        same_result = dict(compressed.json(), similar_to=None) == dict(full, similar_to=None)
+        if compact_ok and selected == {'overall_score': full['overall_score']} and same_result:
+            print("✅ Compact and selected responses match the full scores")
+            return True
+        else:
+            print("❌ Compact or selected response is wrong")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_languages():
+    """Test per-locale scoring and rejection of unsupported languages"""
+    print("\n" + "=" * 60)
+    print("Testing Languages")
+    print("=" * 60)
+    
+    headers = {'X-Client-Id': 'test-languages'}
+    transcript = "Namaste everyone, myself Asha. I study in 8th standard. My mummy and papa are teachers. Thank you."
+    
+    try:
+        scores = {}
+        for language in ('en-US', 'en-IN'):
+            response = requests.post('http://localhost:5000/api/analyze',
+                                     json={'transcript': transcript, 'language': language},
+                                     headers=headers, timeout=30)
+            result = response.json()
+            scores[language] = result['overall_score']
+            print(f"{language}: {response.status_code} language={result.get('language')} score={result['overall_score']}")
+        
+        unsupported = requests.post('http://localhost:5000/api/analyze',
+                                    json={'transcript': transcript, 'language': 'xx-XX'},
+                                    headers=headers, timeout=30)
+        print(f"Unsupported: {unsupported.status_code} {unsupported.json()}")
+        
+        # 'form' and 'mum' are en-GB keywords, but not inside 'platform' or 'minimum'
+        lookalikes = requests.post('http://localhost:5000/api/analyze',
+                                   json={'transcript': "I gave information about the platform and the maximum minimum.",
+                                         'language': 'en-GB'},
+                                   headers=headers, timeout=30).json()
+        lookalike_keywords = lookalikes['criteria'][0]['details']['keywords_found']
+        print(f"Lookalike keywords: {lookalike_keywords}")
+        
+        if (scores['en-IN'] > scores['en-US'] and unsupported.status_code == 400
+                and lookalike_keywords['score'] == 0):
+            print("✅ Locale rubrics applied")
+            return True
+        else:
+            print("❌ Locale rubrics not applied")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
+def test_near_duplicates():
+    """Test that a lightly edited copy of an introduction is flagged with similar_to"""
+    print("\n" + "=" * 60)
+    print("Testing Near-Duplicates")
+    print("=" * 60)
+    
+    headers = {'X-Client-Id': 'test-near-duplicates'}
+    original = ("Good afternoon everyone, my name is Kavya. I am fourteen years old and I study in class nine "
+                "at Green Valley School. I live in Nagpur with my parents and my younger brother. "
+                "In my free time I enjoy painting landscapes and reading mystery novels. "
+                "My dream is to become an architect. Thank you for listening.")
+    copy = original.replace('Kavya', 'Ishaan').replace('fourteen', 'fifteen')
+    
+    try:
+        first = requests.post('http://localhost:5000/api/analyze', json={'transcript': original},
+                              headers=headers, timeout=30).json()
+        second = requests.post('http://localhost:5000/api/analyze', json={'transcript': copy},
+                               headers=headers, timeout=30).json()
+        print(f"Original similar_to: {first.get('similar_to')}")
+        print(f"Copy similar_to: {second.get('similar_to')}")
+        
+        if 'similar_to' not in second:
+            print("⚠️  Near-duplicate index disabled (NEAR_DUPLICATE_INDEX_SIZE=0)")
+            return True
+        similar = second['similar_to']
+        if similar:
+            print("✅ Copied introduction flagged")
+            return True
+        else:
+            print("❌ Copied introduction not flagged")
+            return False
+            
+    except Exception as e:
+        print(f"❌ Error: {str(e)}")
+        return False
+
 def run_all_tests():
     """Run all tests"""
     print("\n" + "=" * 60)
@@ -176,7 +553,7 @@ def run_all_tests():
     print("=" * 60)
     
     tests_passed = 0
-    total_tests = 3
+    total_tests = 14
     
     # Test 1: Health check
     if test_health_endpoint():
@@ -193,6 +570,50 @@ def run_all_tests():
     except Exception as e:
         print(f"❌ Edge case tests failed: {str(e)}")
     
+    # Test 4: Batch analysis
+    if test_batch_endpoint():
+        tests_passed += 1
+    
+    # Test 5: Asynchronous jobs
+    if test_jobs_endpoint():
+        tests_passed += 1
+    
+    # Test 6: Metrics (after the tests above have generated traffic)
+    if test_metrics_endpoint():
+        tests_passed += 1
+    
+    # Test 7: Streaming sessions
+    if test_sessions_endpoint():
+        tests_passed += 1
+    
+    # Test 8: Results history
+    if test_results_history():
+        tests_passed += 1
+    
+    # Test 9: Request limits
+    if test_request_limits():
+        tests_passed += 1
+    
+    # Test 10: Profiling
+    if test_profiling():
+        tests_passed += 1
+    
+    # Test 11: Admission control
+    if test_admission_control():
+        tests_passed += 1
+    
+    # Test 12: Compact responses
+    if test_compact_response():
+        tests_passed += 1
+    
+    # Test 13: Languages
+    if test_languages():
+        tests_passed += 1
+    
+    # Test 14: Near-duplicates
+    if test_near_duplicates():
+        tests_passed += 1
+    
     # Summary
     print("\n" + "=" * 60)
     print("TEST SUMMARY")
@@ -0,0 +1,161 @@
+"""Single tokenization stage shared by every SpeechAnalyzer criterion.
+
+The transcript is stripped, lowercased and split into sentences once, and
+every analyzer reads from the resulting Document instead of re-lowering and
+re-splitting the text itself.
+
+Memory stays proportional to the text, not to the number of tokens: the
+Document keeps the text, its lowercase form and the sentence offsets, while
+word counts and the distinct-word count are taken in one pass over bounded
+windows of the text. Tokens and sentences are produced on demand instead of
+being held as lists of small strings.
+"""
+import re
+
+from phrase_matcher import sentence_spans
+
+TOKEN = re.compile(r'\S+')
+NON_WORD = re.compile(r'[^\w\s]')
+
+# Characters tokenized at a time when counting words
+WINDOW_CHARS = 65536
+
+# A grammar sentence ends at .!? and whitespace
+SENTENCE_END = re.compile(r'([.!?]+)\s+')
+# Words whose period does not end a sentence
+ABBREVIATIONS = frozenset(('mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'etc', 'e.g', 'i.e', 'approx'))
+
+
+def windows(text, size=WINDOW_CHARS):
+    """Split text into pieces of about ``size`` characters, cut only at spaces"""
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            cut = text.rfind(' ', start, end)
+            end = cut + 1 if cut >= start else len(text)
+        yield text[start:end]
+        start = end
+
+
+def exceeds_word_limit(text, limit):
+    """True if text has more than ``limit`` whitespace tokens (stops counting early)"""
+    if not limit or (len(text) + 1) // 2 <= limit:
+        return False
+    for count, _ in enumerate(TOKEN.finditer(text), 1):
+        if count > limit:
+            return True
+    return False
+
+
+def grammar_spans(text):
+    """(start, end) of the sentences of text as a grammar check should see them.
+
+    Unlike ``sentence_spans`` the spans tile the text: a sentence keeps its
+    closing punctuation and the whitespace after it. A period after an
+    abbreviation or an initial ("Mr.", "e.g.", "A. P. J.") or inside a number
+    ("42.5") does not end a sentence.
+    """
+    spans, start = [], 0
+    for match in SENTENCE_END.finditer(text):
+        if match.group(1) == '.':
+            before = text[max(start, match.start() - 8):match.start()]
+            word = before.split()[-1].lstrip('(\'"') if before.strip() and not before[-1].isspace() else ''
+            if word.lower() in ABBREVIATIONS or (len(word) == 1 and word.isupper()):
+                continue
+        if match.end() < len(text):
+            spans.append((start, match.end()))
+            start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+class Sentences:
+    """Read-only sequence of the stripped sentences of a text, sliced on access"""
+
+    __slots__ = ('text', 'spans')
+
+    def __init__(self, text, spans):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __getitem__(self, index):
+        start, end = self.spans[index]
+        return self.text[start:end].strip()
+
+    def __iter__(self):
+        text = self.text
+        for start, end in self.spans:
+            yield text[start:end].strip()
+
+
+class Document:
+    """Compact view of one transcript.
+
+    Attributes:
+        text: the stripped transcript
+        lower: ``text.lower()``
+        word_count: number of whitespace tokens
+        distinct_words: number of distinct tokens once punctuation is removed (for TTR)
+        sentences: stripped sentences of ``text`` split on ``.!?``
+        sentence_spans: (start, end) of each sentence in ``lower``
+        grammar_spans: ``grammar_spans(text)``, computed on first use
+    """
+
+    __slots__ = ('text', 'lower', 'word_count', 'distinct_words', 'sentences', 'sentence_spans', '_grammar_spans')
+
+    def __init__(self, transcript):
+        self.text = transcript.strip()
+        self.lower = self.text.lower()
+
+        word_count = 0
+        distinct = set()
+        for window in windows(self.lower):
+            tokens = TOKEN.findall(window)
+            word_count += len(tokens)
+            distinct.update(tokens)
+        self.word_count = word_count
+        self.distinct_words = len({NON_WORD.sub('', token) for token in distinct})
+
+        spans = sentence_spans(self.text)
+        self.sentences = Sentences(self.text, spans)
+        # Lowercasing almost never changes length; re-split only when it does
+        self.sentence_spans = spans if len(self.lower) == len(self.text) else sentence_spans(self.lower)
+        self._grammar_spans = None
+
+    @property
+    def sentence_count(self):
+        return len(self.sentences)
+
+    @property
+    def grammar_spans(self):
+        if self._grammar_spans is None:
+            self._grammar_spans = grammar_spans(self.text)
+        return self._grammar_spans
+
+    def grammar_sentences(self):
+        """The ``text`` slices of ``grammar_spans``"""
+        return [self.text[start:end] for start, end in self.grammar_spans]
+
+    def sentence_pieces(self):
+        """``text`` cut where every sentence after the first starts, or None.
+
+        The pieces hold the whitespace tokens of ``text`` in order, so token-level
+        work (sentiment) can be done per piece. None when a cut would fall inside
+        a token ("one.Two").
+        """
+        text = self.text
+        cuts = [start for start, _ in self.sentences.spans[1:]]
+        if any(not text[cut].isspace() for cut in cuts):
+            return None
+        bounds = [0] + cuts + [len(text)]
+        return [text[start:end].strip() for start, end in zip(bounds, bounds[1:])]
+
+    def text_tokens(self):
+        """Whitespace tokens of ``text`` in their original case (for sentiment), lazily"""
+        for match in TOKEN.finditer(self.text):
+            yield match.group()